@@ -0,0 +1,313 @@
+"""Banc d'essai : pas/seconde en fonction du nombre de boids, pour les trois scripts.
+
+Chaque cas tourne dans un processus neuf (mesure de mémoire propre au cas).
+Le temps d'un pas est découpé en recherche de voisins, calcul des forces,
+intégration et rendu (sur une surface hors écran de la taille par défaut de
+la fenêtre, à travers la caméra comme dans window : index des morceaux,
+agents visibles, dessin). Les résultats vont dans un fichier JSON pour
+comparer moteurs et commits.
+
+    python benchmark.py --engines numpy --boids 100 1000 10000 20000 --output bench.json
+    python benchmark.py --scripts simple --engines parallel --workers 1 2 4 8 --boids 100000
+    python benchmark.py --engines numpy --lod 0 2 4 --lod-center --max-neighbors 0 16
+    python benchmark.py --engines numpy compiled --boids 1000 10000 50000
+    python benchmark.py --scenario scenarios/pred.toml --engines numpy --boids 1000 10000
+
+Les moteurs compiled et parallel cherchent les voisins pendant le calcul des
+forces (neighbors_in_forces) : leur phase "neighbors" vaut alors null dans
+le JSON et son temps est compté dans "forces".
+
+Avec --lod / --max-neighbors, chaque cas rapporte aussi l'écart de ses forces
+à celles du mode exact, sur l'état final. Avec --scenario, les cas partent
+des paramètres du scénario ; effectifs, LOD_CELLS et MAX_NEIGHBORS restent
+ceux des options du banc d'essai.
+"""
+import argparse
+import concurrent.futures
+import dataclasses
+import datetime
+import itertools
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pygame
+
+import flock_kernel
+import flock_parallel
+import obstacles
+import scenario
+import window
+from camera import Camera
+from chunks import ChunkIndex
+from flock_numpy import ArrayFlock
+from scenario import SCRIPTS
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def set_population(module, boids, predators, teams=None):
+    """Fixe les effectifs du script, répartis entre ses équipes s'il en a
+    (teams équipes, ou autant qu'actuellement si None)."""
+    if hasattr(module, "NUM_BOIDS"):
+        module.NUM_BOIDS = boids
+    else:
+        teams = teams or len(module.TEAM_SIZES)
+        module.TEAM_SIZES = [boids // teams + (k < boids % teams) for k in range(teams)]
+    if hasattr(module, "NUM_PREDATORS"):
+        module.NUM_PREDATORS = predators
+
+
+def force_error(flock):
+    """Écart des forces de flock à celles du mode exact, sur son état courant :
+    écart moyen relatif à la force moyenne, et écart maximal."""
+    state = flock.state()
+    exact = dataclasses.replace(flock.config, lod_cells=0, lod_exact_boundary=True,
+                                max_neighbors=0)
+    forces = []
+    for config in (flock.config, exact):
+        engine = ArrayFlock(config, state["positions"], state["velocities"], state["teams"],
+                            state["predator_positions"], state["predator_velocities"])
+        engine.find_neighbors()
+        engine.compute_forces()
+        forces.append(engine.accelerations)
+    approx, reference = forces
+    error = np.hypot(*(approx - reference).T)
+    scale = np.hypot(*reference.T).mean()
+    return {
+        "mean": float(error.mean() / scale) if scale > 0 else 0.0,
+        "max": float(error.max()) if len(error) else 0.0,
+    }
+
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sous macOS, en kilo-octets ailleurs
+    if sys.platform == "darwin":
+        return peak / 2**20
+    return peak / 2**10
+
+
+def run_case(case):
+    """Mesure un cas (dans un processus dédié) et renvoie sa ligne de résultats."""
+    module = scenario.apply(case["script"], case["parameters"])
+    set_population(module, case["boids"], case["predators"], case["teams"])
+    flock_parallel.WORKERS = case["workers"]
+    module.LOD_CELLS = case["lod_cells"]
+    module.LOD_EXACT_BOUNDARY = case["lod_exact_boundary"]
+    module.MAX_NEIGHBORS = case["max_neighbors"]
+    flock = module.create_flock(case["engine"], case["seed"])
+    size = (module.WIDTH, module.HEIGHT)
+    surface = None
+    if case["render"]:
+        surface = pygame.Surface(window.default_screen(size))
+        camera = Camera(size, surface.get_size())
+        shapes = obstacles.field_shapes(flock.config.obstacles)
+
+    for _ in range(case["warmup"]):
+        flock.step()
+
+    phases = dict.fromkeys(("neighbors", "forces", "integration", "render"), 0.0)
+    clock = time.perf_counter
+    for _ in range(case["steps"]):
+        t0 = clock()
+        flock.find_neighbors()
+        t1 = clock()
+        flock.compute_forces()
+        t2 = clock()
+        flock.integrate()
+        t3 = clock()
+        if surface is not None:
+            state = flock.state()
+            visible = window.visible_state(state, state, 1.0, size, camera,
+                                           ChunkIndex(state["positions"], *size))
+            surface.fill(module.BACKGROUND_COLOR)
+            module.draw_state(visible, surface, camera, shapes)
+        t4 = clock()
+        phases["neighbors"] += t1 - t0
+        phases["forces"] += t2 - t1
+        phases["integration"] += t3 - t2
+        phases["render"] += t4 - t3
+
+    error = None
+    if case["lod_cells"] or case["max_neighbors"]:
+        error = force_error(flock)
+    if hasattr(flock, "close"):
+        flock.close()
+
+    steps = case["steps"]
+    sim_time = phases["neighbors"] + phases["forces"] + phases["integration"]
+    time_per_step = {name: total / steps for name, total in phases.items()}
+    if getattr(flock, "neighbors_in_forces", False):
+        # Phases inséparables pour ce moteur : tout est dans "forces"
+        time_per_step["forces"] += time_per_step["neighbors"]
+        time_per_step["neighbors"] = None
+    return {
+        **case,
+        "steps_per_sec": steps / sim_time if sim_time > 0 else float("inf"),
+        "time_per_step": time_per_step,
+        "peak_memory_mb": peak_memory_mb(),
+        "force_error": error,
+    }
+
+
+def make_cases(scripts, engines, boid_counts, predator_counts, steps, warmup,
+               seed=0, render=True, max_objects=5000, teams=None, workers=(None,),
+               lods=(0,), lod_exact_boundary=True, max_neighbors=(0,), parameters=None):
+    cases = []
+    for script in scripts:
+        for engine in engines:
+            for boids in boid_counts:
+                # Le moteur objet est O(N·voisins) en Python pur : au-delà de
+                # max_objects un cas prendrait plusieurs minutes.
+                if engine == "objects" and boids > max_objects:
+                    continue
+                for predators in (predator_counts if script == "pred" else [0]):
+                    # Nombre de processus : seulement pour le moteur parallèle ;
+                    # niveau de détail : seulement pour les moteurs tableaux
+                    variants = itertools.product(
+                        workers if engine == "parallel" else [None],
+                        lods if engine in ("numpy", "parallel") else [0],
+                        max_neighbors if engine in ("numpy", "parallel") else [0])
+                    for count, lod, neighbors in variants:
+                        cases.append({
+                            "script": script, "engine": engine,
+                            "boids": boids, "predators": predators,
+                            "steps": steps, "warmup": warmup,
+                            "seed": seed, "render": render,
+                            "teams": None if script == "simple" else teams,
+                            "workers": count,
+                            "lod_cells": lod, "lod_exact_boundary": lod_exact_boundary,
+                            "max_neighbors": neighbors,
+                            "parameters": parameters or {},
+                        })
+    return cases
+
+
+def run_benchmark(cases, log=None):
+    # Un processus "spawn" par cas : la mémoire crête ne mélange pas les cas.
+    # ProcessPoolExecutor plutôt que Pool : ses processus ne sont pas
+    # "daemon" et peuvent lancer ceux du moteur parallèle.
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for case in cases:
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as pool:
+            result = pool.submit(run_case, case).result()
+        results.append(result)
+        if log is not None:
+            log(result)
+    return results
+
+
+def metadata():
+    try:
+        # Commit du dépôt du banc d'essai, quel que soit le dossier courant
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                                text=True, check=True,
+                                cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pygame": pygame.version.ver,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def print_result(result):
+    phases = result["time_per_step"]
+    workers = f" x{result['workers']}" if result["workers"] else ""
+    neighbors = ("  (forces)" if phases["neighbors"] is None
+                 else f"{phases['neighbors'] * 1e3:8.2f}ms")
+    print(f"{result['script']:8} {result['engine'] + workers:12} boids={result['boids']:6d} "
+          f"pred={result['predators']:4d}  {result['steps_per_sec']:9.1f} pas/s  "
+          f"voisins={neighbors} forces={phases['forces'] * 1e3:8.2f}ms "
+          f"intégration={phases['integration'] * 1e3:7.2f}ms rendu={phases['render'] * 1e3:7.2f}ms  "
+          f"mem={result['peak_memory_mb'] or 0:.0f}Mo"
+          + lod_label(result), flush=True)
+
+
+def lod_label(result):
+    error = result["force_error"]
+    if error is None:
+        return ""
+    lod = result["lod_cells"]
+    if lod:
+        lod = f"{lod}({'exact' if result['lod_exact_boundary'] else 'centre'})"
+    return (f"  lod={lod} k={result['max_neighbors']} "
+            f"erreur moy={error['mean']:.2e} max={error['max']:.2e}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai des simulations de boids")
+    parser.add_argument("--scripts", nargs="+", choices=sorted(SCRIPTS),
+                        default=["simple", "equipes", "pred"])
+    parser.add_argument("--scenario", default=None, metavar="FICHIER",
+                        help="paramètres de base (.toml ou .json, cf. scenario.py) ; "
+                             "remplace --scripts par la simulation du scénario")
+    parser.add_argument("--engines", nargs="+",
+                        choices=("objects", "numpy", "parallel", "compiled"),
+                        default=["objects", "numpy"])
+    parser.add_argument("--workers", nargs="+", type=int, default=[None],
+                        help="nombres de processus testés (moteur parallel ; "
+                             "par défaut un par cœur)")
+    parser.add_argument("--boids", nargs="+", type=int,
+                        default=[100, 1000, 5000, 10000, 20000])
+    parser.add_argument("--predators", nargs="+", type=int, default=[1, 10, 100],
+                        help="nombres de prédateurs testés (script pred)")
+    parser.add_argument("--teams", type=int, default=None,
+                        help="nombre d'équipes (scripts equipes et pred ; par défaut celui du script)")
+    parser.add_argument("--lod", nargs="+", type=int, default=[0],
+                        help="valeurs de LOD_CELLS testées (moteurs numpy / parallel)")
+    parser.add_argument("--lod-center", action="store_true",
+                        help="cellules coupées par le rayon comptées d'après leur "
+                             "centre (approché) au lieu de paire par paire")
+    parser.add_argument("--max-neighbors", nargs="+", type=int, default=[0],
+                        help="valeurs de MAX_NEIGHBORS testées (0 : tous les voisins)")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-render", action="store_true",
+                        help="ne mesure pas le rendu")
+    parser.add_argument("--max-objects", type=int, default=5000,
+                        help="nombre de boids au-delà duquel le moteur objet est ignoré")
+    parser.add_argument("--output", default="benchmark.json")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scripts, parameters = args.scripts, {}
+    if args.scenario:
+        loaded = scenario.load(args.scenario)
+        scripts, parameters = [loaded["simulation"]], loaded["parameters"]
+    engines = args.engines
+    if "compiled" in engines and not flock_kernel.available():
+        # Sans Numba, "compiled" mesurerait le moteur objet sous un autre nom
+        engines = [engine for engine in engines if engine != "compiled"]
+    cases = make_cases(scripts, engines, args.boids, args.predators,
+                       args.steps, args.warmup, args.seed, not args.no_render,
+                       args.max_objects, args.teams, args.workers,
+                       args.lod, not args.lod_center, args.max_neighbors, parameters)
+    results = run_benchmark(cases, log=print_result)
+    with open(args.output, "w") as f:
+        json.dump({"meta": metadata(), "results": results}, f, indent=2)
+    print(f"{len(results)} cas -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,25 @@
 import sys
+import functools
+import json
 import random
-import pygame
+import argparse
 from pygame.math import Vector2
 
+import checkpoint
+import headless
+import obstacles
+import window
+from population import Lifecycle, LifeConfig
+import flock_kernel
+from flock_kernel import KernelFlock
+from flock_numpy import ArrayFlock, FlockConfig, agents_state, object_pairs
+from flock_parallel import ParallelFlock
+from rendering import draw_obstacles, sprite_size, sprites
+from spatial_grid import SpatialGrid
+
 # PARAMETRES GLOBAUX
 WIDTH, HEIGHT = 1000, 720
-NUM_BOIDS_TEAM1 = 30
-NUM_BOIDS_TEAM2 = 30
+TEAM_SIZES = [30, 30]  # nombre de boids de chaque équipe (équipes 1, 2, ...)
 
 NUM_PREDATORS = 3  # nombre de prédateurs
 
@@ -15,294 +28,558 @@ MAX_FORCE = 0.05
 
 NEIGHBOR_RADIUS = 70
 SEPARATION_RADIUS = 30
+WRAP_NEIGHBORS = True   # distances à l'image la plus proche sur le tore (cf. edges)
+# Niveau de détail de l'alignement / cohésion (moteurs numpy et parallel) :
+# 0 = paires exactes ; k = sommes par cellules de NEIGHBOR_RADIUS / k, exactes
+# si LOD_EXACT_BOUNDARY, sinon approchées (cf. FlockConfig.lod_cells)
+LOD_CELLS = 0
+LOD_EXACT_BOUNDARY = True
+MAX_NEIGHBORS = 0   # au plus ce nombre de voisins, les plus proches (0 = tous)
 
 W_ALIGNMENT = 1.0
 W_COHESION = 0.7
 W_SEPARATION = 1.5
 W_FLEE = 2.5
+FLEE_RADIUS = 120  # distance à partir de laquelle un boid fuit un prédateur
+
+# Obstacles fixes (cf. obstacles.py) : ("circle", x, y, rayon), ("box", x0,
+# y0, x1, y1) ou ("wall", x0, y0, x1, y1, épaisseur). Évités à moins de
+# AVOID_RADIUS, avec le poids W_AVOID ; OBSTACLE_CELL : pas de la grille de
+# distances précalculée au lancement.
+OBSTACLES = []
+W_AVOID = 3.0
+AVOID_RADIUS = 40
+OBSTACLE_CELL = 8.0
+OBSTACLE_COLOR = (70, 75, 100)
 
 PREDATOR_SPEED = 4.5
 PREDATOR_FORCE = 0.1
 PREDATOR_RADIUS = 250
+CAPTURE_RADIUS = 10  # un boid plus proche qu'un prédateur est compté comme capturé
+# Cycle de vie (cf. population) : les prédateurs mangent les boids capturés
+# (CAPTURES), qui réapparaissent au hasard RESPAWN_DELAY pas plus tard (-1 :
+# jamais) ; chaque boid donne naissance à BIRTH_RATE boids par pas. MAX_BOIDS
+# est la capacité du pool (0 : effectif initial).
+CAPTURES = False
+RESPAWN_DELAY = -1
+BIRTH_RATE = 0.0
+MAX_BOIDS = 0
 PREDATOR_COLOR = (255, 230, 50)
 
 BACKGROUND_COLOR = (10, 10, 30)
-COLOR_TEAM1 = (255, 90, 90)
-COLOR_TEAM2 = (90, 140, 255)
+# Couleurs des équipes 1, 2, ... (reprises en boucle au-delà)
+TEAM_COLORS = [
+    (255, 90, 90), (90, 140, 255), (120, 220, 120), (240, 200, 80),
+    (200, 120, 240), (80, 220, 220), (255, 150, 200), (200, 200, 200),
+]
 
 
 def limit_vector(vec: Vector2, max_value: float) -> Vector2:
+    """Limite la norme d'un vecteur à max_value (sur place : renvoie vec)."""
     if vec.length() > max_value:
-        vec = vec.normalize() * max_value
+        vec.scale_to_length(max_value)
     return vec
 
 
 class Boid:
-    def __init__(self, team):
-        self.position = Vector2(random.uniform(0, WIDTH),
-                                random.uniform(0, HEIGHT))
-        angle = random.uniform(0, 360)
-        self.velocity = Vector2(1, 0).rotate(angle) * random.uniform(1, MAX_SPEED)
+    # Pas de __dict__ par boid ; les trois vecteurs sont modifiés sur place.
+    # slot : rang du boid dans Flock.boids (cf. Flock.remove)
+    __slots__ = ("position", "velocity", "acceleration", "team", "slot")
+
+    def __init__(self, team, rng=random):
+        self.position = Vector2(rng.uniform(0, WIDTH),
+                                rng.uniform(0, HEIGHT))
+        angle = rng.uniform(0, 360)
+        self.velocity = Vector2(1, 0).rotate(angle) * rng.uniform(1, MAX_SPEED)
         self.acceleration = Vector2(0, 0)
         self.team = team
-
-    def edges(self):
+        self.slot = -1
+
+    @classmethod
+    def spare(cls):
+        """Boid de réserve (pool de Flock), sans tirage aléatoire."""
+        boid = cls.__new__(cls)
+        boid.position = Vector2(0, 0)
+        boid.velocity = Vector2(0, 0)
+        boid.acceleration = Vector2(0, 0)
+        boid.team = 0
+        boid.slot = -1
+        return boid
+
+    def edges(self, width, height):
         if self.position.x < 0:
-            self.position.x = WIDTH
-        elif self.position.x > WIDTH:
+            self.position.x = width
+        elif self.position.x > width:
             self.position.x = 0
 
         if self.position.y < 0:
-            self.position.y = HEIGHT
-        elif self.position.y > HEIGHT:
+            self.position.y = height
+        elif self.position.y > height:
             self.position.y = 0
 
-    def update(self):
-        self.velocity += self.acceleration
-        self.velocity = limit_vector(self.velocity, MAX_SPEED)
-        self.position += self.velocity
-        self.acceleration = Vector2(0, 0)
-
-    def apply_force(self, force):
-        self.acceleration += force
-
-    def nearest_predator(self, predators):
-        nearest = None
-        min_dist = float("inf")
-
-        for p in predators:
-            d = self.position.distance_to(p.position)
-            if d < min_dist:
-                min_dist = d
-                nearest = p
-
-        return nearest
-
-    def flee(self, predator):
-        distance = self.position.distance_to(predator.position)
-
-        if distance > 120:
+    def update(self, max_speed, dt=1.0):
+        # Tout sur place : aucun Vector2 créé à chaque pas
+        acc = self.acceleration
+        vel = self.velocity
+        if dt != 1.0:
+            acc *= dt
+        vel += acc
+        limit_vector(vel, max_speed)
+        if dt != 1.0:
+            self.position.x += vel.x * dt
+            self.position.y += vel.y * dt
+        else:
+            self.position += vel
+        acc.x = acc.y = 0.0
+
+    def apply_force(self, force: Vector2, weight: float = 1.0):
+        acc = self.acceleration
+        acc.x += force.x * weight
+        acc.y += force.y * weight
+
+    def nearest_predator(self, predator_grid, flee_radius):
+        # (prédateur, vecteur boid -> prédateur, distance) du plus proche à
+        # moins de flee_radius, ou None : au-delà, il ne fait pas fuir
+        return predator_grid.nearest(self.position, flee_radius)
+
+    def flee(self, predator_grid, cfg):
+        found = self.nearest_predator(predator_grid, cfg.flee_radius)
+        if found is None:
             return Vector2(0, 0)
 
-        diff = self.position - predator.position
+        _, toward, distance = found
+        diff = -toward
         if distance > 0:
             diff /= distance
 
-        desired = diff.normalize() * MAX_SPEED
+        desired = diff.normalize() * cfg.max_speed
         steer = desired - self.velocity
-        steer = limit_vector(steer, MAX_FORCE)
+        steer = limit_vector(steer, cfg.max_force)
 
         return steer
 
-    def apply_behaviors(self, boids, predators):
-        pred = self.nearest_predator(predators)
-        flee_force = self.flee(pred) * W_FLEE
+    def apply_behaviors(self, neighbors, predator_grid, cfg):
+        # cfg : paramètres résolus à la création du moteur (FlockConfig)
+        flee_force = self.flee(predator_grid, cfg)
+        flee_force *= cfg.w_flee
 
         if flee_force.length() > 0:
             self.apply_force(flee_force)
+            self.avoid_obstacles(cfg)
             return
 
-        sep = self.separation(boids) * W_SEPARATION
-        ali = self.alignment(boids) * W_ALIGNMENT
-        coh = self.cohesion(boids) * W_COHESION
-
-        self.apply_force(sep)
-        self.apply_force(ali)
-        self.apply_force(coh)
-
-    def separation(self, boids):
-        steer = Vector2(0, 0)
+        sep, ali, coh = self.flock(*neighbors, cfg)
+
+        self.apply_force(sep, cfg.w_separation)
+        self.apply_force(ali, cfg.w_alignment)
+        self.apply_force(coh, cfg.w_cohesion)
+        self.avoid_obstacles(cfg)
+
+    def avoid_obstacles(self, cfg):
+        if cfg.obstacles is not None:
+            steer = obstacles.avoidance(self.position, self.velocity, cfg,
+                                        cfg.max_speed, cfg.max_force)
+            if steer is not None:
+                self.apply_force(Vector2(steer), cfg.w_avoid)
+
+    def flock(self, separation_hood, team_hood, cfg):
+        # separation_hood : grille fine, toutes équipes ; team_hood : grille
+        # de l'équipe de ce boid (cf. Flock.find_neighbors)
+        # Paramètres en variables locales : rien n'est relu dans les boucles
+        separation_radius = cfg.separation_radius
+        neighbor_radius = cfg.neighbor_radius
+        max_speed = cfg.max_speed
+        max_force = cfg.max_force
+
+        sep_sum = Vector2(0, 0)
+        sep_total = 0
+        velocity_sum = Vector2(0, 0)
+        offset_sum = Vector2(0, 0)
         total = 0
 
-        for other in boids:
-            if other is self:
-                continue
-
-            d = self.position.distance_to(other.position)
-
-            if 0 < d < SEPARATION_RADIUS:
-                diff = self.position - other.position
-                if d > 0:
+        # la séparation concerne toutes les équipes
+        for offset, cell in separation_hood:
+            # Position de ce boid vue depuis la cellule (décalée de la taille
+            # du monde si la cellule est de l'autre côté du tore)
+            here = self.position - offset
+            for other in cell:
+                if other is self:
+                    continue
+                d = here.distance_to(other.position)
+                if 0 < d < separation_radius:
+                    diff = here - other.position
                     diff /= d
-                steer += diff
-                total += 1
-
+                    sep_sum += diff
+                    sep_total += 1
+
+        # alignement et cohésion : même équipe seulement
+        for offset, cell in team_hood:
+            here = self.position - offset
+            for other in cell:
+                if other is self:
+                    continue
+                if here.distance_to(other.position) < neighbor_radius:
+                    velocity_sum += other.velocity
+                    offset_sum += other.position - here
+                    total += 1
+
+        sep = Vector2(0, 0)
+        if sep_total > 0:
+            sep = sep_sum / sep_total
+        if sep.length() > 0:
+            sep = sep.normalize() * max_speed - self.velocity
+            sep = limit_vector(sep, max_force)
+
+        ali = Vector2(0, 0)
+        coh = Vector2(0, 0)
         if total > 0:
-            steer /= total
-
-        if steer.length() > 0:
-            steer = steer.normalize() * MAX_SPEED - self.velocity
-            steer = limit_vector(steer, MAX_FORCE)
-
-        return steer
-
-    def alignment(self, boids):
-        avg_velocity = Vector2(0, 0)
-        total = 0
-
-        for other in boids:
-            if other is self:
-                continue
-            if other.team != self.team:
-                continue
-
-            d = self.position.distance_to(other.position)
-            if d < NEIGHBOR_RADIUS:
-                avg_velocity += other.velocity
-                total += 1
-
-        if total > 0:
-            avg_velocity /= total
+            avg_velocity = velocity_sum / total
             if avg_velocity.length() > 0:
-                desired = avg_velocity.normalize() * MAX_SPEED
-                steer = desired - self.velocity
-                steer = limit_vector(steer, MAX_FORCE)
-                return steer
-
-        return Vector2(0, 0)
-
-    def cohesion(self, boids):
-        center_of_mass = Vector2(0, 0)
-        total = 0
-
-        for other in boids:
-            if other is self:
-                continue
-            if other.team != self.team:
-                continue
+                ali = avg_velocity.normalize() * max_speed - self.velocity
+                ali = limit_vector(ali, max_force)
 
-            d = self.position.distance_to(other.position)
-            if d < NEIGHBOR_RADIUS:
-                center_of_mass += other.position
-                total += 1
-
-        if total > 0:
-            center_of_mass /= total
-
-            desired = center_of_mass - self.position
+            desired = offset_sum / total
             if desired.length() > 0:
-                desired = desired.normalize() * MAX_SPEED
-                steer = desired - self.velocity
-                steer = limit_vector(steer, MAX_FORCE)
-                return steer
-
-        return Vector2(0, 0)
-
-    def draw(self, surface):
-        angle = self.velocity.angle_to(Vector2(1, 0))
-        size = 8
-
-        points = [
-            Vector2(size, 0),
-            Vector2(-size, size / 2),
-            Vector2(-size, -size / 2),
-        ]
+                coh = desired.normalize() * max_speed - self.velocity
+                coh = limit_vector(coh, max_force)
 
-        rotated = [self.position + p.rotate(-angle) for p in points]
-
-        col = COLOR_TEAM1 if self.team == 1 else COLOR_TEAM2
-        pygame.draw.polygon(surface, col, rotated)
+        return sep, ali, coh
 
 
 class Predator:
-    def __init__(self):
+    __slots__ = ("position", "velocity", "acceleration")
+
+    def __init__(self, rng=random):
         self.position = Vector2(
-            random.uniform(0, WIDTH),
-            random.uniform(0, HEIGHT)
+            rng.uniform(0, WIDTH),
+            rng.uniform(0, HEIGHT)
         )
-        angle = random.uniform(0, 360)
-        self.velocity = Vector2(1, 0).rotate(angle) * random.uniform(2, PREDATOR_SPEED)
+        angle = rng.uniform(0, 360)
+        self.velocity = Vector2(1, 0).rotate(angle) * rng.uniform(2, PREDATOR_SPEED)
         self.acceleration = Vector2(0, 0)
 
-    def edges(self):
+    def edges(self, width, height):
         if self.position.x < 0:
-            self.position.x = WIDTH
-        elif self.position.x > WIDTH:
+            self.position.x = width
+        elif self.position.x > width:
             self.position.x = 0
 
         if self.position.y < 0:
-            self.position.y = HEIGHT
-        elif self.position.y > HEIGHT:
+            self.position.y = height
+        elif self.position.y > height:
             self.position.y = 0
 
-    def update(self, boids):
-        target = None
-        min_dist = float("inf")
+    def hunt(self, boid_grid, cfg):
+        # Poursuit le boid le plus proche dans predator_radius ; n'intègre
+        # pas (cf. update). Renvoie le rang de la proie (-1 : aucune).
+        found = boid_grid.nearest(self.position, cfg.predator_radius)
+        if found is None:
+            return -1
 
-        for b in boids:
-            d = self.position.distance_to(b.position)
-            if d < min_dist and d < PREDATOR_RADIUS:
-                min_dist = d
-                target = b
-
-        if target is not None:
-            desired = (target.position - self.position).normalize() * PREDATOR_SPEED
+        prey, toward, _ = found
+        if toward.length() > 0:
+            desired = toward.normalize() * cfg.predator_speed
             steer = desired - self.velocity
-            steer = limit_vector(steer, PREDATOR_FORCE)
+            steer = limit_vector(steer, cfg.predator_force)
             self.acceleration += steer
-
-        self.velocity += self.acceleration
-        self.velocity = limit_vector(self.velocity, PREDATOR_SPEED)
-        self.position += self.velocity
-        self.acceleration = Vector2(0, 0)
-
-    def draw(self, surface):
-        angle = self.velocity.angle_to(Vector2(1, 0))
-        size = 20
-
-        points = [
-            Vector2(size, 0),
-            Vector2(-size, size / 2),
-            Vector2(-size, -size / 2),
+        return prey.slot
+
+    def avoid_obstacles(self, cfg):
+        if cfg.obstacles is not None:
+            steer = obstacles.avoidance(self.position, self.velocity, cfg,
+                                        cfg.predator_speed, cfg.predator_force)
+            if steer is not None:
+                self.acceleration += Vector2(steer) * cfg.w_avoid
+
+    def update(self, max_speed, dt=1.0):
+        # Tout sur place : aucun Vector2 créé à chaque pas
+        acc = self.acceleration
+        vel = self.velocity
+        if dt != 1.0:
+            acc *= dt
+        vel += acc
+        limit_vector(vel, max_speed)
+        if dt != 1.0:
+            self.position.x += vel.x * dt
+            self.position.y += vel.y * dt
+        else:
+            self.position += vel
+        acc.x = acc.y = 0.0
+
+
+class Flock:
+    engine = "objects"
+    # Cycle de vie des boids (population.Lifecycle) ; None : population fixe
+    life = None
+
+    def __init__(self, boids, predators, rng=None, config=None, capacity=None):
+        self.boids = boids
+        for slot, boid in enumerate(boids):
+            boid.slot = slot
+        # Pool : boids de réserve créés d'avance jusqu'à capacity, repris par
+        # add et rendus par remove (aucun boid créé pendant les pas)
+        self.capacity = max(capacity or 0, len(boids))
+        self.spares = [Boid.spare() for _ in range(self.capacity - len(boids))]
+        self.predator_targets = None
+        self.steps = 0  # pas effectués (cf. checkpoint)
+        self.neighbor_checks = 0
+        self.predators = predators
+        self.rng = rng
+        # Paramètres lus une fois pour toutes : les constantes du module ne
+        # sont plus consultées pendant les pas
+        cfg = self.config = config or flock_config()
+        self.neighbor_radius = cfg.neighbor_radius
+        self.wrap = cfg.wrap
+        self.size = (cfg.width, cfg.height)
+        self.flee_radius = cfg.flee_radius
+        # Grilles reconstruites à chaque pas : une grille fine commune à
+        # toutes les équipes (séparation, chasse), une par équipe
+        # (alignement, cohésion) et celle des prédateurs (fuite). Les
+        # requêtes de groupe ne parcourent jamais les autres équipes.
+        self.grid = SpatialGrid(cfg.width, cfg.height, cfg.separation_radius, wrap=cfg.wrap)
+        self.team_grids = {}
+        self.predator_grid = SpatialGrid(cfg.width, cfg.height, cfg.flee_radius, wrap=cfg.wrap)
+
+    def __len__(self):
+        return len(self.boids)
+
+    def step(self, dt=1.0):
+        # Double tampon : toutes les forces sont calculées sur l'état du début
+        # du pas, puis tous les agents sont intégrés. L'ordre de parcours
+        # n'influe donc plus sur le résultat.
+        self.find_neighbors()
+        self.compute_forces()
+        self.integrate(dt)
+
+    def find_neighbors(self):
+        if self.life is not None:
+            self.life.update(self)
+        self.grid.rebuild(self.boids)
+        self.predator_grid.rebuild(self.predators)
+        members = {}
+        for boid in self.boids:
+            members.setdefault(boid.team, []).append(boid)
+        cfg = self.config
+        for team in members:
+            if team not in self.team_grids:
+                self.team_grids[team] = SpatialGrid(cfg.width, cfg.height, cfg.neighbor_radius,
+                                                    wrap=cfg.wrap)
+        for team, grid in self.team_grids.items():
+            grid.rebuild(members.get(team, ()))
+
+        # (voisinage toutes équipes, voisinage de l'équipe) de chaque boid
+        self.neighbors = [
+            (self.grid.neighborhood(boid.position),
+             self.team_grids[boid.team].neighborhood(boid.position))
+            for boid in self.boids
         ]
-
-        rotated = [self.position + p.rotate(-angle) for p in points]
-        pygame.draw.polygon(surface, PREDATOR_COLOR, rotated)
-
-
-def main():
-        pygame.init()
-        screen = pygame.display.set_mode((WIDTH, HEIGHT))
-        pygame.display.set_caption("Boids multi-predateurs")
-        clock = pygame.time.Clock()
-
-        boids = []
-        for _ in range(NUM_BOIDS_TEAM1):
-            boids.append(Boid(1))
-        for _ in range(NUM_BOIDS_TEAM2):
-            boids.append(Boid(2))
-
-        predators = [Predator() for _ in range(NUM_PREDATORS)]
-
-        running = True
-        while running:
-            clock.tick(60)
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-
-            for p in predators:
-                p.update(boids)
-                p.edges()
-
-            for b in boids:
-                b.apply_behaviors(boids, predators)
-                b.update()
-                b.edges()
-
-            screen.fill(BACKGROUND_COLOR)
-
-            for b in boids:
-                b.draw(screen)
-            for p in predators:
-                p.draw(screen)
-
-            pygame.display.flip()
-
-        pygame.quit()
-        sys.exit()
+        self.neighbor_checks = sum(len(cell) for hoods in self.neighbors
+                                   for hood in hoods for _, cell in hood)
+
+    def compute_forces(self):
+        cfg = self.config
+        self.predator_targets = [p.hunt(self.grid, cfg) for p in self.predators]
+        for p in self.predators:
+            p.avoid_obstacles(cfg)
+        for b, neighbors in zip(self.boids, self.neighbors):
+            b.apply_behaviors(neighbors, self.predator_grid, cfg)
+
+    def integrate(self, dt=1.0):
+        cfg = self.config
+        width, height = self.size
+        for p in self.predators:
+            p.update(cfg.predator_speed, dt)
+            p.edges(width, height)
+        for b in self.boids:
+            b.update(cfg.max_speed, dt)
+            b.edges(width, height)
+        self.steps += 1
+
+    def neighbor_pairs(self):
+        return object_pairs(self.boids, [sep + team for sep, team in self.neighbors])
+
+    # POOL D'AGENTS (cf. population)
+    def agent(self, row):
+        boid = self.boids[row]
+        return boid.position.x, boid.position.y, boid.velocity.x, boid.velocity.y, boid.team
+
+    def predator_position(self, k):
+        position = self.predators[k].position
+        return position.x, position.y
+
+    def remove(self, rows):
+        # Le dernier boid prend la place du boid retiré : O(1) par boid
+        boids = self.boids
+        for row in sorted(rows, reverse=True):
+            last = boids.pop()
+            if row < len(boids):
+                boids[row], last = last, boids[row]
+                boids[row].slot = row
+            self.spares.append(last)
+
+    def add(self, x, y, vx, vy, team):
+        if len(self.boids) >= self.capacity:
+            return False
+        boid = self.spares.pop()
+        boid.position.update(x, y)
+        boid.velocity.update(vx, vy)
+        boid.acceleration.update(0, 0)
+        boid.team = team
+        boid.slot = len(self.boids)
+        self.boids.append(boid)
+        return True
+
+    def state(self):
+        return agents_state(self.boids, self.predators)
+
+
+def flock_config():
+    return FlockConfig(
+        width=WIDTH, height=HEIGHT,
+        max_speed=MAX_SPEED, max_force=MAX_FORCE,
+        neighbor_radius=NEIGHBOR_RADIUS, separation_radius=SEPARATION_RADIUS,
+        w_alignment=W_ALIGNMENT, w_cohesion=W_COHESION, w_separation=W_SEPARATION,
+        wrap=WRAP_NEIGHBORS,
+        lod_cells=LOD_CELLS, lod_exact_boundary=LOD_EXACT_BOUNDARY,
+        max_neighbors=MAX_NEIGHBORS,
+        obstacles=obstacles.bake(OBSTACLES, WIDTH, HEIGHT, AVOID_RADIUS, OBSTACLE_CELL,
+                                 WRAP_NEIGHBORS),
+        w_avoid=W_AVOID, avoid_radius=AVOID_RADIUS,
+        team_filter=True,
+        w_flee=W_FLEE, flee_radius=FLEE_RADIUS,
+        predator_speed=PREDATOR_SPEED, predator_force=PREDATOR_FORCE,
+        predator_radius=PREDATOR_RADIUS,
+    )
+
+
+def life_config():
+    return LifeConfig(
+        width=WIDTH, height=HEIGHT, max_speed=MAX_SPEED, wrap=WRAP_NEIGHBORS,
+        capture_radius=CAPTURE_RADIUS if CAPTURES else 0.0,
+        respawn_delay=RESPAWN_DELAY, birth_rate=BIRTH_RATE,
+    )
+
+
+def build_flock(engine, boids, predators, rng=None):
+    """Moteur engine sur ces agents ; les constantes du module sont lues
+    ici, une seule fois (cf. flock_config)."""
+    config = flock_config()
+    life = None
+    capacity = None
+    if CAPTURES or BIRTH_RATE > 0:
+        life = Lifecycle(life_config(), rng)
+        capacity = MAX_BOIDS
+    if engine == "numpy":
+        flock = ArrayFlock.from_agents(config, boids, predators, rng, capacity)
+    elif engine == "parallel":
+        flock = ParallelFlock.from_agents(config, boids, predators, rng, capacity=capacity)
+    # Moteur compilé si Numba est là, sinon moteur objet (Python pur)
+    elif engine == "compiled" and flock_kernel.available():
+        flock = KernelFlock.from_agents(config, boids, predators, rng, capacity)
+    else:
+        flock = Flock(boids, predators, rng, config, capacity)
+    flock.life = life
+    return flock
+
+
+def create_flock(engine="objects", seed=None):
+    rng = random.Random(seed)
+    boids = []
+    for team, size in enumerate(TEAM_SIZES, start=1):
+        for _ in range(size):
+            boids.append(Boid(team, rng))
+
+    predators = [Predator(rng) for _ in range(NUM_PREDATORS)]
+
+    return build_flock(engine, boids, predators, rng)
+
+
+def restore_flock(state, engine="objects", rng=None):
+    """Reconstruit une simulation à partir d'un état (cf. Flock.state)."""
+    boids = []
+    for (x, y), (vx, vy), team in zip(state["positions"], state["velocities"], state["teams"]):
+        boid = Boid(int(team))
+        boid.position = Vector2(x, y)
+        boid.velocity = Vector2(vx, vy)
+        boids.append(boid)
+
+    predators = []
+    for (x, y), (vx, vy) in zip(state["predator_positions"], state["predator_velocities"]):
+        predator = Predator()
+        predator.position = Vector2(x, y)
+        predator.velocity = Vector2(vx, vy)
+        predators.append(predator)
+
+    return build_flock(engine, boids, predators, rng)
+
+
+def draw_state(state, surface, camera=None, shapes=()):
+    """Dessine state ; shapes : obstacles déjà lus (cf. obstacles.field_shapes)."""
+    draw_obstacles(surface, shapes, OBSTACLE_COLOR, camera)
+    palette = (state["teams"] - 1) % len(TEAM_COLORS) + 1
+    # Triangles pré-tournés aux couleurs actuelles, à l'échelle de la vue
+    # (cf. rendering.sprites, rendering.sprite_size)
+    boid_sprites = sprites(dict(enumerate(TEAM_COLORS, start=1)), sprite_size(8, camera))
+    boid_sprites.draw(surface, state["positions"], state["velocities"], palette)
+    predator_sprites = sprites({0: PREDATOR_COLOR}, sprite_size(20, camera))
+    predator_sprites.draw(surface, state["predator_positions"], state["predator_velocities"])
+
+
+def main(engine="objects", seed=None, resume_path=None, checkpoint_path=None,
+         checkpoint_every=0, **options):
+    flock, checkpoints = checkpoint.start(sys.modules[__name__], engine, seed, resume_path,
+                                          checkpoint_path, checkpoint_every)
+    draw = functools.partial(draw_state,
+                             shapes=obstacles.field_shapes(flock.config.obstacles))
+    window.run(flock, draw, "Boids multi-predateurs", (WIDTH, HEIGHT),
+               BACKGROUND_COLOR, checkpoints=checkpoints, **options)
+    sys.exit()
+
+
+def replay(path, screen_size=None):
+    """Rejoue une trajectoire enregistrée avec --record."""
+    draw = functools.partial(draw_state, shapes=tuple(obstacles.parse(OBSTACLES)))
+    window.replay(path, draw, "Boids multi-predateurs", (WIDTH, HEIGHT),
+                  BACKGROUND_COLOR, screen_size=screen_size)
+    sys.exit()
+
+
+def run_headless(steps, engine="objects", seed=None, resume_path=None, checkpoint_path=None,
+                 checkpoint_every=0, **options):
+    """Exécute steps pas sans fenêtre ni rendu ; renvoie (état final, métriques).
+
+    resume_path : point de reprise à reprendre au lieu d'une nouvelle
+    simulation ; checkpoint_path : point de reprise écrit tous les
+    checkpoint_every pas et à la fin (cf. checkpoint).
+    """
+    flock, checkpoints = checkpoint.start(sys.modules[__name__], engine, seed, resume_path,
+                                          checkpoint_path, checkpoint_every)
+    return headless.run(flock, steps, checkpoints=checkpoints, **options)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Boids multi-predateurs")
+    parser.add_argument("--engine", choices=("objects", "numpy", "parallel", "compiled"),
+                        default="objects",
+                        help="objets Boid (référence), tableaux NumPy, tableaux NumPy "
+                             "répartis en tuiles sur tous les cœurs, ou noyau compilé "
+                             "par Numba (moteur objet si Numba est absente)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="graine : même graine et mêmes paramètres = mêmes trajectoires")
+    headless.add_arguments(parser)
+    window.add_arguments(parser)
+    checkpoint.add_arguments(parser)
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.replay:
+        replay(args.replay, args.screen)
+    elif args.headless:
+        _, summary = run_headless(args.steps, args.engine, args.seed,
+                                  **headless.options(args), **checkpoint.options(args))
+        print(json.dumps(summary, indent=2))
+    else:
+        main(engine=args.engine, seed=args.seed, **window.options(args),
+             **checkpoint.options(args))
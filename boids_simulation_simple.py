@@ -1,8 +1,21 @@
 import sys
+import functools
+import json
 import random
-import pygame
+import argparse
 from pygame.math import Vector2
 
+import checkpoint
+import headless
+import obstacles
+import window
+import flock_kernel
+from flock_kernel import KernelFlock
+from flock_numpy import ArrayFlock, FlockConfig, agents_state, object_pairs
+from flock_parallel import ParallelFlock
+from rendering import draw_obstacles, sprite_size, sprites
+from spatial_grid import SpatialGrid
+
 # PARAMÈTRES GLOBAUX
 WIDTH, HEIGHT = 1000, 720
 NUM_BOIDS = 100
@@ -12,209 +25,346 @@ MAX_FORCE = 0.05     # force (accélération) maximale
 
 NEIGHBOR_RADIUS = 70     # rayon de perception pour alignement / cohésion
 SEPARATION_RADIUS = 30   # distance minimale avant "repoussoir"
+WRAP_NEIGHBORS = True   # distances à l'image la plus proche sur le tore (cf. edges)
+# Niveau de détail de l'alignement / cohésion (moteurs numpy et parallel) :
+# 0 = paires exactes ; k = sommes par cellules de NEIGHBOR_RADIUS / k, exactes
+# si LOD_EXACT_BOUNDARY, sinon approchées (cf. FlockConfig.lod_cells)
+LOD_CELLS = 0
+LOD_EXACT_BOUNDARY = True
+MAX_NEIGHBORS = 0   # au plus ce nombre de voisins, les plus proches (0 = tous)
 
 W_ALIGNMENT = 1.0
 W_COHESION = 0.7
 W_SEPARATION = 1.5
 
+# Obstacles fixes (cf. obstacles.py) : ("circle", x, y, rayon), ("box", x0,
+# y0, x1, y1) ou ("wall", x0, y0, x1, y1, épaisseur). Évités à moins de
+# AVOID_RADIUS, avec le poids W_AVOID ; OBSTACLE_CELL : pas de la grille de
+# distances précalculée au lancement.
+OBSTACLES = []
+W_AVOID = 3.0
+AVOID_RADIUS = 40
+OBSTACLE_CELL = 8.0
+OBSTACLE_COLOR = (70, 75, 100)
+
 BACKGROUND_COLOR = (10, 10, 30)
 BOID_COLOR = (230, 230, 255)
 
 # FONCTIONS UTILITAIRES
 def limit_vector(vec: Vector2, max_value: float) -> Vector2:
-    """Limite la norme d'un vecteur à max_value."""
+    """Limite la norme d'un vecteur à max_value (sur place : renvoie vec)."""
     if vec.length() > max_value:
-        vec = vec.normalize() * max_value
+        vec.scale_to_length(max_value)
     return vec
 
 
 
 # CLASSE BOID
 class Boid:
-    def __init__(self, x=None, y=None):
+    # Pas de __dict__ par boid ; les trois vecteurs sont modifiés sur place
+    __slots__ = ("position", "velocity", "acceleration")
+
+    def __init__(self, x=None, y=None, rng=random):
         if x is None:
-            x = random.uniform(0, WIDTH)
+            x = rng.uniform(0, WIDTH)
         if y is None:
-            y = random.uniform(0, HEIGHT)
+            y = rng.uniform(0, HEIGHT)
 
         self.position = Vector2(x, y)
         # Vitesse initiale : direction aléatoire, norme entre 1 et MAX_SPEED
-        angle = random.uniform(0, 360)
-        self.velocity = Vector2(1, 0).rotate(angle) * random.uniform(1, MAX_SPEED)
+        angle = rng.uniform(0, 360)
+        self.velocity = Vector2(1, 0).rotate(angle) * rng.uniform(1, MAX_SPEED)
         self.acceleration = Vector2(0, 0)
 
-    def edges(self):
+    def edges(self, width, height):
         #Gestion des bords : on fait un 'wrap-around' (tore).
         if self.position.x < 0:
-            self.position.x = WIDTH
-        elif self.position.x > WIDTH:
+            self.position.x = width
+        elif self.position.x > width:
             self.position.x = 0
 
         if self.position.y < 0:
-            self.position.y = HEIGHT
-        elif self.position.y > HEIGHT:
+            self.position.y = height
+        elif self.position.y > height:
             self.position.y = 0
 
-    def update(self):
+    def update(self, max_speed, dt=1.0):
         # Met à jour la vitesse et la position du boid.
-        # Appliquer l'accélération à la vitesse
-        self.velocity += self.acceleration
-        self.velocity = limit_vector(self.velocity, MAX_SPEED)
+        # dt : durée du pas, en pas de référence à 60 Hz (1.0 = une frame)
+        # Tout se fait sur place : aucun Vector2 n'est créé à chaque pas
+        acc = self.acceleration
+        vel = self.velocity
 
-        # Mettre à jour la position
-        self.position += self.velocity
+        # Appliquer l'accélération à la vitesse
+        if dt != 1.0:
+            acc *= dt
+        vel += acc
+        limit_vector(vel, max_speed)
+
+        # Mettre à jour la position (position += vel * dt)
+        if dt != 1.0:
+            self.position.x += vel.x * dt
+            self.position.y += vel.y * dt
+        else:
+            self.position += vel
 
         # Réinitialiser l'accélération pour la frame suivante
-        self.acceleration = Vector2(0, 0)
+        acc.x = acc.y = 0.0
 
-    def apply_force(self, force: Vector2):
-        #Ajoute une force à l'accélération.
-        self.acceleration += force
+    def apply_force(self, force: Vector2, weight: float = 1.0):
+        #Ajoute weight * force à l'accélération, sans créer de vecteur.
+        acc = self.acceleration
+        acc.x += force.x * weight
+        acc.y += force.y * weight
 
     # COMPORTEMENTS DES BOIDS
-    def apply_behaviors(self, boids):
+    def apply_behaviors(self, neighbors, cfg):
         #Calcule et applique les forces de séparation, alignement et cohésion.
-        sep = self.separation(boids) * W_SEPARATION
-        ali = self.alignment(boids) * W_ALIGNMENT
-        coh = self.cohesion(boids) * W_COHESION
-
-        self.apply_force(sep)
-        self.apply_force(ali)
-        self.apply_force(coh)
-
-    def separation(self, boids):
-        #Évite les collisions avec les voisins trop proches.
-        steer = Vector2(0, 0)
-        total = 0
-
-        for other in boids:
-            if other is self:
-                continue
-            distance = self.position.distance_to(other.position)
-            if 0 < distance < SEPARATION_RADIUS:
-                # Vecteur qui pointe loin du voisin
-                diff = self.position - other.position
-                if distance > 0:
-                    diff /= distance  # plus fort si plus proche
-                steer += diff
-                total += 1
-
-        if total > 0:
-            steer /= total
-
-        if steer.length() > 0:
-            steer = steer.normalize() * MAX_SPEED - self.velocity
-            steer = limit_vector(steer, MAX_FORCE)
-
-        return steer
-
-    def alignment(self, boids):
-        #S'aligne sur la vitesse moyenne des voisins.
-        avg_velocity = Vector2(0, 0)
+        # neighbors : candidats des cellules voisines (cf. Flock.find_neighbors)
+        # cfg : paramètres résolus à la création du moteur (FlockConfig)
+        sep, ali, coh = self.flock(neighbors, cfg)
+
+        self.apply_force(sep, cfg.w_separation)
+        self.apply_force(ali, cfg.w_alignment)
+        self.apply_force(coh, cfg.w_cohesion)
+        self.avoid_obstacles(cfg)
+
+    def avoid_obstacles(self, cfg):
+        if cfg.obstacles is not None:
+            steer = obstacles.avoidance(self.position, self.velocity, cfg,
+                                        cfg.max_speed, cfg.max_force)
+            if steer is not None:
+                self.apply_force(Vector2(steer), cfg.w_avoid)
+
+    def flock(self, neighborhood, cfg):
+        #Séparation, alignement et cohésion en une seule passe sur les voisins :
+        #chaque distance n'est calculée qu'une fois pour les trois sommes.
+        # Paramètres en variables locales : rien n'est relu dans la boucle
+        separation_radius = cfg.separation_radius
+        neighbor_radius = cfg.neighbor_radius
+        max_speed = cfg.max_speed
+        max_force = cfg.max_force
+
+        sep_sum = Vector2(0, 0)
+        sep_total = 0
+        velocity_sum = Vector2(0, 0)
+        offset_sum = Vector2(0, 0)
         total = 0
 
-        for other in boids:
-            if other is self:
-                continue
-            distance = self.position.distance_to(other.position)
-            if distance < NEIGHBOR_RADIUS:
-                avg_velocity += other.velocity
-                total += 1
-
+        for offset, cell in neighborhood:
+            # Position de ce boid vue depuis la cellule (décalée de la taille
+            # du monde si la cellule est de l'autre côté du tore)
+            here = self.position - offset
+            for other in cell:
+                if other is self:
+                    continue
+                distance = here.distance_to(other.position)
+                if 0 < distance < separation_radius:
+                    # Vecteur qui pointe loin du voisin, plus fort si plus proche
+                    diff = here - other.position
+                    diff /= distance
+                    sep_sum += diff
+                    sep_total += 1
+                if distance < neighbor_radius:
+                    velocity_sum += other.velocity
+                    offset_sum += other.position - here
+                    total += 1
+
+        # Séparation : évite les collisions avec les voisins trop proches
+        sep = Vector2(0, 0)
+        if sep_total > 0:
+            sep = sep_sum / sep_total
+        if sep.length() > 0:
+            sep = sep.normalize() * max_speed - self.velocity
+            sep = limit_vector(sep, max_force)
+
+        ali = Vector2(0, 0)
+        coh = Vector2(0, 0)
         if total > 0:
-            avg_velocity /= total
+            # Alignement : s'aligne sur la vitesse moyenne des voisins
+            avg_velocity = velocity_sum / total
             if avg_velocity.length() > 0:
-                avg_velocity = avg_velocity.normalize() * MAX_SPEED
-                steer = avg_velocity - self.velocity
-                steer = limit_vector(steer, MAX_FORCE)
-                return steer
-
-        return Vector2(0, 0)
-
-    def cohesion(self, boids):
-        #Se dirige vers le centre de masse de ses voisins.
-        center_of_mass = Vector2(0, 0)
-        total = 0
-
-        for other in boids:
-            if other is self:
-                continue
-            distance = self.position.distance_to(other.position)
-            if distance < NEIGHBOR_RADIUS:
-                center_of_mass += other.position
-                total += 1
+                ali = avg_velocity.normalize() * max_speed - self.velocity
+                ali = limit_vector(ali, max_force)
 
-        if total > 0:
-            center_of_mass /= total
-            # 'seek' vers le centre de masse
-            desired = center_of_mass - self.position
+            # Cohésion : 'seek' vers le centre de masse des voisins
+            desired = offset_sum / total
             if desired.length() > 0:
-                desired = desired.normalize() * MAX_SPEED
-                steer = desired - self.velocity
-                steer = limit_vector(steer, MAX_FORCE)
-                return steer
+                coh = desired.normalize() * max_speed - self.velocity
+                coh = limit_vector(coh, max_force)
+
+        return sep, ali, coh
+
+
+# MOTEURS DE SIMULATION
+class Flock:
+    #Moteur de référence : un objet Boid par agent.
+    engine = "objects"
+
+    def __init__(self, boids, rng=None, config=None):
+        self.boids = boids
+        self.steps = 0  # pas effectués (cf. checkpoint)
+        self.neighbor_checks = 0
+        self.rng = rng
+        # Paramètres lus une fois pour toutes : les constantes du module ne
+        # sont plus consultées pendant les pas
+        cfg = self.config = config or flock_config()
+        self.neighbor_radius = cfg.neighbor_radius
+        self.wrap = cfg.wrap
+        self.size = (cfg.width, cfg.height)
+        # Grille de voisinage, reconstruite à chaque pas. Cellules d'au
+        # moins le plus grand des deux rayons : le bloc 3x3 couvre aussi la
+        # séparation quand SEPARATION_RADIUS dépasse NEIGHBOR_RADIUS
+        self.grid = SpatialGrid(cfg.width, cfg.height,
+                                max(cfg.neighbor_radius, cfg.separation_radius), wrap=cfg.wrap)
+
+    def __len__(self):
+        return len(self.boids)
+
+    def step(self, dt=1.0):
+        self.find_neighbors()
+        self.compute_forces()
+        self.integrate(dt)
+
+    def find_neighbors(self):
+        self.grid.rebuild(self.boids)
+        self.neighbors = [self.grid.neighborhood(boid.position) for boid in self.boids]
+        self.neighbor_checks = sum(len(cell) for hood in self.neighbors for _, cell in hood)
+
+    def compute_forces(self):
+        cfg = self.config
+        for boid, neighbors in zip(self.boids, self.neighbors):
+            boid.apply_behaviors(neighbors, cfg)
+
+    def integrate(self, dt=1.0):
+        max_speed = self.config.max_speed
+        width, height = self.size
+        for boid in self.boids:
+            boid.update(max_speed, dt)
+            boid.edges(width, height)
+        self.steps += 1
+
+    def neighbor_pairs(self):
+        return object_pairs(self.boids, self.neighbors)
+
+    def state(self):
+        return agents_state(self.boids)
+
+
+def flock_config():
+    """Paramètres de ce script pour le moteur NumPy."""
+    return FlockConfig(
+        width=WIDTH, height=HEIGHT,
+        max_speed=MAX_SPEED, max_force=MAX_FORCE,
+        neighbor_radius=NEIGHBOR_RADIUS, separation_radius=SEPARATION_RADIUS,
+        w_alignment=W_ALIGNMENT, w_cohesion=W_COHESION, w_separation=W_SEPARATION,
+        wrap=WRAP_NEIGHBORS,
+        lod_cells=LOD_CELLS, lod_exact_boundary=LOD_EXACT_BOUNDARY,
+        max_neighbors=MAX_NEIGHBORS,
+        obstacles=obstacles.bake(OBSTACLES, WIDTH, HEIGHT, AVOID_RADIUS, OBSTACLE_CELL,
+                                 WRAP_NEIGHBORS),
+        w_avoid=W_AVOID, avoid_radius=AVOID_RADIUS,
+    )
+
+
+def build_flock(engine, boids, rng=None):
+    """Moteur engine sur ces boids ; les constantes du module sont lues
+    ici, une seule fois (cf. flock_config)."""
+    config = flock_config()
+    if engine == "numpy":
+        return ArrayFlock.from_agents(config, boids, rng=rng)
+    if engine == "parallel":
+        return ParallelFlock.from_agents(config, boids, rng=rng)
+    # Moteur compilé si Numba est là, sinon moteur objet (Python pur)
+    if engine == "compiled" and flock_kernel.available():
+        return KernelFlock.from_agents(config, boids, rng=rng)
+    return Flock(boids, rng, config)
+
+
+def create_flock(engine="objects", seed=None):
+    # Générateur propre à la simulation : même graine, mêmes trajectoires
+    rng = random.Random(seed)
 
-        return Vector2(0, 0)
+    # Création des boids
+    boids = [Boid(rng=rng) for _ in range(NUM_BOIDS)]
+    return build_flock(engine, boids, rng)
 
-    # AFFICHAGE
-    def draw(self, surface):
-        #Dessine le boid comme un petit triangle orienté.
-        # Angle de la vitesse par rapport à l'axe x
-        angle = self.velocity.angle_to(Vector2(1, 0))
-        size = 8
 
-        # Triangle en coordonnées locales
-        # Pointe vers la direction +x, qu'on va ensuite faire tourner
-        points = [
-            Vector2(size, 0),           # pointe
-            Vector2(-size, size / 2),   # arrière bas
-            Vector2(-size, -size / 2),  # arrière haut
-        ]
+def restore_flock(state, engine="objects", rng=None):
+    """Reconstruit une simulation à partir d'un état (cf. Flock.state)."""
+    boids = []
+    for (x, y), (vx, vy) in zip(state["positions"], state["velocities"]):
+        boid = Boid(x, y)
+        boid.velocity = Vector2(vx, vy)
+        boids.append(boid)
+    return build_flock(engine, boids, rng)
 
-        # Rotation + translation vers la position du boid
-        rotated_points = [
-            self.position + p.rotate(-angle) for p in points
-        ]
 
-        pygame.draw.polygon(surface, BOID_COLOR, rotated_points)
+def draw_state(state, surface, camera=None, shapes=()):
+    """Dessine state ; shapes : obstacles déjà lus (cf. obstacles.field_shapes)."""
+    draw_obstacles(surface, shapes, OBSTACLE_COLOR, camera)
+    # Triangles pré-tournés aux couleurs actuelles, à l'échelle de la vue
+    # (cf. rendering.sprites, rendering.sprite_size)
+    boid_sprites = sprites({0: BOID_COLOR}, sprite_size(8, camera))
+    boid_sprites.draw(surface, state["positions"], state["velocities"])
 
 
 # FONCTION PRINCIPALE
-def main():
-    pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
-    pygame.display.set_caption("Swarm / Boids Simulation")
-    clock = pygame.time.Clock()
+def main(engine="objects", seed=None, resume_path=None, checkpoint_path=None,
+         checkpoint_every=0, **options):
+    flock, checkpoints = checkpoint.start(sys.modules[__name__], engine, seed, resume_path,
+                                          checkpoint_path, checkpoint_every)
+    draw = functools.partial(draw_state,
+                             shapes=obstacles.field_shapes(flock.config.obstacles))
+    window.run(flock, draw, "Swarm / Boids Simulation", (WIDTH, HEIGHT),
+               BACKGROUND_COLOR, checkpoints=checkpoints, **options)
+    sys.exit()
 
-    # Création des boids
-    boids = [Boid() for _ in range(NUM_BOIDS)]
 
-    running = True
-    while running:
-        clock.tick(60)  # 60 FPS
+def replay(path, screen_size=None):
+    """Rejoue une trajectoire enregistrée avec --record."""
+    draw = functools.partial(draw_state, shapes=tuple(obstacles.parse(OBSTACLES)))
+    window.replay(path, draw, "Swarm / Boids Simulation", (WIDTH, HEIGHT),
+                  BACKGROUND_COLOR, screen_size=screen_size)
+    sys.exit()
 
-        # Gestion des événements 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
 
-        # Logique de la simulation
-        for boid in boids:
-            boid.apply_behaviors(boids)
+def run_headless(steps, engine="objects", seed=None, resume_path=None, checkpoint_path=None,
+                 checkpoint_every=0, **options):
+    """Exécute steps pas sans fenêtre ni rendu ; renvoie (état final, métriques).
 
-        for boid in boids:
-            boid.update()
-            boid.edges()
+    resume_path : point de reprise à reprendre au lieu d'une nouvelle
+    simulation ; checkpoint_path : point de reprise écrit tous les
+    checkpoint_every pas et à la fin (cf. checkpoint).
+    """
+    flock, checkpoints = checkpoint.start(sys.modules[__name__], engine, seed, resume_path,
+                                          checkpoint_path, checkpoint_every)
+    return headless.run(flock, steps, checkpoints=checkpoints, **options)
 
-        # Rendu graphique
-        screen.fill(BACKGROUND_COLOR)
-        for boid in boids:
-            boid.draw(screen)
-        pygame.display.flip()
 
-    pygame.quit()
-    sys.exit()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulation de boids (essaim simple)")
+    parser.add_argument("--engine", choices=("objects", "numpy", "parallel", "compiled"),
+                        default="objects",
+                        help="objets Boid (référence), tableaux NumPy, tableaux NumPy "
+                             "répartis en tuiles sur tous les cœurs, ou noyau compilé "
+                             "par Numba (moteur objet si Numba est absente)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="graine : même graine et mêmes paramètres = mêmes trajectoires")
+    headless.add_arguments(parser)
+    window.add_arguments(parser)
+    checkpoint.add_arguments(parser)
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.replay:
+        replay(args.replay, args.screen)
+    elif args.headless:
+        _, summary = run_headless(args.steps, args.engine, args.seed,
+                                  **headless.options(args), **checkpoint.options(args))
+        print(json.dumps(summary, indent=2))
+    else:
+        main(engine=args.engine, seed=args.seed, **window.options(args),
+             **checkpoint.options(args))
@@ -0,0 +1,96 @@
+"""Caméra de la fenêtre : le monde et l'écran n'ont plus la même taille.
+
+La caméra montre une partie du monde (centre, zoom en pixels par unité du
+monde). Le monde est un tore (cf. Boid.edges) : une vue qui déborde d'un
+bord continue de l'autre côté. pieces() découpe la vue en rectangles du
+monde (au plus quatre, plus avec une marge à zoom minimal), chacun avec le
+décalage qui ramène ses agents dans le repère continu de la vue ; le rendu
+ne cherche des agents que dans ces rectangles (cf. chunks, window).
+
+Commandes (cf. window.camera_events) : glisser avec le bouton droit ou
+central, ou flèches (hors replay, où elles changent de pas) : déplacer ;
+molette, + / - : zoomer ; C : vue de départ.
+"""
+import math
+
+MAX_ZOOM = 8.0
+# Facteur de zoom par cran de molette / appui sur + ou -
+ZOOM_STEP = 1.15
+# Déplacement par frame avec les flèches, en pixels de l'écran
+PAN_SPEED = 12
+
+
+class Camera:
+    def __init__(self, world, screen):
+        # world, screen : (largeur, hauteur) du monde et de la fenêtre
+        self.world = world
+        self.screen = screen
+        # Zoom minimal : la vue ne dépasse jamais le monde
+        self.min_zoom = max(screen[0] / world[0], screen[1] / world[1])
+        self.reset()
+
+    def reset(self):
+        """Vue de départ : centre du monde, une unité par pixel."""
+        self.x = self.world[0] / 2
+        self.y = self.world[1] / 2
+        self.zoom = max(1.0, self.min_zoom)
+
+    @property
+    def origin(self):
+        """Point du monde en haut à gauche de l'écran (hors du monde si la
+        vue passe un bord)."""
+        return (self.x - self.screen[0] / 2 / self.zoom,
+                self.y - self.screen[1] / 2 / self.zoom)
+
+    def pan(self, dx, dy):
+        """Déplace la vue de (dx, dy) pixels de l'écran."""
+        self.x = (self.x + dx / self.zoom) % self.world[0]
+        self.y = (self.y + dy / self.zoom) % self.world[1]
+
+    def zoom_at(self, factor, point=None):
+        """Multiplie le zoom par factor ; le point du monde sous point
+        (pixels de l'écran, centre par défaut) reste en place."""
+        if point is None:
+            point = (self.screen[0] / 2, self.screen[1] / 2)
+        ox, oy = self.origin
+        wx = ox + point[0] / self.zoom
+        wy = oy + point[1] / self.zoom
+        self.zoom = min(max(self.zoom * factor, self.min_zoom), MAX_ZOOM)
+        self.x = (wx + (self.screen[0] / 2 - point[0]) / self.zoom) % self.world[0]
+        self.y = (wy + (self.screen[1] / 2 - point[1]) / self.zoom) % self.world[1]
+
+    def pieces(self, margin=0.0):
+        """Rectangles du monde vus à l'écran : (x0, y0, x1, y1, dx, dy), où
+        (dx, dy) ramène un point du rectangle dans le repère de la vue.
+        margin : pixels de l'écran ajoutés autour de la vue (taille des
+        sprites, déplacement depuis le dernier état)."""
+        width, height = self.world
+        pad = margin / self.zoom
+        ox, oy = self.origin
+        x_spans = _spans(ox - pad, ox + self.screen[0] / self.zoom + pad, width)
+        y_spans = _spans(oy - pad, oy + self.screen[1] / self.zoom + pad, height)
+        return [(x0, y0, x1, y1, dx, dy)
+                for y0, y1, dy in y_spans for x0, x1, dx in x_spans]
+
+    def to_screen(self, positions):
+        """Positions dans le repère de la vue (décalées, cf. pieces) en
+        pixels de l'écran (nouveau tableau)."""
+        screen = positions - self.origin
+        screen *= self.zoom
+        return screen
+
+    def point_to_screen(self, x, y, dx=0.0, dy=0.0):
+        ox, oy = self.origin
+        return (x + dx - ox) * self.zoom, (y + dy - oy) * self.zoom
+
+
+def _spans(low, high, length):
+    # [low, high] découpé par les bords d'un axe de longueur length :
+    # (début, fin, décalage) dans [0, length]
+    spans = []
+    for k in range(math.floor(low / length), math.floor(high / length) + 1):
+        start = max(low, k * length) - k * length
+        end = min(high, (k + 1) * length) - k * length
+        if end > start:
+            spans.append((start, end, k * length))
+    return spans
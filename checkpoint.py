@@ -0,0 +1,176 @@
+"""Points de reprise : sauvegarde complète d'une simulation et reprise exacte.
+
+Un point de reprise est une archive .npz contenant les tableaux de l'état
+(cf. Flock.state) et, en JSON, le script, le moteur, le nombre de pas
+effectués, l'état du générateur aléatoire, les constantes du script et,
+s'il y en a un, l'état du cycle de vie (cf. population).
+Reprendre depuis un point de reprise donne la même suite qu'une exécution
+ininterrompue.
+
+L'écriture périodique se fait dans un thread : la boucle de simulation ne
+fait que copier l'état (Flock.state renvoie des copies), la compression et
+l'écriture sur disque se font en arrière-plan.
+"""
+import json
+import os
+import random
+import threading
+from pathlib import Path
+
+import numpy as np
+
+VERSION = 1
+
+
+def script_name(module):
+    # Nom du fichier plutôt que __name__, qui vaut "__main__" pour un script lancé
+    return Path(module.__file__).stem
+
+
+def constants(module):
+    """Constantes (noms en majuscules) du script, sérialisables en JSON."""
+    values = {}
+    for name, value in vars(module).items():
+        if name.isupper() and isinstance(value, (bool, int, float, str, list, tuple)):
+            values[name] = value
+    return json.loads(json.dumps(values))
+
+
+def capture(flock, module):
+    """Copie de tout ce qu'il faut pour reprendre flock : (état, méta-données)."""
+    meta = {
+        "version": VERSION,
+        "script": script_name(module),
+        "engine": flock.engine,
+        "steps": flock.steps,
+        "rng": flock.rng.getstate() if flock.rng is not None else None,
+        "constants": constants(module),
+    }
+    life = getattr(flock, "life", None)
+    if life is not None:
+        meta["life"] = life.state(flock)
+    return flock.state(), meta
+
+
+def save(path, state, meta):
+    # Fichier temporaire puis renommage : un arrêt brutal pendant l'écriture
+    # laisse le point de reprise précédent intact
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, meta=json.dumps(meta), **state)
+    os.replace(tmp, path)
+
+
+def load(path):
+    """(état, méta-données) d'un point de reprise."""
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        state = {key: data[key] for key in data.files if key != "meta"}
+    if meta.get("version") != VERSION:
+        raise ValueError(f"{path} : version de point de reprise non prise en charge")
+    return state, meta
+
+
+def resume(path, module):
+    """Reconstruit la simulation sauvegardée dans path.
+
+    Les constantes du script sont d'abord remises aux valeurs sauvegardées,
+    puis module.restore_flock reconstruit le moteur d'origine.
+    """
+    state, meta = load(path)
+    if meta["script"] != script_name(module):
+        raise ValueError(f"{path} a été écrit par {meta['script']}, pas par "
+                         f"{script_name(module)}")
+    for name, value in meta["constants"].items():
+        setattr(module, name, value)
+
+    rng = random.Random()
+    if meta["rng"] is not None:
+        version, internal, gauss = meta["rng"]
+        rng.setstate((version, tuple(internal), gauss))
+    flock = module.restore_flock(state, meta["engine"], rng)
+    flock.steps = meta["steps"]
+    if meta.get("life") is not None and flock.life is not None:
+        flock.life.restore(flock, meta["life"])
+    return flock
+
+
+class Writer:
+    """Écrit un point de reprise tous les every pas, dans un thread.
+
+    Si l'écriture précédente n'est pas finie, la nouvelle copie remplace
+    celle en attente : la boucle n'attend jamais le disque.
+    """
+
+    def __init__(self, path, module, every=0):
+        self.path = path
+        self.module = module
+        self.every = every
+        self._pending = None
+        self._stop = False
+        self._ready = threading.Condition()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def after_step(self, flock):
+        if self.every > 0 and flock.steps % self.every == 0:
+            self.submit(flock)
+
+    def submit(self, flock):
+        snapshot = capture(flock, self.module)
+        with self._ready:
+            self._pending = snapshot
+            self._ready.notify()
+
+    def _loop(self):
+        while True:
+            with self._ready:
+                while self._pending is None and not self._stop:
+                    self._ready.wait()
+                snapshot, self._pending = self._pending, None
+                if snapshot is None:
+                    return
+            save(self.path, *snapshot)
+
+    def close(self, flock=None):
+        """Écrit le dernier état de flock (si donné) et attend la fin des écritures."""
+        if flock is not None:
+            self.submit(flock)
+        with self._ready:
+            self._stop = True
+            self._ready.notify()
+        self._thread.join()
+
+
+def start(module, engine="objects", seed=None, resume_path=None,
+          checkpoint_path=None, checkpoint_every=0):
+    """(flock, writer) : nouvelle simulation, ou reprise de resume_path.
+
+    writer (None si checkpoint_path est None) écrit dans checkpoint_path
+    tous les checkpoint_every pas, puis à la fin de l'exécution.
+    """
+    if resume_path is not None:
+        flock = resume(resume_path, module)
+    else:
+        flock = module.create_flock(engine, seed)
+    writer = None
+    if checkpoint_path is not None:
+        writer = Writer(checkpoint_path, module, checkpoint_every)
+    return flock, writer
+
+
+def add_arguments(parser):
+    parser.add_argument("--checkpoint", default=None,
+                        help="fichier .npz du point de reprise (écrit en fin d'exécution)")
+    parser.add_argument("--checkpoint-every", type=int, default=0,
+                        help="écrit aussi le point de reprise tous les K pas")
+    parser.add_argument("--resume", default=None,
+                        help="reprend la simulation d'un point de reprise")
+
+
+def options(args):
+    return {
+        "resume_path": args.resume,
+        "checkpoint_path": args.checkpoint,
+        "checkpoint_every": args.checkpoint_every,
+    }
@@ -0,0 +1,451 @@
+"""Moteur compilé : forces et intégration d'un pas en boucles simples sur des
+tableaux plats, compilées par Numba si elle est installée.
+
+Les noyaux ci-dessous sont du Python ordinaire (boucles sur des tableaux
+float64, aucun Vector2) : Numba les compile au premier appel et garde le
+code machine sur disque (cache=True, dans __pycache__ ou NUMBA_CACHE_DIR),
+si bien que les lancements suivants ne recompilent rien. Sans Numba, les
+scripts reprennent le moteur objet (cf. available et build_flock).
+
+Le calcul est celui de Boid.apply_behaviors / ArrayFlock en mode exact
+(lod_cells et max_neighbors ne sont pas pris en charge) ; seuls l'ordre des
+sommes et les égalités de distances peuvent différer, d'où des écarts de
+l'ordre de l'arrondi flottant.
+"""
+import math
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+import obstacles
+from flock_numpy import ArrayFlock
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _jit(function):
+    if numba is None:
+        return function
+    # nogil : le thread de rendu continue pendant un pas (cf. window --threaded)
+    return numba.njit(cache=True, nogil=True)(function)
+
+
+# Paramètres d'un FlockConfig sous une forme que les noyaux compilés
+# acceptent (tuple nommé de nombres), résolus une fois à la création
+KernelParams = namedtuple("KernelParams", (
+    "width", "height", "wrap", "team_filter",
+    "max_speed", "max_force", "neighbor_radius", "separation_radius",
+    "w_alignment", "w_cohesion", "w_separation",
+    "w_flee", "flee_radius", "predator_speed", "predator_force", "predator_radius",
+    "w_avoid", "avoid_radius",
+))
+
+
+def kernel_params(config):
+    values = {name: getattr(config, name) for name in KernelParams._fields}
+    if config.obstacles is None:
+        # Aucun obstacle : l'évitement n'est pas calculé (cf. step)
+        values["w_avoid"] = 0.0
+    return KernelParams(**{
+        name: bool(value) if name in ("wrap", "team_filter") else float(value)
+        for name, value in values.items()
+    })
+
+
+def field_arrays(config):
+    """Grille des obstacles (obstacles.DistanceField) sous forme de tableaux :
+    ((cols, rows), tile_index, distance, normal_x, normal_y) ; une seule
+    tuile vide sans obstacle."""
+    field = config.obstacles
+    if field is None:
+        field = obstacles.DistanceField((), config.width, config.height, 0.0)
+    return (np.array([field.cols, field.rows], dtype=np.int64), field.tile_index,
+            field.distance, field.normal_x, field.normal_y)
+
+
+_warned = False
+
+
+def available():
+    """Vrai si Numba est installée ; sinon le signale une fois sur stderr."""
+    global _warned
+    if numba is None and not _warned:
+        print("Numba absente : moteur objet (Python pur) à la place du moteur compilé",
+              file=sys.stderr)
+        _warned = True
+    return numba is not None
+
+
+@_jit
+def _offset(d, length, wrap):
+    # Différence de coordonnées ramenée à l'image la plus proche sur un tore
+    if wrap:
+        if d > length / 2:
+            return d - length
+        if d < -length / 2:
+            return d + length
+    return d
+
+
+@_jit
+def _steer(dx, dy, vx, vy, speed, force):
+    # (dx, dy) normalisé * speed - (vx, vy), limité à force ; nul si
+    # (dx, dy) l'est
+    norm = math.sqrt(dx * dx + dy * dy)
+    if norm == 0.0:
+        return 0.0, 0.0
+    sx = dx / norm * speed - vx
+    sy = dy / norm * speed - vy
+    length = math.sqrt(sx * sx + sy * sy)
+    if length > force:
+        sx *= force / length
+        sy *= force / length
+    return sx, sy
+
+
+@_jit
+def _bin(positions, cols, rows, cell_w, cell_h):
+    # Tri des boids par cellule (tri par dénombrement) : les boids de la
+    # cellule c sont order[start[c]:start[c + 1]]
+    n = len(positions)
+    cell = np.empty(n, np.int64)
+    start = np.zeros(cols * rows + 1, np.int64)
+    for k in range(n):
+        cx = min(max(int(positions[k, 0] / cell_w), 0), cols - 1)
+        cy = min(max(int(positions[k, 1] / cell_h), 0), rows - 1)
+        cell[k] = cy * cols + cx
+        start[cell[k] + 1] += 1
+    for c in range(cols * rows):
+        start[c + 1] += start[c]
+    fill = start[:-1].copy()
+    order = np.empty(n, np.int64)
+    for k in range(n):
+        order[fill[cell[k]]] = k
+        fill[cell[k]] += 1
+    return order, start
+
+
+@_jit
+def bin_agents(positions, width, height, cell_size):
+    """Grille des positions, cellules de côté >= cell_size : (order, start,
+    cols, rows), cf. _bin. Construite une fois par pas et partagée par les
+    noyaux qui cherchent dans ces positions."""
+    cols = max(int(width // cell_size), 1)
+    rows = max(int(height // cell_size), 1)
+    order, start = _bin(positions, cols, rows, width / cols, height / rows)
+    return order, start, cols, rows
+
+
+@_jit
+def _nearest(x, y, positions, grid, radius, p):
+    # (ligne, dx, dy) de la position la plus proche de (x, y) à distance <=
+    # radius, ou (-1, 0, 0). Anneaux de cellules du centre vers l'extérieur,
+    # comme CellIndex.nearest : on s'arrête dès qu'aucun anneau restant ne
+    # peut contenir plus proche, au plus tard à celui qui couvre radius.
+    order, start, cols, rows = grid
+    cell_w = p.width / cols
+    cell_h = p.height / rows
+    cx = min(max(int(x / cell_w), 0), cols - 1)
+    cy = min(max(int(y / cell_h), 0), rows - 1)
+    size = min(cell_w, cell_h)
+    # Au-delà de max(cols, rows) anneaux, toutes les cellules ont été vues
+    last = min(int(math.ceil(radius / size)), max(cols, rows))
+    best = radius
+    found = -1
+    bx = by = 0.0
+    for ring in range(last + 1):
+        # Tout point de cet anneau est à plus de (ring - 1) cellules
+        if found >= 0 and best <= (ring - 1) * size:
+            break
+        for gy in range(cy - ring, cy + ring + 1):
+            if not p.wrap and (gy < 0 or gy >= rows):
+                continue
+            # Lignes du haut et du bas entières, deux cellules ailleurs
+            side = gy == cy - ring or gy == cy + ring
+            for gx in range(cx - ring, cx + ring + 1, 1 if side else max(2 * ring, 1)):
+                if not p.wrap and (gx < 0 or gx >= cols):
+                    continue
+                c = (gy % rows) * cols + gx % cols
+                for s in range(start[c], start[c + 1]):
+                    j = order[s]
+                    dx = _offset(positions[j, 0] - x, p.width, p.wrap)
+                    dy = _offset(positions[j, 1] - y, p.height, p.wrap)
+                    dist = math.sqrt(dx * dx + dy * dy)
+                    if dist < best or (found < 0 and dist <= best):
+                        best = dist
+                        found = j
+                        bx = dx
+                        by = dy
+    return found, bx, by
+
+
+@_jit
+def _span(c, count, wrap):
+    # Cellules voisines de c sur un axe : c - 1 .. c + 1, ou toutes s'il y
+    # en a moins de 3 (chacune n'est alors visitée qu'une fois)
+    if count < 3:
+        return 0, count
+    if wrap:
+        return c - 1, c + 2
+    return max(c - 1, 0), min(c + 2, count)
+
+
+@_jit
+def boid_forces(positions, velocities, teams, predator_positions, accelerations,
+                grid, predator_grid, p):
+    """Ajoute à accelerations les forces des boids : groupe, ou fuite pour
+    ceux qui fuient. grid : grille des boids (cellules >= rayons de
+    voisinage), predator_grid : celle des prédateurs (cellules >=
+    flee_radius), cf. bin_agents. Renvoie le nombre de paires candidates
+    examinées."""
+    n = len(positions)
+    order, start, cols, rows = grid
+    checks = 0
+
+    for i in range(n):
+        x = positions[i, 0]
+        y = positions[i, 1]
+        vx = velocities[i, 0]
+        vy = velocities[i, 1]
+
+        # Fuite face au prédateur le plus proche à distance <= flee_radius,
+        # cherché dans les cellules des prédateurs autour du boid
+        fx = 0.0
+        fy = 0.0
+        if len(predator_positions):
+            k, dx, dy = _nearest(x, y, predator_positions, predator_grid, p.flee_radius, p)
+            if k >= 0:
+                fx, fy = _steer(-dx, -dy, vx, vy, p.max_speed, p.max_force)
+        fx *= p.w_flee
+        fy *= p.w_flee
+        if fx != 0.0 or fy != 0.0:
+            accelerations[i, 0] += fx
+            accelerations[i, 1] += fy
+            continue
+
+        sep_x = sep_y = 0.0
+        sep_count = 0
+        vel_x = vel_y = 0.0
+        rel_x = rel_y = 0.0
+        count = 0
+        cx = min(max(int(x / (p.width / cols)), 0), cols - 1)
+        cy = min(max(int(y / (p.height / rows)), 0), rows - 1)
+        x0, x1 = _span(cx, cols, p.wrap)
+        y0, y1 = _span(cy, rows, p.wrap)
+        for gy in range(y0, y1):
+            for gx in range(x0, x1):
+                c = (gy % rows) * cols + gx % cols
+                for s in range(start[c], start[c + 1]):
+                    j = order[s]
+                    if j == i:
+                        continue
+                    checks += 1
+                    # Vecteur i -> j (image la plus proche sur un tore)
+                    dx = _offset(positions[j, 0] - x, p.width, p.wrap)
+                    dy = _offset(positions[j, 1] - y, p.height, p.wrap)
+                    dist = math.sqrt(dx * dx + dy * dy)
+                    if 0.0 < dist < p.separation_radius:
+                        sep_x -= dx / dist
+                        sep_y -= dy / dist
+                        sep_count += 1
+                    if dist < p.neighbor_radius and (not p.team_filter or teams[j] == teams[i]):
+                        vel_x += velocities[j, 0]
+                        vel_y += velocities[j, 1]
+                        rel_x += dx
+                        rel_y += dy
+                        count += 1
+
+        ax = ay = 0.0
+        if sep_count > 0:
+            sx, sy = _steer(sep_x / sep_count, sep_y / sep_count, vx, vy,
+                            p.max_speed, p.max_force)
+            ax += sx * p.w_separation
+            ay += sy * p.w_separation
+        if count > 0:
+            sx, sy = _steer(vel_x / count, vel_y / count, vx, vy, p.max_speed, p.max_force)
+            ax += sx * p.w_alignment
+            ay += sy * p.w_alignment
+            sx, sy = _steer(rel_x / count, rel_y / count, vx, vy, p.max_speed, p.max_force)
+            ax += sx * p.w_cohesion
+            ay += sy * p.w_cohesion
+        accelerations[i, 0] += ax
+        accelerations[i, 1] += ay
+    return checks
+
+
+@_jit
+def predator_forces(predator_positions, predator_velocities, positions, accelerations,
+                    targets, grid, p):
+    """Force de poursuite de chaque prédateur vers le boid le plus proche
+    à distance <= predator_radius (écrite dans accelerations), cherché par
+    anneaux dans grid, la grille des boids ; targets reçoit la ligne de ce
+    boid (-1 : aucun)."""
+    for k in range(len(predator_positions)):
+        j, tx, ty = _nearest(predator_positions[k, 0], predator_positions[k, 1],
+                             positions, grid, p.predator_radius, p)
+        targets[k] = j
+        accelerations[k, 0], accelerations[k, 1] = _steer(
+            tx, ty, predator_velocities[k, 0], predator_velocities[k, 1],
+            p.predator_speed, p.predator_force)
+
+
+@_jit
+def _blend(grid, tile, i, j, tx, ty):
+    return ((grid[tile, j, i] * (1 - tx) + grid[tile, j, i + 1] * tx) * (1 - ty)
+            + (grid[tile, j + 1, i] * (1 - tx) + grid[tile, j + 1, i + 1] * tx) * ty)
+
+
+@_jit
+def avoid_forces(positions, velocities, accelerations, field, max_speed, max_force, p):
+    """Ajoute à accelerations la force d'évitement des obstacles
+    (DistanceField.sample, puis comme ArrayFlock.avoid_forces)."""
+    dims, tile_index, distance, normal_x, normal_y = field
+    cols = dims[0]
+    rows = dims[1]
+    tile_size = distance.shape[1] - 1
+    cell_w = p.width / cols
+    cell_h = p.height / rows
+    for k in range(len(positions)):
+        fx = positions[k, 0] / cell_w
+        fy = positions[k, 1] / cell_h
+        i = min(max(int(math.floor(fx)), 0), cols - 1)
+        j = min(max(int(math.floor(fy)), 0), rows - 1)
+        tx = min(max(fx - i, 0.0), 1.0)
+        ty = min(max(fy - j, 0.0), 1.0)
+        tile = tile_index[j // tile_size, i // tile_size]
+        i %= tile_size
+        j %= tile_size
+        if _blend(distance, tile, i, j, tx, ty) < p.avoid_radius:
+            sx, sy = _steer(_blend(normal_x, tile, i, j, tx, ty),
+                            _blend(normal_y, tile, i, j, tx, ty),
+                            velocities[k, 0], velocities[k, 1], max_speed, max_force)
+            accelerations[k, 0] += sx * p.w_avoid
+            accelerations[k, 1] += sy * p.w_avoid
+
+
+@_jit
+def integrate(positions, velocities, accelerations, max_speed, width, height, dt):
+    """Même intégration que integrate_rows (sur place)."""
+    for i in range(len(positions)):
+        vx = velocities[i, 0] + accelerations[i, 0] * dt
+        vy = velocities[i, 1] + accelerations[i, 1] * dt
+        speed = math.sqrt(vx * vx + vy * vy)
+        if speed > max_speed:
+            vx *= max_speed / speed
+            vy *= max_speed / speed
+        velocities[i, 0] = vx
+        velocities[i, 1] = vy
+        x = positions[i, 0] + vx * dt
+        y = positions[i, 1] + vy * dt
+        if x < 0:
+            x = width
+        elif x > width:
+            x = 0.0
+        if y < 0:
+            y = height
+        elif y > height:
+            y = 0.0
+        positions[i, 0] = x
+        positions[i, 1] = y
+        accelerations[i, 0] = 0.0
+        accelerations[i, 1] = 0.0
+
+
+@_jit
+def bin_step(positions, predator_positions, p):
+    """Grilles d'un pas : boids (voisinage et chasse) et prédateurs (fuite)."""
+    grid = bin_agents(positions, p.width, p.height,
+                      max(p.neighbor_radius, p.separation_radius))
+    predator_grid = bin_agents(predator_positions, p.width, p.height, p.flee_radius)
+    return grid, predator_grid
+
+
+@_jit
+def step(positions, velocities, teams, accelerations,
+         predator_positions, predator_velocities, predator_accelerations, targets, field,
+         p, dt):
+    """Un pas complet (forces sur l'état du début du pas, puis intégration)
+    en un seul appel ; renvoie le nombre de paires candidates examinées."""
+    grid, predator_grid = bin_step(positions, predator_positions, p)
+    predator_forces(predator_positions, predator_velocities, positions,
+                    predator_accelerations, targets, grid, p)
+    checks = boid_forces(positions, velocities, teams, predator_positions, accelerations,
+                         grid, predator_grid, p)
+    if p.w_avoid != 0.0:
+        avoid_forces(predator_positions, predator_velocities, predator_accelerations, field,
+                     p.predator_speed, p.predator_force, p)
+        avoid_forces(positions, velocities, accelerations, field, p.max_speed, p.max_force, p)
+    integrate(predator_positions, predator_velocities, predator_accelerations,
+              p.predator_speed, p.width, p.height, dt)
+    integrate(positions, velocities, accelerations, p.max_speed, p.width, p.height, dt)
+    return checks
+
+
+class KernelFlock(ArrayFlock):
+    """Mêmes tableaux et même interface que ArrayFlock ; un pas est un seul
+    appel au noyau compilé (step)."""
+    engine = "compiled"
+    # Voisins cherchés par le noyau, dans compute_forces (cf. find_neighbors)
+    neighbors_in_forces = True
+
+    def __init__(self, config, positions, velocities, teams=None,
+                 predator_positions=None, predator_velocities=None, rng=None,
+                 capacity=None):
+        if config.lod_cells or config.max_neighbors:
+            raise ValueError("le moteur compilé ne calcule que le mode exact "
+                             "(LOD_CELLS = MAX_NEIGHBORS = 0)")
+        super().__init__(config, positions, velocities, teams,
+                         predator_positions, predator_velocities, rng, capacity=capacity)
+        self.params = kernel_params(config)
+        self.field = field_arrays(config)
+        self.neighbor_checks = 0
+        self._targets = np.full(len(self.predator_positions), -1, dtype=np.int64)
+
+    def find_neighbors(self):
+        # Chaque appel au noyau range lui-même les boids par cellule ; il ne
+        # reste que le cycle de vie
+        if self.life is not None:
+            self.life.update(self)
+
+    def neighbor_pairs(self):
+        """Paires candidates de l'état courant, par ArrayFlock (métriques)."""
+        self.index_neighbors()
+        return super().neighbor_pairs()
+
+    def compute_forces(self):
+        grid, predator_grid = bin_step(self.positions, self.predator_positions, self.params)
+        predator_forces(self.predator_positions, self.predator_velocities,
+                        self.positions, self.predator_accelerations, self._targets,
+                        grid, self.params)
+        self.predator_targets = self._targets
+        self.neighbor_checks = boid_forces(self.positions, self.velocities, self.teams,
+                                           self.predator_positions, self.accelerations,
+                                           grid, predator_grid, self.params)
+        p = self.params
+        if p.w_avoid != 0.0:
+            avoid_forces(self.predator_positions, self.predator_velocities,
+                         self.predator_accelerations, self.field,
+                         p.predator_speed, p.predator_force, p)
+            avoid_forces(self.positions, self.velocities, self.accelerations, self.field,
+                         p.max_speed, p.max_force, p)
+
+    def integrate(self, dt=1.0):
+        p = self.params
+        integrate(self.predator_positions, self.predator_velocities,
+                  self.predator_accelerations, p.predator_speed, p.width, p.height, dt)
+        integrate(self.positions, self.velocities, self.accelerations,
+                  p.max_speed, p.width, p.height, dt)
+        self.steps += 1
+
+    def step(self, dt=1.0):
+        self.find_neighbors()
+        self.neighbor_checks = step(self.positions, self.velocities, self.teams,
+                                    self.accelerations, self.predator_positions,
+                                    self.predator_velocities, self.predator_accelerations,
+                                    self._targets, self.field, self.params, float(dt))
+        self.predator_targets = self._targets
+        self.steps += 1
@@ -0,0 +1,774 @@
+"""Moteur NumPy "structure of arrays" pour les trois simulations de boids.
+
+Positions, vitesses, accélérations et équipes sont rangées dans des tableaux
+contigus ; les forces de séparation, d'alignement et de cohésion sont
+calculées par paires candidates issues d'une grille uniforme, en un nombre
+constant d'appels NumPy par bloc de paires (et non par boid).
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from population import remove_rows
+
+
+# Nombre maximal de paires candidates traitées d'un coup (borne la mémoire)
+PAIR_BLOCK = 2_000_000
+
+
+@dataclass(frozen=True)
+class FlockConfig:
+    width: float
+    height: float
+    max_speed: float
+    max_force: float
+    neighbor_radius: float
+    separation_radius: float
+    w_alignment: float
+    w_cohesion: float
+    w_separation: float
+    # alignement / cohésion limités aux boids de la même équipe
+    team_filter: bool = False
+    # prédateurs (boids_simulation_pred.py)
+    w_flee: float = 0.0
+    flee_radius: float = 120.0
+    predator_speed: float = 0.0
+    predator_force: float = 0.0
+    predator_radius: float = 0.0
+    # monde torique : distances à l'image la plus proche (cf. Boid.edges)
+    wrap: bool = False
+    # Niveau de détail de l'alignement et de la cohésion. 0 : paires
+    # exactes. k > 0 : sommes par cellule de côté neighbor_radius / k ; une
+    # cellule entièrement dans le rayon compte en bloc, une cellule coupée
+    # par le cercle est parcourue paire par paire (lod_exact_boundary) ou
+    # comptée en entier si son centre est dans le rayon (approché)
+    lod_cells: int = 0
+    lod_exact_boundary: bool = True
+    # Au plus max_neighbors voisins, les plus proches (0 : tous) ; sans effet
+    # avec lod_cells
+    max_neighbors: int = 0
+    # Obstacles fixes (obstacles.DistanceField, None : aucun), évités à
+    # moins de avoid_radius par les boids et les prédateurs
+    obstacles: object = None
+    w_avoid: float = 0.0
+    avoid_radius: float = 0.0
+
+
+def limit_rows(vec, max_value):
+    """Limite la norme de chaque ligne de vec à max_value (sur place)."""
+    norm = np.hypot(vec[:, 0], vec[:, 1])
+    over = norm > max_value
+    vec[over] *= (max_value / norm[over])[:, None]
+    return vec
+
+
+def min_image(diff, size):
+    """Ramène chaque différence de positions à l'image la plus proche sur
+    un tore de dimensions size (sur place)."""
+    diff -= size * np.rint(diff / size)
+    return diff
+
+
+def nearest_k(i, dist, k):
+    """Masque des paires (i, j) qui sont parmi les k plus proches de leur i."""
+    order = np.lexsort((dist, i))
+    sorted_i = i[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_i, sorted_i)
+    keep = np.zeros(len(i), dtype=bool)
+    keep[order[rank < k]] = True
+    return keep
+
+
+def steer_rows(desired, velocity, max_speed, max_force, active):
+    # desired.normalize() * max_speed - velocity, limité à max_force,
+    # seulement là où active et |desired| > 0 ; vecteur nul ailleurs.
+    norm = np.hypot(desired[:, 0], desired[:, 1])
+    active = active & (norm > 0)
+    steer = np.zeros_like(desired)
+    steer[active] = (desired[active] / norm[active, None]) * max_speed - velocity[active]
+    return limit_rows(steer, max_force)
+
+
+class CellIndex:
+    """Grille uniforme sur un tableau de positions (points triés par cellule).
+
+    build() range les points indexés ; around() donne, pour des points de
+    requête, les cellules du bloc (2·reach + 1)² qui les entoure et le
+    nombre de points indexés dans chacune ; pairs() en tire les paires
+    candidates par blocs. Sur un tore (wrap), les blocs de bord voient
+    l'autre côté et chaque cellule n'est visitée qu'une fois : min_image
+    choisit ensuite l'image la plus proche.
+
+    Les points peuvent être répartis en couches (une par équipe) : chaque
+    couche a ses propres cellules, et une requête faite dans une couche ne
+    voit jamais les points des autres.
+    """
+
+    def __init__(self, width, height, cell_size, wrap=False):
+        self.cols = max(1, int(width // cell_size))
+        self.rows = max(1, int(height // cell_size))
+        self.cell_w = width / self.cols
+        self.cell_h = height / self.rows
+        self.wrap = wrap
+
+    def reach(self, radius):
+        """Nombre d'anneaux de cellules à parcourir pour couvrir radius."""
+        return max(1, int(np.ceil(radius / min(self.cell_w, self.cell_h))))
+
+    def cells(self, positions):
+        cx = np.clip((positions[:, 0] / self.cell_w).astype(np.intp), 0, self.cols - 1)
+        cy = np.clip((positions[:, 1] / self.cell_h).astype(np.intp), 0, self.rows - 1)
+        return cx, cy
+
+    def build(self, positions, layers=None, num_layers=1):
+        """Range les points ; layers : couche (0 .. num_layers - 1) de chacun."""
+        cx, cy = self.cells(positions)
+        cell = cy * self.cols + cx
+        if layers is not None:
+            cell += layers * (self.cols * self.rows)
+        self.cell = cell
+        self.order = np.argsort(cell, kind="stable")
+        counts = np.bincount(cell, minlength=self.cols * self.rows * num_layers)
+        self.counts = counts
+        self.starts = np.cumsum(counts) - counts
+
+    def sums(self, values):
+        """Somme de values (une ligne par point indexé) dans chaque cellule."""
+        return np.stack([np.bincount(self.cell, values[:, axis], len(self.counts))
+                         for axis in range(values.shape[1])], axis=1)
+
+    def narrow(self, reach):
+        """Vrai si, sur un tore, le bloc de reach anneaux fait le tour du monde."""
+        return self.wrap and 2 * reach + 1 > min(self.cols, self.rows)
+
+    def _shifts(self, count, reach):
+        if self.wrap and 2 * reach + 1 > count:
+            return range(count)
+        return range(-reach, reach + 1)
+
+    def around(self, points, reach=1, layers=None):
+        """Cellules voisines de chaque point et nombre de candidats, (k, n).
+
+        layers : couche de chaque point de requête (cf. build).
+        """
+        return self._block(points, [(dx, dy) for dy in self._shifts(self.rows, reach)
+                                    for dx in self._shifts(self.cols, reach)], layers)
+
+    def ring(self, points, ring):
+        """Comme around, limité aux cellules à exactement ring cellules du
+        point (sur un tore étroit, une cellule peut y revenir plusieurs fois)."""
+        return self._block(points, [(dx, dy) for dy in range(-ring, ring + 1)
+                                    for dx in range(-ring, ring + 1)
+                                    if max(abs(dx), abs(dy)) == ring])
+
+    def _block(self, points, shifts, layers=None):
+        n = len(points)
+        cx, cy = self.cells(points)
+        base = 0 if layers is None else layers * (self.cols * self.rows)
+        neighbor_cells = []
+        lengths = []
+        for dx, dy in shifts:
+            ncx = cx + dx
+            ncy = cy + dy
+            if self.wrap:
+                ncell = base + (ncy % self.rows) * self.cols + ncx % self.cols
+                neighbor_cells.append(ncell)
+                lengths.append(self.counts[ncell])
+                continue
+            valid = (ncx >= 0) & (ncx < self.cols) & (ncy >= 0) & (ncy < self.rows)
+            ncell = base + np.where(valid, ncy * self.cols + ncx, 0)
+            neighbor_cells.append(ncell)
+            lengths.append(np.where(valid, self.counts[ncell], 0))
+        k = len(neighbor_cells)
+        return np.stack(neighbor_cells).reshape(k, n), np.stack(lengths).reshape(k, n)
+
+    def pairs(self, neighbor_cells, lengths):
+        """Génère (i, j) par blocs : i indexe les points de requête, j les
+        points indexés des cellules voisines (i == j compris)."""
+        k, n = lengths.shape
+        if n == 0:
+            return
+
+        # Découpe en blocs de points contenant au plus ~PAIR_BLOCK paires
+        per_point = np.cumsum(lengths.sum(axis=0))
+        bounds = np.searchsorted(per_point, np.arange(PAIR_BLOCK, per_point[-1], PAIR_BLOCK))
+        bounds = np.unique(np.concatenate(([0], bounds, [n])))
+
+        for b0, b1 in zip(bounds[:-1], bounds[1:]):
+            block = np.arange(b0, b1)
+            lens = lengths[:, b0:b1].ravel()
+            total = int(lens.sum())
+            if total == 0:
+                continue
+            i = np.repeat(np.tile(block, k), lens)
+            first = np.repeat(self.starts[neighbor_cells[:, b0:b1].ravel()], lens)
+            offset = np.arange(total) - np.repeat(np.cumsum(lens) - lens, lens)
+            yield i, self.order[first + offset]
+
+    def nearest(self, points, positions, radius, size=None):
+        """Pour chaque point, le plus proche des positions indexées à
+        distance <= radius.
+
+        Renvoie (indice ou -1, vecteur point -> position, distance ou inf).
+        size : dimensions du tore pour les distances à l'image la plus proche.
+        Les anneaux de cellules sont parcourus du centre vers l'extérieur ;
+        un point quitte la recherche dès qu'aucun anneau restant ne peut
+        contenir plus proche.
+        """
+        n = len(points)
+        nearest = np.full(n, -1, dtype=np.intp)
+        toward = np.zeros((n, 2))
+        best = np.full(n, np.inf)
+        step = min(self.cell_w, self.cell_h)
+        active = np.arange(n)
+        for ring in range(self.reach(radius) + 1):
+            # Tout point de cet anneau est à plus de (ring - 1) cellules
+            active = active[~(best[active] <= (ring - 1) * step)]
+            if len(active) == 0:
+                break
+            for i, j in self.pairs(*self.ring(points[active], ring)):
+                i = active[i]
+                diff = positions[j] - points[i]
+                if size is not None:
+                    min_image(diff, size)
+                dist = np.hypot(diff[:, 0], diff[:, 1])
+                ok = dist <= radius
+                i, j, diff, dist = i[ok], j[ok], diff[ok], dist[ok]
+                # Première paire de chaque point une fois triées par distance
+                order = np.lexsort((dist, i))
+                first = np.ones(len(order), dtype=bool)
+                first[1:] = i[order[1:]] != i[order[:-1]]
+                pick = order[first]
+                pick = pick[dist[pick] < best[i[pick]]]
+                rows = i[pick]
+                nearest[rows] = j[pick]
+                toward[rows] = diff[pick]
+                best[rows] = dist[pick]
+        return nearest, toward, best
+
+
+class ArrayFlock:
+    engine = "numpy"
+    # Cycle de vie des boids (population.Lifecycle), appliqué au début de
+    # chaque pas ; None : population fixe
+    life = None
+
+    def __init__(self, config, positions, velocities, teams=None,
+                 predator_positions=None, predator_velocities=None, rng=None,
+                 owned=None, capacity=None):
+        self.config = config
+        self.rng = rng
+        self.steps = 0  # pas effectués (cf. checkpoint)
+        self.neighbor_checks = 0
+        # owned : indices (croissants) des boids dont on calcule les forces,
+        # tous si None ; les autres ne sont que lus, comme voisins (halo
+        # d'une tuile, cf. flock_parallel)
+        self.owned = owned
+        positions = np.ascontiguousarray(positions, dtype=np.float64).reshape(-1, 2)
+        velocities = np.ascontiguousarray(velocities, dtype=np.float64).reshape(-1, 2)
+        n = len(positions)
+        if teams is None:
+            teams = np.zeros(n, dtype=np.int32)
+        teams = np.ascontiguousarray(teams, dtype=np.int32)
+        # Pool de capacity lignes (cf. population) : positions, vitesses,
+        # etc. sont des vues sur ses len(self) premières lignes. Sans place
+        # réservée, les tableaux donnés servent de pool, sans copie.
+        self.capacity = max(capacity or 0, n)
+        self._pool = {
+            "positions": positions,
+            "velocities": velocities,
+            "accelerations": np.zeros_like(positions),
+            "teams": teams,
+        }
+        if self.capacity > n:
+            for name, array in self._pool.items():
+                pool = np.zeros((self.capacity, *array.shape[1:]), dtype=array.dtype)
+                pool[:n] = array
+                self._pool[name] = pool
+        self._resize(n)
+
+        if predator_positions is None:
+            predator_positions = np.zeros((0, 2))
+            predator_velocities = np.zeros((0, 2))
+        self.predator_positions = np.ascontiguousarray(predator_positions, dtype=np.float64).reshape(-1, 2)
+        self.predator_velocities = np.ascontiguousarray(predator_velocities, dtype=np.float64).reshape(-1, 2)
+        self.predator_accelerations = np.zeros_like(self.predator_positions)
+        # Ligne du boid poursuivi par chaque prédateur (-1 : aucun), fixée
+        # par compute_forces (cf. population)
+        self.predator_targets = None
+
+        # Grilles reconstruites à chaque pas. Boids : cellules de côté >=
+        # max(neighbor_radius, separation_radius), pour que le bloc 3x3
+        # couvre les deux rayons ; avec team_filter, une grille fine (>=
+        # separation_radius) commune à toutes les équipes pour la séparation
+        # et la chasse, et team_grid, une couche par équipe, pour
+        # l'alignement et la cohésion. Avec lod_cells, lod_grid (une couche
+        # par équipe avec team_filter) remplace team_grid, à côté de la
+        # grille fine. Prédateurs : cellules >= flee_radius.
+        self.team_grid = None
+        self.lod_grid = None
+        if config.team_filter or config.lod_cells:
+            self.grid = CellIndex(config.width, config.height, config.separation_radius, config.wrap)
+        else:
+            self.grid = CellIndex(config.width, config.height,
+                                  max(config.neighbor_radius, config.separation_radius), config.wrap)
+        if config.lod_cells:
+            self.lod_grid = CellIndex(config.width, config.height,
+                                      config.neighbor_radius / config.lod_cells, config.wrap)
+        elif config.team_filter:
+            self.team_grid = CellIndex(config.width, config.height, config.neighbor_radius, config.wrap)
+        self.predator_grid = CellIndex(config.width, config.height, config.flee_radius, config.wrap)
+        self.size = np.array([config.width, config.height])
+
+    @classmethod
+    def from_agents(cls, config, boids, predators=(), rng=None, capacity=None):
+        """Construit le moteur à partir de boids / prédateurs objets existants."""
+        state = agents_state(boids, predators)
+        return cls(config, state["positions"], state["velocities"], state["teams"],
+                   state["predator_positions"], state["predator_velocities"], rng,
+                   capacity=capacity)
+
+    def __len__(self):
+        return len(self.positions)
+
+    # POOL D'AGENTS (cf. population)
+    def _resize(self, count):
+        for name, pool in self._pool.items():
+            setattr(self, name, pool[:count])
+
+    def agent(self, row):
+        """(x, y, vx, vy, équipe) du boid de la ligne row."""
+        x, y = self.positions[row]
+        vx, vy = self.velocities[row]
+        return float(x), float(y), float(vx), float(vy), int(self.teams[row])
+
+    def predator_position(self, k):
+        x, y = self.predator_positions[k]
+        return float(x), float(y)
+
+    def remove(self, rows):
+        """Retire les boids des lignes rows (cf. population.remove_rows)."""
+        self._resize(remove_rows(self._pool.values(), len(self), rows))
+
+    def add(self, x, y, vx, vy, team):
+        """Ajoute un boid dans la première ligne libre ; False si le pool est plein."""
+        count = len(self)
+        if count >= self.capacity:
+            return False
+        self._pool["positions"][count] = (x, y)
+        self._pool["velocities"][count] = (vx, vy)
+        self._pool["accelerations"][count] = 0
+        self._pool["teams"][count] = team
+        self._resize(count + 1)
+        return True
+
+    @property
+    def neighbor_radius(self):
+        return self.config.neighbor_radius
+
+    @property
+    def flee_radius(self):
+        return self.config.flee_radius
+
+    @property
+    def wrap(self):
+        return self.config.wrap
+
+    def state(self):
+        """Copie de l'état courant (mêmes clés que agents_state)."""
+        return {
+            "positions": self.positions.copy(),
+            "velocities": self.velocities.copy(),
+            "teams": self.teams.copy(),
+            "predator_positions": self.predator_positions.copy(),
+            "predator_velocities": self.predator_velocities.copy(),
+        }
+
+    # VOISINAGE
+    def find_neighbors(self):
+        """Applique le cycle de vie (captures, naissances...), puis range
+        boids et prédateurs par cellule ; à appeler avant les forces."""
+        if self.life is not None:
+            self.life.update(self)
+        self.index_neighbors()
+
+    def index_neighbors(self):
+        """Range boids et prédateurs par cellule (sans cycle de vie)."""
+        rows = self.rows()
+        self.grid.build(self.positions)
+        self._index = self.grid.around(self.positions[rows])
+        self.neighbor_checks = int(self._index[1].sum())
+        if self.team_grid is not None:
+            # Couche de chaque boid : rang de son équipe (nombre quelconque)
+            teams, layers = np.unique(self.teams, return_inverse=True)
+            self.team_grid.build(self.positions, layers, len(teams))
+            self._team_index = self.team_grid.around(self.positions[rows], layers=layers[rows])
+            self.neighbor_checks += int(self._team_index[1].sum())
+        if self.lod_grid is not None:
+            self._lod_neighbors(rows)
+        self.predator_grid.build(self.predator_positions)
+
+    def _lod_layers(self):
+        # Couche de chaque boid dans lod_grid : rang de son équipe, ou aucune
+        if not self.config.team_filter:
+            return None, 1
+        teams, layers = np.unique(self.teams, return_inverse=True)
+        return layers, len(teams)
+
+    def _lod_neighbors(self, rows):
+        """Sommes d'alignement / cohésion des cellules comptées en bloc, et
+        cellules coupées par le rayon à parcourir par paires (cf. lod_cells)."""
+        cfg = self.config
+        grid = self.lod_grid
+        radius = cfg.neighbor_radius
+        pos = self.positions
+        n = len(pos)
+        layers, num_layers = self._lod_layers()
+        grid.build(pos, layers, num_layers)
+        query_rows = np.arange(n)[rows]
+        points = pos[query_rows]
+        query_layers = None if layers is None else layers[query_rows]
+        reach = grid.reach(radius)
+
+        self._lod_vel = np.zeros((n, 2))
+        self._lod_rel = np.zeros((n, 2))
+        self._lod_count = np.zeros(n)
+        if grid.narrow(reach):
+            # Le bloc fait le tour du tore : tout par paires
+            self._lod_index = grid.around(points, reach, query_layers)
+            self.neighbor_checks += int(self._lod_index[1].sum())
+            return
+
+        cell_vel = grid.sums(self.velocities)
+        cell_pos = grid.sums(pos)
+        cell_count = grid.counts
+        cx, cy = grid.cells(points)
+        base = 0 if query_layers is None else query_layers * (grid.cols * grid.rows)
+        # Position du point dans sa cellule
+        fx = points[:, 0] - cx * grid.cell_w
+        fy = points[:, 1] - cy * grid.cell_h
+
+        vel_sum = np.zeros((len(points), 2))
+        rel_sum = np.zeros((len(points), 2))
+        count = np.zeros(len(points))
+        neighbor_cells = []
+        lengths = []
+        for dy in range(-reach, reach + 1):
+            for dx in range(-reach, reach + 1):
+                ncx = cx + dx
+                ncy = cy + dy
+                if grid.wrap:
+                    valid = np.ones(len(points), dtype=bool)
+                    # Décalage de l'image de la cellule vue depuis le point
+                    offset = np.stack(((ncx // grid.cols) * cfg.width,
+                                       (ncy // grid.rows) * cfg.height), axis=1)
+                    ncell = base + (ncy % grid.rows) * grid.cols + ncx % grid.cols
+                else:
+                    valid = (ncx >= 0) & (ncx < grid.cols) & (ncy >= 0) & (ncy < grid.rows)
+                    offset = np.zeros((len(points), 2))
+                    ncell = base + np.where(valid, ncy * grid.cols + ncx, 0)
+
+                # Rectangle de la cellule relatif au point : distances de
+                # son point le plus proche et de son coin le plus lointain
+                x0 = dx * grid.cell_w - fx
+                y0 = dy * grid.cell_h - fy
+                x1 = x0 + grid.cell_w
+                y1 = y0 + grid.cell_h
+                near = np.hypot(np.maximum(np.maximum(x0, -x1), 0),
+                                np.maximum(np.maximum(y0, -y1), 0))
+                far = np.hypot(np.maximum(np.abs(x0), np.abs(x1)),
+                               np.maximum(np.abs(y0), np.abs(y1)))
+                inside = valid & (far < radius)
+                boundary = valid & (near < radius) & ~inside
+                if not cfg.lod_exact_boundary:
+                    center = np.hypot(x0 + grid.cell_w / 2, y0 + grid.cell_h / 2)
+                    inside |= boundary & (center < radius)
+                    boundary[:] = False
+
+                c = np.where(inside, cell_count[ncell], 0)
+                vel_sum += np.where(inside[:, None], cell_vel[ncell], 0)
+                rel_sum += np.where(inside[:, None],
+                                    cell_pos[ncell] + (offset - points) * c[:, None], 0)
+                count += c
+                if dx == 0 and dy == 0:
+                    # Le boid lui-même est dans sa cellule
+                    own = inside
+                neighbor_cells.append(ncell)
+                lengths.append(np.where(boundary, cell_count[ncell], 0))
+
+        vel_sum[own] -= self.velocities[query_rows[own]]
+        count[own] -= 1
+        self._lod_vel[query_rows] = vel_sum
+        self._lod_rel[query_rows] = rel_sum
+        self._lod_count[query_rows] = count
+        k = len(neighbor_cells)
+        self._lod_index = (np.stack(neighbor_cells).reshape(k, -1),
+                           np.stack(lengths).reshape(k, -1))
+        self.neighbor_checks += int(self._lod_index[1].sum()) + len(points) * k
+
+    def rows(self):
+        """Lignes dont on calcule les forces (cf. owned)."""
+        return slice(None) if self.owned is None else self.owned
+
+    def _query_pairs(self, pairs):
+        # i indexe les points de requête : on le ramène aux lignes des boids
+        for i, j in pairs:
+            if self.owned is not None:
+                i = self.owned[i]
+            keep = i != j
+            yield i[keep], j[keep]
+
+    def candidate_pairs(self):
+        """Génère (i, j) pour toutes les paires candidates, par blocs.
+
+        Chaque boid i est apparié aux boids des 9 cellules qui l'entourent ;
+        les paires i == j sont retirées. Avec team_filter, ce sont les
+        paires de la grille fine, toutes équipes confondues (séparation).
+        """
+        return self._query_pairs(self.grid.pairs(*self._index))
+
+    def team_pairs(self):
+        """Comme candidate_pairs, dans la grille de l'équipe de chaque boid
+        (alignement, cohésion) ; rien sans team_filter."""
+        if self.team_grid is None:
+            return iter(())
+        return self._query_pairs(self.team_grid.pairs(*self._team_index))
+
+    def lod_pairs(self):
+        """Comme team_pairs, pour les cellules de lod_grid coupées par le
+        rayon ; rien sans lod_cells."""
+        if self.lod_grid is None:
+            return iter(())
+        return self._query_pairs(self.lod_grid.pairs(*self._lod_index))
+
+    def neighbor_pairs(self):
+        """Toutes les paires candidates (i, j) de la dernière recherche.
+
+        Avec lod_cells, les cellules comptées en bloc n'ont pas de paires :
+        on prend alors toutes les paires du voisinage de lod_grid.
+        """
+        blocks = list(self.candidate_pairs()) + list(self.team_pairs())
+        if self.lod_grid is not None:
+            layers, _ = self._lod_layers()
+            rows = self.rows()
+            index = self.lod_grid.around(self.positions[rows],
+                                         self.lod_grid.reach(self.config.neighbor_radius),
+                                         None if layers is None else layers[rows])
+            blocks += list(self._query_pairs(self.lod_grid.pairs(*index)))
+        if not blocks:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        return (np.concatenate([i for i, _ in blocks]),
+                np.concatenate([j for _, j in blocks]))
+
+    # FORCES
+    def flocking_forces(self):
+        """Séparation, alignement et cohésion pondérés, pour tous les boids."""
+        cfg = self.config
+        pos = self.positions
+        vel = self.velocities
+        n = len(pos)
+
+        sep_sum = np.zeros((n, 2))
+        sep_count = np.zeros(n)
+        vel_sum = np.zeros((n, 2))
+        rel_sum = np.zeros((n, 2))
+        count = np.zeros(n)
+
+        if self.lod_grid is not None:
+            # Cellules comptées en bloc (cf. find_neighbors)
+            vel_sum = self._lod_vel.copy()
+            rel_sum = self._lod_rel.copy()
+            count = self._lod_count.copy()
+
+        def group(i, j, diff, dist):
+            # Alignement et cohésion. Cohésion : somme des positions des
+            # voisins relatives à i (leur image la plus proche sur un tore),
+            # soit -diff
+            near = dist < cfg.neighbor_radius
+            if cfg.max_neighbors and self.lod_grid is None:
+                inner = np.flatnonzero(near)
+                near[inner[~nearest_k(i[inner], dist[inner], cfg.max_neighbors)]] = False
+            i_n = i[near]
+            j_n = j[near]
+            toward = diff[near]
+            for axis in (0, 1):
+                vel_sum[:, axis] += np.bincount(i_n, vel[j_n, axis], n)
+                rel_sum[:, axis] -= np.bincount(i_n, toward[:, axis], n)
+            count[:] += np.bincount(i_n, minlength=n)
+
+        for i, j in self.candidate_pairs():
+            diff = pos[i] - pos[j]
+            if cfg.wrap:
+                min_image(diff, self.size)
+            dist = np.hypot(diff[:, 0], diff[:, 1])
+
+            close = (dist > 0) & (dist < cfg.separation_radius)
+            ic = i[close]
+            away = diff[close] / dist[close, None]
+            sep_sum[:, 0] += np.bincount(ic, away[:, 0], n)
+            sep_sum[:, 1] += np.bincount(ic, away[:, 1], n)
+            sep_count += np.bincount(ic, minlength=n)
+
+            if self.team_grid is None and self.lod_grid is None:
+                group(i, j, diff, dist)
+
+        # Avec team_filter : voisins de la même équipe seulement, sans
+        # jamais parcourir les boids des autres équipes. Avec lod_cells :
+        # seulement les cellules coupées par le rayon.
+        for pairs in (self.team_pairs(), self.lod_pairs()):
+            for i, j in pairs:
+                diff = pos[i] - pos[j]
+                if cfg.wrap:
+                    min_image(diff, self.size)
+                group(i, j, diff, np.hypot(diff[:, 0], diff[:, 1]))
+
+        if self.owned is not None:
+            rows = self.owned
+            sep_sum, sep_count = sep_sum[rows], sep_count[rows]
+            vel_sum, rel_sum, count, vel = vel_sum[rows], rel_sum[rows], count[rows], vel[rows]
+
+        has_sep = sep_count > 0
+        sep = np.zeros_like(sep_sum)
+        sep[has_sep] = sep_sum[has_sep] / sep_count[has_sep, None]
+        sep = steer_rows(sep, vel, cfg.max_speed, cfg.max_force, has_sep)
+
+        has = count > 0
+        safe = np.where(has, count, 1)[:, None]
+        ali = steer_rows(vel_sum / safe, vel, cfg.max_speed, cfg.max_force, has)
+        coh = steer_rows(rel_sum / safe, vel, cfg.max_speed, cfg.max_force, has)
+
+        return sep * cfg.w_separation + ali * cfg.w_alignment + coh * cfg.w_cohesion
+
+    def flee_forces(self):
+        """Force de fuite (pondérée) face au prédateur le plus proche.
+
+        Renvoie aussi le masque des boids en fuite : comme dans
+        Boid.apply_behaviors, ceux-ci ignorent les forces de groupe.
+        """
+        cfg = self.config
+        rows = self.rows()
+        positions = self.positions[rows]
+        n = len(positions)
+        if len(self.predator_positions) == 0:
+            return np.zeros((n, 2)), np.zeros(n, dtype=bool)
+
+        # Prédateur le plus proche dans flee_radius, via la grille des prédateurs
+        size = self.size if cfg.wrap else None
+        nearest, toward, _ = self.predator_grid.nearest(
+            positions, self.predator_positions, cfg.flee_radius, size)
+        in_range = nearest >= 0
+        flee = steer_rows(-toward, self.velocities[rows], cfg.max_speed, cfg.max_force, in_range)
+        flee *= cfg.w_flee
+        fleeing = np.hypot(flee[:, 0], flee[:, 1]) > 0
+        return flee, fleeing
+
+    def hunt_targets(self):
+        """Boid le plus proche de chaque prédateur dans predator_radius :
+        (indice ou -1, vecteur prédateur -> boid, distance ou inf)."""
+        cfg = self.config
+        count = len(self.predator_positions)
+        if count == 0 or len(self.positions) == 0:
+            return np.full(count, -1, dtype=np.intp), np.zeros((count, 2)), np.full(count, np.inf)
+        # Via la grille des boids (plusieurs anneaux de cellules si
+        # predator_radius dépasse neighbor_radius)
+        size = self.size if cfg.wrap else None
+        return self.grid.nearest(self.predator_positions, self.positions,
+                                 cfg.predator_radius, size)
+
+    def predator_forces(self):
+        """Force de poursuite : chaque prédateur vise le boid le plus proche
+        dans predator_radius."""
+        cfg = self.config
+        target, toward, _ = self.hunt_targets()
+        self.predator_targets = target
+        forces = steer_rows(toward, self.predator_velocities,
+                            cfg.predator_speed, cfg.predator_force, target >= 0)
+        if cfg.obstacles is not None:
+            forces += self.avoid_forces(self.predator_positions, self.predator_velocities,
+                                        cfg.predator_speed, cfg.predator_force)
+        return forces
+
+    def avoid_forces(self, positions, velocities, max_speed, max_force):
+        """Force d'évitement des obstacles (pondérée) : chaque agent à moins
+        de avoid_radius d'un obstacle s'en écarte le long de la normale
+        (cf. obstacles)."""
+        cfg = self.config
+        distance, nx, ny = cfg.obstacles.sample(positions)
+        avoid = steer_rows(np.stack((nx, ny), axis=1), velocities, max_speed, max_force,
+                           distance < cfg.avoid_radius)
+        avoid *= cfg.w_avoid
+        return avoid
+
+    def step(self, dt=1.0):
+        """Avance la simulation d'un pas.
+
+        Toutes les forces (prédateurs et boids) sont calculées sur l'état du
+        début du pas, puis tout est intégré : même ordre que Flock.step.
+        """
+        self.find_neighbors()
+        self.compute_forces()
+        self.integrate(dt)
+
+    def compute_forces(self):
+        self.predator_accelerations = self.predator_forces()
+        self.accelerations[self.rows()] += self.boid_forces()
+
+    def boid_forces(self):
+        """Forces des boids de rows() : groupe, ou fuite pour ceux qui fuient,
+        plus l'évitement des obstacles."""
+        forces = self.flocking_forces()
+        flee, fleeing = self.flee_forces()
+        forces[fleeing] = flee[fleeing]
+        if self.config.obstacles is not None:
+            rows = self.rows()
+            forces += self.avoid_forces(self.positions[rows], self.velocities[rows],
+                                        self.config.max_speed, self.config.max_force)
+        return forces
+
+    def integrate(self, dt=1.0):
+        # dt : durée du pas, en pas de référence à 60 Hz (1.0 = une frame)
+        cfg = self.config
+        integrate_rows(self.predator_positions, self.predator_velocities,
+                       self.predator_accelerations, cfg.predator_speed, self.size, dt)
+        integrate_rows(self.positions, self.velocities, self.accelerations,
+                       cfg.max_speed, self.size, dt)
+        self.steps += 1
+
+
+def integrate_rows(positions, velocities, accelerations, max_speed, size, dt=1.0):
+    """Intègre un pas pour des lignes d'agents (sur place) et remet leurs
+    accélérations à zéro ; même 'wrap-around' que Boid.edges."""
+    velocities += accelerations * dt
+    limit_rows(velocities, max_speed)
+    positions += velocities * dt
+    accelerations[:] = 0
+    for axis in (0, 1):
+        coord = positions[:, axis]
+        low = coord < 0
+        high = coord > size[axis]
+        coord[low] = size[axis]
+        coord[high] = 0
+
+
+def agents_state(boids, predators=()):
+    """État des boids / prédateurs objets sous forme de tableaux."""
+    return {
+        "positions": np.array([(b.position.x, b.position.y) for b in boids]).reshape(-1, 2),
+        "velocities": np.array([(b.velocity.x, b.velocity.y) for b in boids]).reshape(-1, 2),
+        "teams": np.array([getattr(b, "team", 0) for b in boids], dtype=np.int32),
+        "predator_positions": np.array([(p.position.x, p.position.y) for p in predators]).reshape(-1, 2),
+        "predator_velocities": np.array([(p.velocity.x, p.velocity.y) for p in predators]).reshape(-1, 2),
+    }
+
+
+def object_pairs(boids, neighborhoods):
+    """Paires candidates (i, j) à partir des voisinages du moteur objet
+    (listes de (décalage, cellule), cf. SpatialGrid.neighborhood)."""
+    index = {id(boid): k for k, boid in enumerate(boids)}
+    lengths = [sum(len(cell) for _, cell in hood) for hood in neighborhoods]
+    i = np.repeat(np.arange(len(boids)), lengths)
+    j = np.fromiter((index[id(other)] for hood in neighborhoods
+                     for _, cell in hood for other in cell),
+                    dtype=np.intp, count=sum(lengths))
+    keep = i != j
+    return i[keep], j[keep]
@@ -0,0 +1,358 @@
+"""Moteur NumPy multi-cœur : le monde est découpé en tuiles, une par processus.
+
+Positions, vitesses et accélérations vivent dans des blocs
+multiprocessing.shared_memory communs au processus principal et aux
+processus de calcul : rien n'est copié d'un processus à l'autre.
+
+Le monde est découpé en bandes le long de son plus grand côté, chacune
+avec à peu près le même nombre de boids. Chaque processus calcule les
+forces des boids de sa bande avec ArrayFlock (owned), en ne voyant que sa
+bande et un halo qui couvre tous leurs voisins possibles (halo_width). Les
+boids gardent leur ordre global dans la tuile : chaque force est la même
+somme, dans le même ordre, que dans ArrayFlock, et les trajectoires sont
+identiques bit à bit.
+
+Un pas se déroule en deux phases séparées par une barrière : les forces
+(chaque tuile écrit les accélérations de ses boids, et pour chaque
+prédateur la proie la plus proche parmi ses boids), puis l'intégration
+(chaque processus intègre une tranche contiguë de boids, le processus
+principal choisit les proies et intègre les prédateurs).
+"""
+import multiprocessing
+import os
+import threading
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from flock_numpy import ArrayFlock, CellIndex, integrate_rows, steer_rows
+
+# Nombre de processus de calcul par défaut (None : un par cœur)
+WORKERS = None
+
+# Délai (s) au-delà duquel un processus qui ne répond plus est abandonné
+TIMEOUT = 60.0
+
+# Cases du tableau partagé "control" (COUNT : nombre de boids actifs)
+STOP, DT, COUNT = 0, 1, 2
+
+
+class SharedArrays:
+    """Tableaux NumPy rangés dans des blocs de mémoire partagée.
+
+    layout : {nom: (nom du bloc, forme, type)} ; suffit pour rattacher les
+    mêmes tableaux dans un autre processus (attach).
+    """
+
+    def __init__(self, blocks, layout):
+        self._blocks = blocks
+        self.layout = layout
+        self.arrays = {
+            name: np.ndarray(shape, dtype, buffer=blocks[name].buf)
+            for name, (_, shape, dtype) in layout.items()
+        }
+
+    @classmethod
+    def create(cls, specs):
+        """specs : {nom: (forme, type)} ; tableaux créés à zéro."""
+        blocks = {}
+        layout = {}
+        for name, (shape, dtype) in specs.items():
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            # Un bloc vide n'est pas permis : au moins un octet
+            block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+            blocks[name] = block
+            layout[name] = (block.name, tuple(shape), np.dtype(dtype).str)
+        shared = cls(blocks, layout)
+        for array in shared.arrays.values():
+            array[...] = 0
+        return shared
+
+    @classmethod
+    def attach(cls, layout):
+        blocks = {name: shared_memory.SharedMemory(name=block)
+                  for name, (block, _, _) in layout.items()}
+        return cls(blocks, layout)
+
+    def close(self, unlink=False):
+        self.arrays = {}
+        for block in self._blocks.values():
+            block.close()
+            if unlink:
+                block.unlink()
+
+
+def tile_edges(coord, workers, length):
+    """Bornes des bandes [edges[k], edges[k + 1]) : même nombre de boids
+    dans chacune, à égalité de coordonnées près."""
+    n = len(coord)
+    if n == 0:
+        return np.linspace(0.0, length, workers + 1)
+    kth = (np.arange(1, workers) * n) // workers
+    inner = np.partition(coord, kth)[kth]
+    return np.concatenate(([0.0], inner, [length]))
+
+
+def halo_width(config):
+    """Largeur du halo : tout ce qui peut compter dans les forces d'un boid."""
+    halo = max(config.neighbor_radius, config.separation_radius)
+    if config.lod_cells and not config.lod_exact_boundary:
+        # Une cellule comptée d'après son centre dépasse le rayon d'au plus
+        # sa diagonale
+        grid = CellIndex(config.width, config.height,
+                         config.neighbor_radius / config.lod_cells)
+        halo += np.hypot(grid.cell_w, grid.cell_h)
+    return halo
+
+
+def tile_rows(coord, edges, rank, halo, length, wrap):
+    """(boids de la bande rank, boids de son halo), indices croissants.
+
+    Le halo contient les boids hors de la bande à moins de halo d'elle le
+    long de l'axe de découpe (de l'autre côté du monde sur un tore).
+    """
+    tile = np.searchsorted(edges[1:-1], coord, side="right")
+    own = tile == rank
+    low, high = edges[rank], edges[rank + 1]
+    if wrap:
+        near = ((low - coord) % length <= halo) | ((coord - high) % length <= halo)
+    else:
+        near = (coord >= low - halo) & (coord <= high + halo)
+    return np.flatnonzero(own), np.flatnonzero(near & ~own)
+
+
+def _tile_forces(rank, config, arrays, axis):
+    # Boids actifs : les count premières lignes du pool (cf. population)
+    count = int(arrays["control"][COUNT])
+    pos = arrays["positions"][:count]
+    vel = arrays["velocities"][:count]
+    length = (config.width, config.height)[axis]
+    halo = halo_width(config)
+    own, near = tile_rows(pos[:, axis], arrays["edges"], rank, halo, length, config.wrap)
+
+    hunt = arrays["hunt"][rank]
+    hunt[:, 0] = np.inf
+    hunt[:, 3] = -1
+    arrays["checks"][rank] = 0
+    if len(own) == 0:
+        return
+
+    # Boids de la tuile puis du halo, dans l'ordre global (cf. en-tête)
+    rows = np.union1d(own, near)
+    local = ArrayFlock(config, pos[rows], vel[rows], arrays["teams"][rows],
+                       arrays["predator_positions"], arrays["predator_velocities"],
+                       owned=np.searchsorted(rows, own))
+    local.find_neighbors()
+    arrays["accelerations"][own] = local.boid_forces()
+    arrays["checks"][rank] = local.neighbor_checks
+
+    # Proie la plus proche parmi les boids vus par la tuile ; le processus
+    # principal garde la plus proche de toutes les tuiles
+    target, toward, dist = local.hunt_targets()
+    found = target >= 0
+    hunt[found, 0] = dist[found]
+    hunt[found, 1:3] = toward[found]
+    hunt[found, 3] = rows[target[found]]
+
+
+def _worker(rank, workers, config, layout, barrier):
+    shared = SharedArrays.attach(layout)
+    arrays = shared.arrays
+    axis = 0 if config.width >= config.height else 1
+    size = np.array([config.width, config.height])
+    try:
+        while True:
+            barrier.wait()  # début du pas
+            if arrays["control"][STOP]:
+                break
+            _tile_forces(rank, config, arrays, axis)
+            barrier.wait()  # forces calculées
+            barrier.wait()  # dt fixé par le processus principal
+            n = int(arrays["control"][COUNT])
+            lo, hi = n * rank // workers, n * (rank + 1) // workers
+            integrate_rows(arrays["positions"][lo:hi], arrays["velocities"][lo:hi],
+                           arrays["accelerations"][lo:hi], config.max_speed,
+                           size, arrays["control"][DT])
+            barrier.wait()  # intégration terminée
+    except threading.BrokenBarrierError:
+        pass
+    except BaseException:
+        # Débloque le processus principal au lieu de le laisser attendre
+        barrier.abort()
+        raise
+    finally:
+        shared.close()
+
+
+def _shutdown(shared, barrier, processes):
+    # Arrêt des processus puis libération de la mémoire partagée ; appelé
+    # par close() ou, à défaut, à la destruction du moteur / à la sortie
+    if not barrier.broken:
+        shared.arrays["control"][STOP] = 1
+        try:
+            barrier.wait(TIMEOUT)
+        except threading.BrokenBarrierError:
+            pass
+    for process in processes:
+        process.join(TIMEOUT)
+        if process.is_alive():
+            process.terminate()
+    shared.close(unlink=True)
+
+
+class ParallelFlock:
+    """Même interface et mêmes trajectoires que ArrayFlock, calculées par
+    workers processus (WORKERS, ou un par cœur, si None)."""
+    engine = "parallel"
+    life = None
+    # Voisins cherchés par chaque tuile, dans compute_forces (cf. find_neighbors)
+    neighbors_in_forces = True
+
+    # Même pool d'agents que ArrayFlock, dans la mémoire partagée
+    agent = ArrayFlock.agent
+    predator_position = ArrayFlock.predator_position
+    remove = ArrayFlock.remove
+    add = ArrayFlock.add
+
+    def __init__(self, config, positions, velocities, teams=None,
+                 predator_positions=None, predator_velocities=None, rng=None,
+                 workers=None, capacity=None):
+        self.config = config
+        self.rng = rng
+        self.steps = 0  # pas effectués (cf. checkpoint)
+        self.size = np.array([config.width, config.height])
+        self.axis = 0 if config.width >= config.height else 1
+        self.workers = max(1, workers or WORKERS or os.cpu_count() or 1)
+        self.neighbor_checks = 0
+
+        initial = ArrayFlock(config, positions, velocities, teams,
+                             predator_positions, predator_velocities)
+        n = len(initial.positions)
+        p = len(initial.predator_positions)
+        self.capacity = max(capacity or 0, n)
+        self._shared = SharedArrays.create({
+            "positions": ((self.capacity, 2), np.float64),
+            "velocities": ((self.capacity, 2), np.float64),
+            "accelerations": ((self.capacity, 2), np.float64),
+            "teams": ((self.capacity,), np.int32),
+            "predator_positions": ((p, 2), np.float64),
+            "predator_velocities": ((p, 2), np.float64),
+            # par tuile et par prédateur : distance de la proie, vecteur vers
+            # elle, ligne de la proie
+            "hunt": ((self.workers, p, 4), np.float64),
+            "checks": ((self.workers,), np.int64),
+            "edges": ((self.workers + 1,), np.float64),
+            "control": ((3,), np.float64),
+        })
+        arrays = self._shared.arrays
+        for name in ("positions", "velocities", "teams"):
+            arrays[name][:n] = getattr(initial, name)
+        for name in ("predator_positions", "predator_velocities"):
+            arrays[name][...] = getattr(initial, name)
+        self._pool = {name: arrays[name]
+                      for name in ("positions", "velocities", "accelerations", "teams")}
+        self.predator_positions = arrays["predator_positions"]
+        self.predator_velocities = arrays["predator_velocities"]
+        self.predator_accelerations = np.zeros_like(self.predator_positions)
+        self.predator_targets = None
+        self._resize(n)
+
+        context = multiprocessing.get_context()
+        self._barrier = context.Barrier(self.workers + 1)
+        self._processes = [
+            context.Process(target=_worker, daemon=True,
+                            args=(rank, self.workers, config, self._shared.layout, self._barrier))
+            for rank in range(self.workers)
+        ]
+        for process in self._processes:
+            process.start()
+        self._finalizer = weakref.finalize(self, _shutdown, self._shared,
+                                           self._barrier, self._processes)
+
+    @classmethod
+    def from_agents(cls, config, boids, predators=(), rng=None, workers=None, capacity=None):
+        """Construit le moteur à partir de boids / prédateurs objets existants."""
+        serial = ArrayFlock.from_agents(config, boids, predators)
+        return cls(config, serial.positions, serial.velocities, serial.teams,
+                   serial.predator_positions, serial.predator_velocities, rng, workers,
+                   capacity)
+
+    def close(self):
+        """Arrête les processus de calcul et libère la mémoire partagée."""
+        self._finalizer()
+
+    def _resize(self, count):
+        for name, pool in self._pool.items():
+            setattr(self, name, pool[:count])
+        self._shared.arrays["control"][COUNT] = count
+        # Moteur série sur les mêmes tableaux, pour neighbor_pairs (métriques)
+        self._serial = ArrayFlock(self.config, self.positions, self.velocities, self.teams,
+                                  self.predator_positions, self.predator_velocities)
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def neighbor_radius(self):
+        return self.config.neighbor_radius
+
+    @property
+    def flee_radius(self):
+        return self.config.flee_radius
+
+    @property
+    def wrap(self):
+        return self.config.wrap
+
+    def state(self):
+        return self._serial.state()
+
+    def _wait(self):
+        self._barrier.wait(TIMEOUT)
+
+    def find_neighbors(self):
+        # Chaque tuile cherche ses voisins dans compute_forces, avec ses
+        # forces ; il ne reste que le cycle de vie
+        if self.life is not None:
+            self.life.update(self)
+
+    def neighbor_pairs(self):
+        """Paires candidates de l'état courant, par le moteur série (métriques)."""
+        self._serial.find_neighbors()
+        return self._serial.neighbor_pairs()
+
+    def compute_forces(self):
+        arrays = self._shared.arrays
+        length = self.size[self.axis]
+        arrays["edges"][:] = tile_edges(self.positions[:, self.axis], self.workers, length)
+        self._wait()  # début du pas
+        self._wait()  # forces calculées
+        self.neighbor_checks = int(arrays["checks"].sum())
+
+        cfg = self.config
+        hunt = arrays["hunt"]
+        count = len(self.predator_positions)
+        best = hunt[np.argmin(hunt[:, :, 0], axis=0), np.arange(count)]
+        self.predator_targets = best[:, 3].astype(np.intp)
+        self.predator_accelerations = steer_rows(
+            best[:, 1:3], self.predator_velocities,
+            cfg.predator_speed, cfg.predator_force, np.isfinite(best[:, 0]))
+        if cfg.obstacles is not None:
+            self.predator_accelerations += self._serial.avoid_forces(
+                self.predator_positions, self.predator_velocities,
+                cfg.predator_speed, cfg.predator_force)
+
+    def integrate(self, dt=1.0):
+        # dt : durée du pas, en pas de référence à 60 Hz (1.0 = une frame)
+        self._shared.arrays["control"][DT] = dt
+        self._wait()  # dt fixé : les processus intègrent leurs boids
+        integrate_rows(self.predator_positions, self.predator_velocities,
+                       self.predator_accelerations, self.config.predator_speed, self.size, dt)
+        self._wait()  # intégration terminée
+        self.steps += 1
+
+    def step(self, dt=1.0):
+        self.find_neighbors()
+        self.compute_forces()
+        self.integrate(dt)
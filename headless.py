@@ -0,0 +1,135 @@
+"""Exécution sans fenêtre : N pas aussi vite que possible, sans rendu."""
+import argparse
+import csv
+import json
+import time
+
+import numpy as np
+
+import metrics
+import population
+import trajectory
+
+
+def run(flock, steps, output=None, on_step=None, record=None,
+        metrics_csv=None, metrics_every=1, checkpoints=None, events_csv=None):
+    """Avance flock de steps pas et renvoie (état final, métriques).
+
+    on_step(flock), si donné, est appelé après chaque pas ; record est le
+    chemin d'un fichier de trajectoire recevant chaque pas ; metrics_csv
+    reçoit les métriques de metrics.stream un pas sur metrics_every ;
+    checkpoints (checkpoint.Writer) écrit les points de reprise ;
+    events_csv reçoit les captures, réapparitions et naissances (cf.
+    population). Si output est donné, l'état et les métriques finales y
+    sont écrits : en JSON si le chemin se termine par .json, sinon dans une
+    archive .npz.
+    """
+    recorder = None
+    if record is not None:
+        # Comme la fenêtre, l'en-tête donne la taille du monde et le pas
+        # (ici toujours le pas de référence : pas d'horloge)
+        config = flock.config
+        recorder = trajectory.Recorder.for_state(record, flock.state(), {
+            "width": config.width, "height": config.height, "dt": 1.0,
+        }, capacity=steps, num_boids=getattr(flock, "capacity", None))
+    life = getattr(flock, "life", None)
+    events = None
+    if events_csv is not None:
+        events_file = open(events_csv, "w", newline="")
+        events = csv.writer(events_file)
+        events.writerow(population.Event._fields)
+
+    def steps_source():
+        for step, current in metrics.simulate(flock, steps):
+            if on_step is not None:
+                on_step(current)
+            if events is not None and life is not None:
+                events.writerows(life.events)
+            if recorder is not None:
+                recorder.append(current.state())
+            if checkpoints is not None:
+                checkpoints.after_step(current)
+            yield step, current
+
+    start = time.perf_counter()
+    if metrics_csv is None:
+        for _ in steps_source():
+            pass
+    else:
+        with open(metrics_csv, "w", newline="") as f:
+            writer = None
+            for step, row in metrics.stream(steps_source(), metrics_every):
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=["step", *row], restval="",
+                                            extrasaction="ignore")
+                    writer.writeheader()
+                writer.writerow({"step": step, **row})
+    elapsed = time.perf_counter() - start
+    if recorder is not None:
+        recorder.close()
+    if events is not None:
+        events_file.close()
+    if checkpoints is not None:
+        checkpoints.close(flock)
+
+    state = flock.state()
+    summary = metrics.summary(state, metrics.torus_size(flock))
+    if life is not None:
+        summary.update(life.summary(state))
+    summary["steps"] = steps
+    summary["elapsed"] = elapsed
+    summary["steps_per_sec"] = steps / elapsed if elapsed > 0 else float("inf")
+
+    if output is not None:
+        save(output, state, summary)
+    return state, summary
+
+
+def save(path, state, summary):
+    path = str(path)
+    if path.endswith(".json"):
+        data = {"summary": summary,
+                "state": {key: value.tolist() for key, value in state.items()}}
+        with open(path, "w") as f:
+            json.dump(data, f)
+    else:
+        np.savez_compressed(path, summary=json.dumps(summary), **state)
+
+
+def add_arguments(parser):
+    """Options communes aux trois scripts pour le mode sans fenêtre."""
+    parser.add_argument("--headless", action="store_true",
+                        help="pas de fenêtre ni de rendu ; affiche les métriques finales")
+    parser.add_argument("--steps", type=int, default=1000,
+                        help="nombre de pas en mode --headless")
+    parser.add_argument("--output", default=None,
+                        help="fichier .npz ou .json pour l'état final (mode --headless)")
+    parser.add_argument("--metrics", default=None,
+                        help="fichier CSV des métriques pas à pas (mode --headless)")
+    parser.add_argument("--metrics-every", type=_positive_int, default=1,
+                        help="calcule les métriques un pas sur K")
+    parser.add_argument("--events", default=None,
+                        help="fichier CSV des captures, réapparitions et naissances "
+                             "(mode --headless)")
+
+
+def _positive_int(text):
+    # Entier >= 1 (option --metrics-every)
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"entier attendu (reçu {text!r})") from None
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"entier >= 1 attendu (reçu {text!r})")
+    return value
+
+
+def options(args):
+    """Arguments de run() correspondant aux options de add_arguments."""
+    return {
+        "output": args.output,
+        "record": args.record,
+        "metrics_csv": args.metrics,
+        "metrics_every": args.metrics_every,
+        "events_csv": args.events,
+    }
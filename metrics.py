@@ -0,0 +1,248 @@
+"""Métriques d'essaim calculées sur l'état (tableaux) d'une simulation."""
+import numpy as np
+
+from flock_numpy import CellIndex, min_image
+
+
+def torus_size(flock):
+    """Dimensions du monde si flock mesure ses distances sur le tore, sinon None.
+
+    Les fonctions ci-dessous prenant un argument size ramènent alors chaque
+    différence de positions à l'image la plus proche, comme les moteurs.
+    """
+    if not getattr(flock, "wrap", False):
+        return None
+    return np.asarray(flock.size, dtype=np.float64)
+
+
+def _distances(diff, size):
+    if size is not None:
+        min_image(diff, size)
+    return np.hypot(diff[..., 0], diff[..., 1])
+
+
+def centroid(positions, size=None):
+    """Centre de masse de positions ; sur un tore (size), moyenne circulaire
+    de chaque axe : un groupe à cheval sur un bord a son centre près du
+    bord, et non au milieu du monde."""
+    if size is None:
+        return positions.mean(axis=0)
+    angles = positions * (2 * np.pi / size)
+    mean = np.arctan2(np.sin(angles).mean(axis=0), np.cos(angles).mean(axis=0))
+    return (mean * size / (2 * np.pi)) % size
+
+
+def _offsets(positions, size=None):
+    # Positions relatives au centre de masse (image la plus proche sur un tore)
+    offsets = positions - centroid(positions, size)
+    if size is not None:
+        min_image(offsets, size)
+    return offsets
+
+
+def polarization(velocities):
+    """Paramètre d'ordre : norme de la direction moyenne (1 = tous alignés)."""
+    if len(velocities) == 0:
+        return 0.0
+    norm = np.hypot(velocities[:, 0], velocities[:, 1])
+    moving = norm > 0
+    if not moving.any():
+        return 0.0
+    headings = velocities[moving] / norm[moving, None]
+    return float(np.hypot(*headings.mean(axis=0)))
+
+
+def mean_speed(velocities):
+    if len(velocities) == 0:
+        return 0.0
+    return float(np.hypot(velocities[:, 0], velocities[:, 1]).mean())
+
+
+def dispersion(positions, teams, size=None):
+    """Distance moyenne de chaque boid au centre de masse de son équipe
+    (cf. centroid).
+
+    Plus la valeur est faible, plus les groupes sont soudés.
+    """
+    if len(positions) == 0:
+        return 0.0
+    total = 0.0
+    for team in np.unique(teams):
+        offsets = _offsets(positions[teams == team], size)
+        total += np.hypot(offsets[:, 0], offsets[:, 1]).sum()
+    return float(total / len(positions))
+
+
+def summary(state, size=None):
+    """Métriques de synthèse d'un état (dict de tableaux, cf. Flock.state) ;
+    size : dimensions du tore (cf. torus_size)."""
+    return {
+        "num_boids": int(len(state["positions"])),
+        "num_predators": int(len(state["predator_positions"])),
+        "polarization": polarization(state["velocities"]),
+        "mean_speed": mean_speed(state["velocities"]),
+        "dispersion": dispersion(state["positions"], state["teams"], size),
+    }
+
+
+def nearest_distances(points, positions, radius, cell_size, size=None):
+    """Distance de chaque point à la plus proche des positions, si elle est
+    <= radius (inf sinon).
+
+    Les positions sont rangées dans une grille de cellules >= cell_size,
+    parcourue par anneaux (cf. CellIndex.nearest) : ni matrice points ×
+    positions, ni paire au-delà de ce qu'il faut pour trouver la plus
+    proche.
+    """
+    best = np.full(len(points), np.inf)
+    if len(points) == 0 or len(positions) == 0:
+        return best
+    if size is not None:
+        width, height = size
+    else:
+        # Hors tore, grille sur la boîte englobante des deux ensembles
+        origin = np.minimum(points.min(axis=0), positions.min(axis=0))
+        points = points - origin
+        positions = positions - origin
+        width, height = np.maximum(np.maximum(points.max(axis=0), positions.max(axis=0)),
+                                   cell_size)
+    index = CellIndex(width, height, cell_size, wrap=size is not None)
+    index.build(positions)
+    return index.nearest(points, positions, radius, size)[2]
+
+
+def in_reach(positions, predator_positions, radius, size=None):
+    """Masque des boids à moins de radius d'au moins un prédateur."""
+    return nearest_distances(positions, predator_positions, radius, radius, size) < radius
+
+
+def entries(before, after):
+    """Nombre de boids entrés à portée entre deux masques de in_reach.
+
+    Les boids nés entre-temps (lignes ajoutées en fin de tableau) sont
+    comptés hors de portée avant.
+    """
+    was = np.zeros(len(after), dtype=bool)
+    was[:len(before)] = before[:len(after)]
+    return int((after & ~was).sum())
+
+
+# MÉTRIQUES PAR PAS, À PARTIR DES PAIRES DE VOISINS DÉJÀ CALCULÉES
+def nearest_neighbor_distances(positions, i, j, size=None):
+    """Distance au plus proche voisin parmi les candidats (inf si aucun)."""
+    nearest = np.full(len(positions), np.inf)
+    if len(i):
+        diff = positions[i] - positions[j]
+        np.minimum.at(nearest, i, _distances(diff, size))
+    return nearest
+
+
+def cluster_labels(n, i, j):
+    """Composantes connexes du graphe (i, j) : étiquette minimale par groupe.
+
+    Propagation de l'étiquette minimale le long des arêtes, accélérée par
+    saut de pointeurs (labels = labels[labels]).
+    """
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[i], labels[j])
+        new = labels.copy()
+        np.minimum.at(new, i, low)
+        np.minimum.at(new, j, low)
+        while True:
+            jumped = new[new]
+            if np.array_equal(jumped, new):
+                break
+            new = jumped
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+def team_stats(positions, teams, size=None):
+    """Centre de masse (cf. centroid) et dispersion de chaque équipe."""
+    stats = {}
+    for team in np.unique(teams):
+        members = positions[teams == team]
+        center = centroid(members, size)
+        offsets = members - center
+        if size is not None:
+            min_image(offsets, size)
+        stats[f"team{team}_cx"] = float(center[0])
+        stats[f"team{team}_cy"] = float(center[1])
+        stats[f"team{team}_dispersion"] = float(np.hypot(offsets[:, 0], offsets[:, 1]).mean())
+    return stats
+
+
+def predator_stats(positions, predator_positions, flee_radius, size=None):
+    """Distance moyenne prédateur -> proie la plus proche, boids à portée de
+    fuite (cf. nearest_distances : grilles de cellules de flee_radius)."""
+    # Aucune proie n'est plus loin que la diagonale du monde
+    extent = np.ptp(np.concatenate((positions, predator_positions)), axis=0)
+    far = float(np.hypot(*(size if size is not None else extent))) + 1.0
+    prey = nearest_distances(predator_positions, positions, far, flee_radius, size)
+    flee = nearest_distances(positions, predator_positions, flee_radius, flee_radius, size)
+    return {
+        "predator_prey_distance": float(prey.mean()),
+        "boids_in_flee_range": int((flee <= flee_radius).sum()),
+    }
+
+
+def measure(flock):
+    """Métriques du pas courant de flock.
+
+    Les voisins sont ceux de la dernière recherche du moteur
+    (flock.neighbor_pairs()) : aucune passe O(N²) supplémentaire. Les
+    positions ont avancé d'au plus un pas depuis, ce qui est négligeable
+    devant le rayon de voisinage.
+    """
+    state = flock.state()
+    positions = state["positions"]
+    velocities = state["velocities"]
+    teams = state["teams"]
+    row = {
+        "num_boids": len(positions),
+        "polarization": polarization(velocities),
+        "mean_speed": mean_speed(velocities),
+    }
+    if len(positions) == 0:
+        return row
+
+    size = torus_size(flock)
+    i, j = flock.neighbor_pairs()
+    nearest = nearest_neighbor_distances(positions, i, j, size)
+    found = np.isfinite(nearest)
+    row["mean_nn_distance"] = float(nearest[found].mean()) if found.any() else float("nan")
+
+    linked = _distances(positions[i] - positions[j], size) < flock.neighbor_radius
+    labels = cluster_labels(len(positions), i[linked], j[linked])
+    row["clusters"] = int(len(np.unique(labels)))
+
+    if len(np.unique(teams)) > 1:
+        row.update(team_stats(positions, teams, size))
+
+    flee_radius = getattr(flock, "flee_radius", None)
+    if flee_radius is not None and len(state["predator_positions"]):
+        row.update(predator_stats(positions, state["predator_positions"],
+                                  flee_radius, size))
+    return row
+
+
+def simulate(flock, steps):
+    """Générateur : avance flock d'un pas et produit (pas, flock), steps fois."""
+    for step in range(steps):
+        flock.step()
+        yield step, flock
+
+
+def stream(source, every=1):
+    """Étage de métriques : consomme (pas, flock) et produit (pas, métriques).
+
+    Les métriques ne sont calculées qu'un pas sur every (>= 1) ; les autres
+    pas traversent l'étage sans coût.
+    """
+    if every < 1:
+        raise ValueError(f"every doit être >= 1 (reçu {every!r})")
+    for step, flock in source:
+        if step % every == 0:
+            yield step, measure(flock)
@@ -0,0 +1,265 @@
+"""Obstacles fixes (cercles, rectangles, murs), évités par les boids et les prédateurs.
+
+La géométrie est précalculée une seule fois, à la création du moteur (cf.
+bake), en une grille de distances signées au bord des obstacles (négatives
+à l'intérieur) et de normales (gradient de cette distance, tourné vers
+l'extérieur), aux nœuds d'un quadrillage de pas ~cell. Pendant les pas, la
+force d'évitement d'un agent ne demande qu'une lecture de la grille
+(interpolation bilinéaire entre les quatre nœuds qui l'entourent), quel
+que soit le nombre d'obstacles.
+
+Un agent à moins de avoid_radius d'un obstacle (ou dedans) est dirigé le
+long de la normale, comme pour les autres forces : normale * vitesse
+maximale - vitesse, limitée à la force maximale (cf.
+flock_numpy.steer_rows), puis pondérée par w_avoid.
+
+Les obstacles sont décrits par des listes (constante OBSTACLES des scripts,
+paramètre obstacles des scénarios) :
+
+    ("circle", x, y, rayon)
+    ("box", x0, y0, x1, y1)                rectangle aux côtés parallèles aux axes
+    ("wall", x0, y0, x1, y1, épaisseur)    segment épaissi, bouts arrondis
+"""
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Circle:
+    x: float
+    y: float
+    radius: float
+
+    def distance(self, x, y):
+        return np.hypot(x - self.x, y - self.y) - self.radius
+
+    def bounds(self):
+        r = self.radius
+        return self.x - r, self.y - r, self.x + r, self.y + r
+
+
+@dataclass(frozen=True)
+class Box:
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+
+    def distance(self, x, y):
+        # Distance au rectangle : euclidienne dehors, à son bord le plus
+        # proche (négative) dedans
+        qx = np.abs(x - (self.x0 + self.x1) / 2) - (self.x1 - self.x0) / 2
+        qy = np.abs(y - (self.y0 + self.y1) / 2) - (self.y1 - self.y0) / 2
+        outside = np.hypot(np.maximum(qx, 0), np.maximum(qy, 0))
+        return outside + np.minimum(np.maximum(qx, qy), 0)
+
+    def bounds(self):
+        return self.x0, self.y0, self.x1, self.y1
+
+
+@dataclass(frozen=True)
+class Wall:
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    thickness: float
+
+    def distance(self, x, y):
+        # Distance au segment, moins la demi-épaisseur
+        dx = self.x1 - self.x0
+        dy = self.y1 - self.y0
+        length2 = dx * dx + dy * dy
+        if length2 > 0:
+            t = np.clip(((x - self.x0) * dx + (y - self.y0) * dy) / length2, 0, 1)
+        else:
+            t = 0
+        return np.hypot(x - (self.x0 + t * dx), y - (self.y0 + t * dy)) - self.thickness / 2
+
+    def bounds(self):
+        h = self.thickness / 2
+        return (min(self.x0, self.x1) - h, min(self.y0, self.y1) - h,
+                max(self.x0, self.x1) + h, max(self.y0, self.y1) + h)
+
+
+# Forme de chaque type : (classe, nombre de valeurs après le type)
+KINDS = {"circle": (Circle, 3), "box": (Box, 4), "wall": (Wall, 5)}
+
+
+def parse(specs):
+    """Formes décrites par specs (cf. en-tête) ; ValueError si une
+    description est invalide."""
+    shapes = []
+    for spec in specs:
+        if (not isinstance(spec, (list, tuple)) or not spec or not isinstance(spec[0], str)
+                or spec[0] not in KINDS):
+            raise ValueError(f"obstacle {spec!r} : type attendu parmi {sorted(KINDS)}")
+        cls, count = KINDS[spec[0]]
+        values = spec[1:]
+        if len(values) != count or not all(
+                isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v)
+                for v in values):
+            raise ValueError(f"obstacle {spec!r} : {count} nombres attendus après {spec[0]!r}")
+        shape = cls(*(float(v) for v in values))
+        if isinstance(shape, Circle) and shape.radius <= 0:
+            raise ValueError(f"obstacle {spec!r} : rayon > 0 attendu")
+        if isinstance(shape, Box) and not (shape.x0 < shape.x1 and shape.y0 < shape.y1):
+            raise ValueError(f"obstacle {spec!r} : x0 < x1 et y0 < y1 attendus")
+        if isinstance(shape, Wall) and shape.thickness <= 0:
+            raise ValueError(f"obstacle {spec!r} : épaisseur > 0 attendue")
+        shapes.append(shape)
+    return shapes
+
+
+# Côté d'une tuile de la grille des distances, en intervalles entre nœuds
+TILE = 32
+
+
+class DistanceField:
+    """Grille de distances signées et de normales des obstacles shapes.
+
+    Le nœud (j, i) de la grille est au point (i · cell_w, j · cell_h), pour
+    i <= cols et j <= rows. Les distances sont plafonnées à reach : au-delà,
+    la grille vaut reach et les normales sont nulles.
+
+    La grille est rangée par tuiles de TILE × TILE intervalles : seules les
+    tuiles à moins de reach d'un obstacle sont calculées et gardées, toutes
+    les autres désignent la tuile vide commune (indice 0). Un grand monde
+    presque vide ne coûte donc que ses obstacles. tile_index donne la tuile
+    de chaque case (ty, tx) ; distance, normal_x et normal_y empilent les
+    tuiles ((TILE + 1) × (TILE + 1) nœuds, bords communs dupliqués).
+
+    Chaque obstacle n'est évalué que sur les tuiles à moins de reach de son
+    rectangle englobant (sur un tore, wrap, aussi sur celles de ses images
+    de l'autre côté du monde).
+    """
+
+    def __init__(self, shapes, width, height, reach, cell=8.0, wrap=False):
+        self.shapes = tuple(shapes)
+        self.width = width
+        self.height = height
+        self.reach = reach
+        self.cols = max(1, int(math.ceil(width / cell)))
+        self.rows = max(1, int(math.ceil(height / cell)))
+        self.cell_w = width / self.cols
+        self.cell_h = height / self.rows
+        self.tile_index = np.zeros((-(-self.rows // TILE), -(-self.cols // TILE)), dtype=np.int64)
+
+        # Tuiles avec un nœud de plus de chaque côté, pour les différences
+        # centrées ; la première est la tuile vide commune
+        side = TILE + 3
+        aprons = [np.full((side, side), float(reach))]
+        images = [(ox, oy) for oy in (-height, 0, height) for ox in (-width, 0, width)]
+        for shape in self.shapes:
+            x0, y0, x1, y1 = shape.bounds()
+            for ox, oy in images if wrap else [(0, 0)]:
+                # Nœuds à moins de reach du rectangle englobant, puis tuiles
+                # dont les nœuds (bordure comprise) les rencontrent
+                i0 = math.floor((x0 + ox - reach) / self.cell_w)
+                i1 = math.ceil((x1 + ox + reach) / self.cell_w)
+                j0 = math.floor((y0 + oy - reach) / self.cell_h)
+                j1 = math.ceil((y1 + oy + reach) / self.cell_h)
+                for ty in range(max(-((TILE + 1 - j0) // TILE), 0),
+                                min((j1 + 1) // TILE, len(self.tile_index) - 1) + 1):
+                    for tx in range(max(-((TILE + 1 - i0) // TILE), 0),
+                                    min((i1 + 1) // TILE, self.tile_index.shape[1] - 1) + 1):
+                        if self.tile_index[ty, tx] == 0:
+                            self.tile_index[ty, tx] = len(aprons)
+                            aprons.append(np.full((side, side), float(reach)))
+                        apron = aprons[self.tile_index[ty, tx]]
+                        xs = np.arange(tx * TILE - 1, tx * TILE + TILE + 2) * self.cell_w - ox
+                        ys = np.arange(ty * TILE - 1, ty * TILE + TILE + 2) * self.cell_h - oy
+                        np.minimum(apron, shape.distance(xs[None, :], ys[:, None]), out=apron)
+
+        aprons = np.stack(aprons)
+        gx = (aprons[:, 1:-1, 2:] - aprons[:, 1:-1, :-2]) / (2 * self.cell_w)
+        gy = (aprons[:, 2:, 1:-1] - aprons[:, :-2, 1:-1]) / (2 * self.cell_h)
+        norm = np.hypot(gx, gy)
+        safe = np.where(norm > 0, norm, 1)
+        self.distance = np.ascontiguousarray(aprons[:, 1:-1, 1:-1])
+        self.normal_x = gx / safe
+        self.normal_y = gy / safe
+
+    @property
+    def tiles(self):
+        """Nombre de tuiles calculées (sans la tuile vide)."""
+        return len(self.distance) - 1
+
+    def sample(self, positions):
+        """(distance, normale x, normale y) interpolées en chaque position."""
+        fx = positions[:, 0] / self.cell_w
+        fy = positions[:, 1] / self.cell_h
+        i = np.clip(np.floor(fx).astype(np.intp), 0, self.cols - 1)
+        j = np.clip(np.floor(fy).astype(np.intp), 0, self.rows - 1)
+        tx = np.clip(fx - i, 0, 1)
+        ty = np.clip(fy - j, 0, 1)
+        # Indices à plat des quatre nœuds dans les tuiles empilées, communs
+        # aux trois grilles
+        tile = self.tile_index[j // TILE, i // TILE]
+        k = (tile * (TILE + 1) + j % TILE) * (TILE + 1) + i % TILE
+        corners = (k, k + 1, k + TILE + 1, k + TILE + 2)
+        return tuple(self._blend([grid.ravel().take(c) for c in corners], tx, ty)
+                     for grid in (self.distance, self.normal_x, self.normal_y))
+
+    @staticmethod
+    def _blend(values, tx, ty):
+        v00, v01, v10, v11 = values
+        return (v00 * (1 - tx) + v01 * tx) * (1 - ty) + (v10 * (1 - tx) + v11 * tx) * ty
+
+    def sample_point(self, x, y):
+        """Comme sample, pour un seul point (flottants Python)."""
+        fx = x / self.cell_w
+        fy = y / self.cell_h
+        i = min(max(math.floor(fx), 0), self.cols - 1)
+        j = min(max(math.floor(fy), 0), self.rows - 1)
+        tx = min(max(fx - i, 0.0), 1.0)
+        ty = min(max(fy - j, 0.0), 1.0)
+        tile = self.tile_index[j // TILE, i // TILE]
+        i %= TILE
+        j %= TILE
+        return tuple(float(self._blend((grid[tile, j, i], grid[tile, j, i + 1],
+                                        grid[tile, j + 1, i], grid[tile, j + 1, i + 1]), tx, ty))
+                     for grid in (self.distance, self.normal_x, self.normal_y))
+
+
+def field_shapes(field):
+    """Formes d'une grille de bake (tuple vide sans obstacles)."""
+    return field.shapes if field is not None else ()
+
+
+def avoidance(position, velocity, cfg, max_speed, max_force):
+    """Écart (x, y) le long de la normale des obstacles si position est à
+    moins de cfg.avoid_radius de l'un d'eux (cf. en-tête) ; None sinon,
+    pour que l'appelant n'ait rien à ajouter (cas le plus courant).
+
+    Version point par point des moteurs objets : position et velocity sont
+    des couples (x, y), cfg.obstacles la grille de bake.
+    """
+    x, y = position
+    vx, vy = velocity
+    distance, nx, ny = cfg.obstacles.sample_point(x, y)
+    norm = math.sqrt(nx * nx + ny * ny)
+    if distance >= cfg.avoid_radius or norm == 0:
+        return None
+    sx = nx / norm * max_speed - vx
+    sy = ny / norm * max_speed - vy
+    length = math.sqrt(sx * sx + sy * sy)
+    if length > max_force:
+        sx *= max_force / length
+        sy *= max_force / length
+    return sx, sy
+
+
+def bake(specs, width, height, avoid_radius, cell=8.0, wrap=False):
+    """Grille des obstacles décrits par specs, ou None s'il n'y en a pas.
+
+    Les distances sont gardées jusqu'à avoid_radius plus deux nœuds :
+    assez pour que les normales soient exactes partout où la force
+    s'applique.
+    """
+    shapes = parse(specs)
+    if not shapes:
+        return None
+    return DistanceField(shapes, width, height, avoid_radius + 2 * cell, cell, wrap)
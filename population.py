@@ -0,0 +1,172 @@
+"""Cycle de vie des boids : captures par les prédateurs, réapparitions et naissances.
+
+Les agents sont rangés dans un pool réservé une fois pour toutes (capacité
+fixe) : les len(flock) premières lignes sont les boids actifs, le reste est
+libre. Un boid retiré est remplacé par le dernier boid actif (O(1), aucune
+liste décalée, aucun tableau réalloué) ; un boid ajouté prend la première
+ligne libre. Les quatre moteurs rangent leurs agents ainsi (cf. remove,
+add), dans le même ordre : pour une même graine, ils font les mêmes
+captures.
+
+Déroulement d'un pas : compute_forces retient, pour chaque prédateur, la
+ligne du boid qu'il poursuit (predator_targets) ; au début du pas suivant,
+avant la recherche de voisins, Lifecycle.update mange ceux qui sont à moins
+de capture_radius de leur prédateur, puis fait réapparaître et naître les
+boids prévus.
+"""
+import collections
+import math
+import random
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class LifeConfig:
+    width: float
+    height: float
+    max_speed: float
+    wrap: bool = False
+    # un prédateur mange sa proie si elle est à moins de capture_radius (0 : jamais)
+    capture_radius: float = 0.0
+    # pas avant qu'un boid mangé réapparaisse, au hasard, dans son équipe (< 0 : jamais)
+    respawn_delay: int = -1
+    # naissances par boid et par pas, dans la limite de la capacité du pool
+    birth_rate: float = 0.0
+
+
+# kind : "kill", "respawn" ou "birth" ; predator : indice du prédateur (-1
+# hors capture)
+Event = collections.namedtuple("Event", ("step", "kind", "team", "x", "y", "predator"))
+
+
+def remove_rows(arrays, count, rows):
+    """Retire rows (lignes distinctes < count) des count premières lignes de
+    chaque tableau : chaque ligne retirée reçoit la dernière ligne active.
+    Renvoie le nouveau nombre de lignes actives."""
+    # Par ordre décroissant : la dernière ligne active n'est jamais une
+    # ligne encore à retirer
+    for row in sorted(rows, reverse=True):
+        count -= 1
+        if row != count:
+            for array in arrays:
+                array[row] = array[count]
+    return count
+
+
+class Lifecycle:
+    """Captures, réapparitions et naissances d'une simulation (cf. en-tête).
+
+    Le moteur fournit predator_targets, agent(row), predator_position(k),
+    remove(rows), add(x, y, vx, vy, team) et capacity.
+    """
+
+    def __init__(self, config, rng=None):
+        self.config = config
+        self.rng = rng or random.Random()
+        self.kills = 0
+        self.respawns = 0
+        self.births = 0
+        self.kills_by_team = collections.Counter()
+        # Événements du dernier appel à update (liste réutilisée)
+        self.events = []
+        # (pas de réapparition, équipe), par pas croissant
+        self._pending = collections.deque()
+
+    def update(self, flock):
+        cfg = self.config
+        step = flock.steps
+        self.events.clear()
+        if cfg.capture_radius > 0:
+            self._captures(flock, step)
+
+        while self._pending and self._pending[0][0] <= step and len(flock) < flock.capacity:
+            _, team = self._pending.popleft()
+            rng = self.rng
+            x, y = rng.uniform(0, cfg.width), rng.uniform(0, cfg.height)
+            vx, vy = self._heading(rng.uniform(1, cfg.max_speed))
+            flock.add(x, y, vx, vy, team)
+            self.respawns += 1
+            self.events.append(Event(step, "respawn", team, x, y, -1))
+
+        if cfg.birth_rate > 0:
+            self._births(flock, step)
+
+    def _captures(self, flock, step):
+        cfg = self.config
+        targets = getattr(flock, "predator_targets", None)
+        if targets is None:
+            return
+        eaten = []
+        for k, row in enumerate(targets):
+            row = int(row)
+            if row < 0 or row in eaten:
+                continue
+            x, y, _, _, team = flock.agent(row)
+            px, py = flock.predator_position(k)
+            dx, dy = x - px, y - py
+            if cfg.wrap:
+                dx -= cfg.width * round(dx / cfg.width)
+                dy -= cfg.height * round(dy / cfg.height)
+            if math.hypot(dx, dy) < cfg.capture_radius:
+                eaten.append(row)
+                self.kills += 1
+                self.kills_by_team[team] += 1
+                self.events.append(Event(step, "kill", team, x, y, k))
+                if cfg.respawn_delay >= 0:
+                    self._pending.append((step + cfg.respawn_delay, team))
+        if eaten:
+            flock.remove(eaten)
+        flock.predator_targets = None
+
+    def _births(self, flock, step):
+        # Nombre de naissances : partie entière de l'espérance, plus une avec
+        # la probabilité de sa partie fractionnaire
+        rng = self.rng
+        expected = self.config.birth_rate * len(flock)
+        count = int(expected) + (rng.random() < expected - int(expected))
+        for _ in range(count):
+            if len(flock) == 0 or len(flock) >= flock.capacity:
+                break
+            # Le petit naît à côté d'un parent tiré au hasard, dans une
+            # direction quelconque, à la vitesse du parent
+            x, y, vx, vy, team = flock.agent(rng.randrange(len(flock)))
+            vx, vy = self._heading(math.hypot(vx, vy))
+            flock.add(x, y, vx, vy, team)
+            self.births += 1
+            self.events.append(Event(step, "birth", team, x, y, -1))
+
+    def _heading(self, speed):
+        angle = math.radians(self.rng.uniform(0, 360))
+        return math.cos(angle) * speed, math.sin(angle) * speed
+
+    def summary(self, state):
+        """Métriques de survie : compteurs et survivants par équipe."""
+        survivors = collections.Counter(state["teams"].tolist())
+        return {
+            "kills": self.kills,
+            "respawns": self.respawns,
+            "births": self.births,
+            "kills_by_team": {str(team): n for team, n in sorted(self.kills_by_team.items())},
+            "survivors_by_team": {str(team): n for team, n in sorted(survivors.items())},
+        }
+
+    def state(self, flock):
+        """Ce qu'il faut garder dans un point de reprise (JSON)."""
+        targets = getattr(flock, "predator_targets", None)
+        return {
+            "kills": self.kills,
+            "respawns": self.respawns,
+            "births": self.births,
+            "kills_by_team": {str(team): n for team, n in self.kills_by_team.items()},
+            "pending": [list(item) for item in self._pending],
+            "targets": None if targets is None else [int(row) for row in targets],
+        }
+
+    def restore(self, flock, data):
+        self.kills = data["kills"]
+        self.respawns = data["respawns"]
+        self.births = data["births"]
+        self.kills_by_team = collections.Counter(
+            {int(team): n for team, n in data["kills_by_team"].items()})
+        self._pending = collections.deque(tuple(item) for item in data["pending"])
+        flock.predator_targets = data["targets"]
@@ -0,0 +1,136 @@
+"""Instrumentation de la boucle principale : temps par phase, percentiles
+glissants, contrôles de voisinage par boid, affichage à l'écran et export CSV.
+
+Désactivé, on utilise NullProfiler dont les méthodes ne font rien : le coût
+est de quelques appels vides par frame, indépendant du nombre de boids.
+"""
+import csv
+import time
+from collections import deque
+from pathlib import Path
+
+import pygame
+
+PHASES = ("events", "neighbors", "forces", "integration", "render")
+HUD_COLOR = (180, 255, 180)
+
+
+class NullProfiler:
+    enabled = False
+
+    def begin_frame(self):
+        pass
+
+    def mark(self, phase):
+        pass
+
+    def end_frame(self, flock=None):
+        pass
+
+    def draw(self, surface, extra=()):
+        pass
+
+    def toggle_hud(self):
+        pass
+
+    def write_csv(self, path):
+        pass
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self, window=300, hud=True, record=False):
+        # window : nombre de frames prises en compte dans les percentiles
+        self.samples = {phase: deque(maxlen=window) for phase in PHASES}
+        self.checks_per_boid = deque(maxlen=window)
+        self.hud = hud
+        self.record = record
+        self.rows = []
+        self.frame = 0
+        self._times = {}
+        self._last = 0.0
+        self._font = None
+
+    def begin_frame(self):
+        self._times = {}
+        self._last = time.perf_counter()
+
+    def mark(self, phase):
+        # Durée écoulée depuis la marque précédente, attribuée à phase
+        now = time.perf_counter()
+        self._times[phase] = self._times.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def end_frame(self, flock=None):
+        for phase in PHASES:
+            self.samples[phase].append(self._times.get(phase, 0.0))
+
+        checks = None
+        if flock is not None and len(flock):
+            checks = flock.neighbor_checks / len(flock)
+            self.checks_per_boid.append(checks)
+
+        if self.record:
+            row = {"frame": self.frame}
+            row.update({phase: self._times.get(phase, 0.0) for phase in PHASES})
+            row["checks_per_boid"] = checks
+            self.rows.append(row)
+        self.frame += 1
+
+    def percentile(self, phase, q):
+        values = sorted(self.samples[phase])
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+    def toggle_hud(self):
+        self.hud = not self.hud
+
+    def lines(self):
+        total = sum(self.percentile(phase, 50) for phase in PHASES)
+        lines = [f"frame p50 {total * 1e3:6.2f} ms"]
+        for phase in PHASES:
+            lines.append(f"{phase:12} p50 {self.percentile(phase, 50) * 1e3:6.2f}"
+                         f"  p95 {self.percentile(phase, 95) * 1e3:6.2f}"
+                         f"  p99 {self.percentile(phase, 99) * 1e3:6.2f} ms")
+        if self.checks_per_boid:
+            lines.append(f"voisins testés / boid {self.checks_per_boid[-1]:7.1f}")
+        return lines
+
+    def draw(self, surface, extra=()):
+        # extra : lignes affichées à la suite (cf. window.SimulationWorker)
+        if not self.hud:
+            return
+        if self._font is None:
+            self._font = pygame.font.SysFont("monospace", 14)
+        y = 6
+        for line in (*self.lines(), *extra):
+            surface.blit(self._font.render(line, True, HUD_COLOR), (6, y))
+            y += 16
+
+    def write_csv(self, path):
+        """Écrit une ligne par frame enregistrée (record=True)."""
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["frame", *PHASES, "checks_per_boid"])
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+
+def sibling_path(path, suffix):
+    """path avec suffix ajouté au nom : mesures.csv -> mesures-simulation.csv."""
+    path = Path(path)
+    return path.with_name(f"{path.stem}-{suffix}{path.suffix}")
+
+
+def make_profiler(enabled, csv_path=None):
+    if not enabled and csv_path is None:
+        return NullProfiler()
+    return Profiler(hud=enabled, record=csv_path is not None)
+
+
+def add_arguments(parser):
+    parser.add_argument("--profile", action="store_true",
+                        help="mesure chaque phase et affiche les temps (F3 : masquer)")
+    parser.add_argument("--profile-csv", default=None,
+                        help="écrit les temps de chaque frame dans ce fichier CSV")
@@ -0,0 +1,127 @@
+"""Rendu groupé des boids : triangles pré-tournés, blittés en un seul appel.
+
+Pour chaque couleur (équipe) on dessine une fois le triangle dans `buckets`
+orientations. À chaque frame, l'orientation de tous les agents est arrondie
+au sprite le plus proche de façon vectorisée, puis tout est envoyé à
+Surface.blits : plus d'appel pygame.draw.polygon par agent.
+
+Les obstacles (cf. obstacles), peu nombreux, sont dessinés forme par forme.
+"""
+import math
+
+import numpy as np
+import pygame
+
+from obstacles import Box, Circle, Wall
+
+
+class SpriteRenderer:
+    def __init__(self, colors, size, buckets=72):
+        # colors : {équipe: couleur} ; size : demi-longueur du triangle
+        self.colors = colors
+        self.size = size
+        self.buckets = buckets
+        self.teams = np.array(sorted(colors))
+        self._sprites = None
+
+    def _build(self):
+        size = self.size
+        side = 2 * size + 2
+        center = side / 2
+        table = np.empty((len(self.teams), self.buckets), dtype=object)
+        convert = pygame.display.get_surface() is not None
+
+        for t, team in enumerate(self.teams):
+            for b in range(self.buckets):
+                angle = 2 * math.pi * b / self.buckets
+                hx, hy = math.cos(angle), math.sin(angle)
+                nx, ny = -hy, hx
+                # Triangle orienté vers +x : pointe, arrière bas, arrière haut
+                points = [
+                    (center + hx * size, center + hy * size),
+                    (center - hx * size + nx * size / 2, center - hy * size + ny * size / 2),
+                    (center - hx * size - nx * size / 2, center - hy * size - ny * size / 2),
+                ]
+                sprite = pygame.Surface((side, side), pygame.SRCALPHA)
+                pygame.draw.polygon(sprite, self.colors[team], points)
+                table[t, b] = sprite.convert_alpha() if convert else sprite
+        self._sprites = table
+        self._offset = center
+
+    def draw(self, surface, positions, velocities, teams=None):
+        if len(positions) == 0:
+            return
+        if self._sprites is None:
+            self._build()
+
+        angle = np.arctan2(velocities[:, 1], velocities[:, 0])
+        bucket = np.rint(angle * (self.buckets / (2 * math.pi))).astype(np.intp) % self.buckets
+        if teams is None:
+            team_slot = np.zeros(len(positions), dtype=np.intp)
+        else:
+            team_slot = np.searchsorted(self.teams, teams).clip(max=len(self.teams) - 1)
+
+        sprites = self._sprites[team_slot, bucket]
+        dests = np.rint(positions - self._offset).astype(np.intp).tolist()
+        surface.blits(zip(sprites, dests), doreturn=False)
+
+
+_renderers = {}
+
+
+def sprite_size(size, camera=None):
+    """Demi-longueur en pixels d'un triangle de size unités du monde vu par
+    camera, à l'échelle des obstacles (cf. draw_obstacles). Le zoom est
+    arrondi à une demi-puissance de 2 (peu de jeux de sprites à
+    construire, size exactement à l'échelle 1) ; au moins 1 pixel."""
+    if camera is None:
+        return size
+    zoom = 2 ** (round(2 * math.log2(camera.zoom)) / 2)
+    return max(1, round(size * zoom))
+
+
+def sprites(colors, size):
+    """SpriteRenderer de ces couleurs ({équipe: couleur}) et de cette taille,
+    partagé : construit au premier appel, puis à chaque changement de
+    couleurs (un scénario peut remplacer celles du script)."""
+    key = (tuple(sorted(colors.items())), size)
+    if key not in _renderers:
+        _renderers[key] = SpriteRenderer(dict(colors), size)
+    return _renderers[key]
+
+
+def draw_obstacles(surface, shapes, color, camera=None):
+    """Dessine les formes de obstacles.parse (cercles, rectangles, murs), vues
+    par camera (cf. camera.Camera ; sans caméra, le monde à l'échelle 1).
+
+    Seules les formes qui rencontrent la vue sont dessinées, une fois par
+    rectangle de la vue (cf. Camera.pieces) : un monde plus grand que
+    l'écran ne coûte que ce qui est visible.
+    """
+    if camera is None:
+        pieces, zoom, place = [(-math.inf, -math.inf, math.inf, math.inf, 0, 0)], 1.0, _same
+    else:
+        pieces, zoom, place = camera.pieces(), camera.zoom, camera.point_to_screen
+    for x0, y0, x1, y1, dx, dy in pieces:
+        for shape in shapes:
+            bx0, by0, bx1, by1 = shape.bounds()
+            if bx1 < x0 or bx0 > x1 or by1 < y0 or by0 > y1:
+                continue
+            if isinstance(shape, Circle):
+                pygame.draw.circle(surface, color, place(shape.x, shape.y, dx, dy),
+                                   shape.radius * zoom)
+            elif isinstance(shape, Box):
+                left, top = place(shape.x0, shape.y0, dx, dy)
+                pygame.draw.rect(surface, color, pygame.Rect(
+                    left, top, (shape.x1 - shape.x0) * zoom, (shape.y1 - shape.y0) * zoom))
+            elif isinstance(shape, Wall):
+                # Segment épais, bouts arrondis
+                ends = [place(shape.x0, shape.y0, dx, dy), place(shape.x1, shape.y1, dx, dy)]
+                pygame.draw.line(surface, color, *ends, max(1, round(shape.thickness * zoom)))
+                for end in ends:
+                    pygame.draw.circle(surface, color, end, shape.thickness * zoom / 2)
+
+
+def _same(x, y, dx, dy):
+    # Sans caméra : coordonnées du monde = pixels
+    return x, y
@@ -0,0 +1,293 @@
+"""Scénarios : les paramètres d'une simulation décrits dans un fichier TOML ou JSON.
+
+Un scénario choisit le script (simple, equipes ou pred) et remplace tout ou
+partie de ses constantes ; les noms sont ceux des constantes, en minuscules
+ou en majuscules. Exemple (TOML) :
+
+    simulation = "pred"
+    engine = "numpy"        # facultatif : objects, numpy, parallel ou compiled
+    seed = 1                # facultatif
+    steps = 5000            # facultatif : nombre de pas en mode --headless
+
+    [parameters]
+    width = 2000
+    height = 1400
+    team_sizes = [500, 500, 500]
+    w_flee = 3.0
+    obstacles = [["circle", 1000, 700, 150], ["wall", 200, 200, 800, 200, 20]]
+
+Le fichier est entièrement vérifié au chargement (clés, noms, types,
+valeurs) ; les constantes sont ensuite fixées sur le module du script, et
+chaque moteur les lit une seule fois, à sa création (cf. build_flock).
+
+    python scenario.py scenarios/pred.toml
+    python scenario.py scenarios/pred.toml --headless --steps 2000 --output final.npz
+"""
+import argparse
+import copy
+import importlib
+import json
+import sys
+from pathlib import Path
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+import checkpoint
+import headless
+import obstacles
+import window
+
+SCRIPTS = {
+    "simple": "boids_simulation_simple",
+    "equipes": "boids_simulation_equipes",
+    "pred": "boids_simulation_pred",
+}
+
+ENGINES = ("objects", "numpy", "parallel", "compiled")
+
+KEYS = ("simulation", "engine", "seed", "steps", "parameters")
+
+# Constantes entières (nombres d'agents, tailles) ; les autres nombres
+# peuvent être entiers ou réels
+INTEGERS = ("WIDTH", "HEIGHT", "NUM_BOIDS", "NUM_PREDATORS", "LOD_CELLS", "MAX_NEIGHBORS",
+            "RESPAWN_DELAY", "MAX_BOIDS")
+
+
+def module_for(simulation):
+    return importlib.import_module(SCRIPTS[simulation])
+
+
+_defaults = {}
+
+
+def defaults(simulation):
+    """Valeurs d'origine des constantes réglables du script (cf.
+    checkpoint.constants), relevées au premier appel."""
+    if simulation not in _defaults:
+        module = module_for(simulation)
+        _defaults[simulation] = {name: copy.deepcopy(getattr(module, name))
+                                 for name in checkpoint.constants(module)}
+    return _defaults[simulation]
+
+
+def _check_number(name, value, minimum, strict):
+    if strict and not value > minimum or not value >= minimum:
+        sign = ">" if strict else ">="
+        raise ValueError(f"{name} doit être {sign} {minimum} (reçu {value!r})")
+
+
+def _check_color(name, value):
+    if (not isinstance(value, list) or len(value) != 3
+            or not all(isinstance(c, int) and not isinstance(c, bool) and 0 <= c <= 255
+                       for c in value)):
+        raise ValueError(f"{name} : couleur attendue [r, g, b] entre 0 et 255 (reçu {value!r})")
+
+
+def check_parameter(name, value, default):
+    """Vérifie value pour la constante name (de valeur d'origine default) et
+    la renvoie au type de default. Lève ValueError sinon."""
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            raise ValueError(f"{name} : booléen attendu (reçu {value!r})")
+        return value
+
+    if isinstance(default, (int, float)):
+        integer = name in INTEGERS
+        kinds = (int,) if integer else (int, float)
+        if isinstance(value, bool) or not isinstance(value, kinds):
+            raise ValueError(f"{name} : {'entier' if integer else 'nombre'} attendu "
+                             f"(reçu {value!r})")
+        if (name in ("WIDTH", "HEIGHT", "MAX_SPEED", "OBSTACLE_CELL")
+                or name.endswith(("_RADIUS", "_SPEED"))):
+            _check_number(name, value, 0, strict=True)
+        elif name == "RESPAWN_DELAY":
+            # -1 : jamais
+            _check_number(name, value, -1, strict=False)
+        else:
+            _check_number(name, value, 0, strict=False)
+        return value
+
+    if isinstance(default, (list, tuple)):
+        if not isinstance(value, list):
+            raise ValueError(f"{name} : liste attendue (reçu {value!r})")
+        if name == "OBSTACLES":
+            # Vérifiés par obstacles.parse ; chacun gardé tel quel (liste)
+            obstacles.parse(value)
+        elif name == "TEAM_SIZES":
+            if not value:
+                raise ValueError("TEAM_SIZES : au moins une équipe")
+            for size in value:
+                if isinstance(size, bool) or not isinstance(size, int) or size < 0:
+                    raise ValueError(f"TEAM_SIZES : effectifs entiers >= 0 attendus (reçu {value!r})")
+        elif name.endswith("COLORS"):
+            if not value:
+                raise ValueError(f"{name} : au moins une couleur")
+            for color in value:
+                _check_color(name, color)
+            value = [tuple(color) for color in value]
+        elif name.endswith("COLOR"):
+            _check_color(name, value)
+        return tuple(value) if isinstance(default, tuple) else value
+
+    if not isinstance(value, type(default)):
+        raise ValueError(f"{name} : {type(default).__name__} attendu (reçu {value!r})")
+    return value
+
+
+def check_world(simulation, parameters):
+    """Lève ValueError si, avec parameters (le reste aux valeurs d'origine),
+    le monde torique fait moins de deux rayons de voisinage de large.
+
+    En dessous, un même voisin est à portée par deux images : les grilles
+    des moteurs (cf. SpatialGrid, flock_numpy.CellIndex) n'en gardent pas
+    toujours la même, et les moteurs divergent.
+    """
+    values = {**defaults(simulation), **parameters}
+    if not values["WRAP_NEIGHBORS"]:
+        return
+    radius = max(values["NEIGHBOR_RADIUS"], values["SEPARATION_RADIUS"])
+    for name in ("WIDTH", "HEIGHT"):
+        if values[name] < 2 * radius:
+            raise ValueError(f"{name} doit être >= 2 × {radius} (plus grand rayon de "
+                             f"voisinage) sur un tore, WRAP_NEIGHBORS (reçu {values[name]!r})")
+
+
+def validate(data, source="scénario"):
+    """Scénario normalisé (noms de constantes en majuscules, valeurs
+    vérifiées) à partir du contenu brut d'un fichier."""
+    if not isinstance(data, dict):
+        raise ValueError(f"{source} : table de clés attendue")
+    unknown = sorted(set(data) - set(KEYS))
+    if unknown:
+        raise ValueError(f"{source} : clés inconnues {unknown} (attendues : {list(KEYS)})")
+
+    simulation = data.get("simulation")
+    if simulation not in SCRIPTS:
+        raise ValueError(f"{source} : simulation doit valoir l'un de {sorted(SCRIPTS)} "
+                         f"(reçu {simulation!r})")
+    engine = data.get("engine", "objects")
+    if engine not in ENGINES:
+        raise ValueError(f"{source} : engine doit valoir l'un de {list(ENGINES)} (reçu {engine!r})")
+    for key in ("seed", "steps"):
+        value = data.get(key)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+            raise ValueError(f"{source} : {key} doit être un entier (reçu {value!r})")
+    if data.get("steps") is not None and data["steps"] < 0:
+        raise ValueError(f"{source} : steps doit être >= 0")
+
+    raw = data.get("parameters", {})
+    if not isinstance(raw, dict):
+        raise ValueError(f"{source} : parameters doit être une table")
+    known = defaults(simulation)
+    parameters = {}
+    for key, value in raw.items():
+        name = key.upper()
+        if name not in known:
+            raise ValueError(f"{source} : paramètre {key!r} inconnu pour la simulation "
+                             f"{simulation!r}")
+        if name in parameters:
+            raise ValueError(f"{source} : paramètre {name} donné deux fois")
+        try:
+            parameters[name] = check_parameter(name, value, known[name])
+        except ValueError as error:
+            raise ValueError(f"{source} : {error}") from None
+    try:
+        check_world(simulation, parameters)
+    except ValueError as error:
+        raise ValueError(f"{source} : {error}") from None
+
+    return {
+        "simulation": simulation,
+        "engine": engine,
+        "seed": data.get("seed"),
+        "steps": data.get("steps"),
+        "parameters": parameters,
+    }
+
+
+def read(path):
+    """Contenu brut d'un fichier .toml ou .json."""
+    path = Path(path)
+    if path.suffix == ".json":
+        with open(path) as f:
+            return json.load(f)
+    if path.suffix == ".toml":
+        if tomllib is None:
+            raise ValueError(f"{path} : la lecture du TOML demande Python 3.11+ ou le paquet tomli")
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    raise ValueError(f"{path} : extension .toml ou .json attendue")
+
+
+def load(path):
+    """Lit et vérifie le scénario de path."""
+    return validate(read(path), str(path))
+
+
+def apply(simulation, parameters):
+    """Remet les constantes du script à leur valeur d'origine, puis fixe
+    parameters (déjà vérifiés) ; renvoie le module du script.
+
+    Les valeurs d'origine sont remises d'abord : un même processus peut
+    enchaîner plusieurs scénarios (cf. sweep).
+    """
+    module = module_for(simulation)
+    for name, value in {**defaults(simulation), **parameters}.items():
+        setattr(module, name, copy.deepcopy(value))
+    return module
+
+
+def build(scenario, engine=None, seed=None):
+    """Simulation du scénario (moteur et graine du fichier, sauf si donnés)."""
+    module = apply(scenario["simulation"], scenario["parameters"])
+    return module.create_flock(engine or scenario["engine"],
+                               scenario["seed"] if seed is None else seed)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulation de boids décrite par un scénario")
+    parser.add_argument("scenario", help="fichier .toml ou .json")
+    parser.add_argument("--engine", choices=ENGINES, default=None,
+                        help="remplace le moteur du scénario")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="remplace la graine du scénario")
+    headless.add_arguments(parser)
+    window.add_arguments(parser)
+    checkpoint.add_arguments(parser)
+    # Sans --steps, on prend celui du scénario
+    parser.set_defaults(steps=None)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenario = load(args.scenario)
+    module = apply(scenario["simulation"], scenario["parameters"])
+    engine = args.engine or scenario["engine"]
+    seed = scenario["seed"] if args.seed is None else args.seed
+
+    if args.replay:
+        module.replay(args.replay, args.screen)
+    elif args.headless:
+        steps = args.steps if args.steps is not None else scenario["steps"]
+        if steps is None:
+            steps = 1000
+        _, summary = module.run_headless(steps, engine, seed,
+                                         **headless.options(args), **checkpoint.options(args))
+        print(json.dumps(summary, indent=2))
+    else:
+        module.main(engine=engine, seed=seed, **window.options(args),
+                    **checkpoint.options(args))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except ValueError as error:
+        sys.exit(f"erreur : {error}")
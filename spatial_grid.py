@@ -0,0 +1,136 @@
+"""Grille uniforme (spatial hash) pour les requêtes de voisinage des boids."""
+import math
+
+from pygame.math import Vector2
+
+
+class SpatialGrid:
+    """Range les agents par cellules de côté >= cell_size.
+
+    Tant que le rayon cherché est <= cell_size, il suffit de parcourir la
+    cellule de la position et ses 8 voisines : une frame coûte alors O(N)
+    à densité constante au lieu de O(N²).
+
+    Avec wrap=True le monde est un tore : les voisines d'une cellule de bord
+    sont prises de l'autre côté, et chacune porte le décalage (±width,
+    ±height) qui amène ses agents à leur image la plus proche. La distance
+    minimale sur le tore s'obtient donc sans test par paire. Sur un monde de
+    moins de 3 cellules, une même cellule revient avec des décalages
+    différents : chaque image est un candidat distinct, et tant que le monde
+    fait au moins deux rayons de large une seule est à portée.
+    """
+
+    def __init__(self, width, height, cell_size, wrap=False):
+        self.cols = max(1, int(width // cell_size))
+        self.rows = max(1, int(height // cell_size))
+        self.cell_w = width / self.cols
+        self.cell_h = height / self.rows
+        self.cells = [[] for _ in range(self.cols * self.rows)]
+        self.width = width
+        self.height = height
+        self.wrap = wrap
+
+        # Cellules non vides depuis le dernier rebuild : seules à vider au
+        # suivant (un grand monde clairsemé ne coûte que ses agents)
+        self._occupied = []
+        # Voisinage 3x3 des cellules, calculé à la première demande :
+        # liste de (décalage, cellule). Les listes des cellules sont vidées
+        # sur place à chaque rebuild, donc ces références restent valides.
+        self._neighborhoods = {}
+
+    def cell_coords(self, position):
+        cx = int(position.x / self.cell_w)
+        cy = int(position.y / self.cell_h)
+        # Les positions peuvent valoir exactement WIDTH / HEIGHT (cf. edges)
+        cx = min(max(cx, 0), self.cols - 1)
+        cy = min(max(cy, 0), self.rows - 1)
+        return cx, cy
+
+    def cell_index(self, position):
+        cx, cy = self.cell_coords(position)
+        return cy * self.cols + cx
+
+    def rebuild(self, agents):
+        # À appeler une fois par frame, avant les comportements.
+        for index in self._occupied:
+            self.cells[index].clear()
+        self._occupied.clear()
+        for agent in agents:
+            index = self.cell_index(agent.position)
+            cell = self.cells[index]
+            if not cell:
+                self._occupied.append(index)
+            cell.append(agent)
+
+    def neighborhood(self, position):
+        """Cellules autour de position : liste de (décalage, agents).
+
+        L'image d'un agent `other` vue depuis position est
+        other.position + décalage ; les candidats restent à filtrer par
+        distance.
+        """
+        index = self.cell_index(position)
+        block = self._neighborhoods.get(index)
+        if block is None:
+            block = self._neighborhoods[index] = self._neighborhood(index)
+        return block
+
+    def _neighborhood(self, index):
+        cy, cx = divmod(index, self.cols)
+        block = []
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                nx, ny = cx + dx, cy + dy
+                ox = oy = 0
+                if self.wrap:
+                    if nx < 0:
+                        nx, ox = nx + self.cols, -self.width
+                    elif nx >= self.cols:
+                        nx, ox = nx - self.cols, self.width
+                    if ny < 0:
+                        ny, oy = ny + self.rows, -self.height
+                    elif ny >= self.rows:
+                        ny, oy = ny - self.rows, self.height
+                elif not (0 <= nx < self.cols and 0 <= ny < self.rows):
+                    continue
+                block.append((Vector2(ox, oy), self.cells[ny * self.cols + nx]))
+        return block
+
+    def nearest(self, position, radius):
+        """Agent le plus proche de position à distance <= radius, ou None.
+
+        Renvoie (agent, vecteur position -> agent, distance). Les anneaux de
+        cellules sont parcourus du centre vers l'extérieur ; la recherche
+        s'arrête dès qu'aucun anneau restant ne peut contenir plus proche,
+        et au plus tard à l'anneau qui couvre radius.
+        """
+        cx, cy = self.cell_coords(position)
+        px, py = position.x, position.y
+        step = min(self.cell_w, self.cell_h)
+        best = None
+        best_dist = radius
+        for ring in range(int(math.ceil(radius / step)) + 1):
+            # Tout agent de cet anneau est à plus de (ring - 1) cellules
+            if best is not None and best_dist <= (ring - 1) * step:
+                break
+            for dy in range(-ring, ring + 1):
+                side = abs(dy) == ring
+                for dx in (range(-ring, ring + 1) if side else (-ring, ring)):
+                    nx, ny = cx + dx, cy + dy
+                    ox = oy = 0
+                    if self.wrap:
+                        ox = (nx // self.cols) * self.width
+                        oy = (ny // self.rows) * self.height
+                        nx %= self.cols
+                        ny %= self.rows
+                    elif not (0 <= nx < self.cols and 0 <= ny < self.rows):
+                        continue
+                    for agent in self.cells[ny * self.cols + nx]:
+                        ex = agent.position.x + ox - px
+                        ey = agent.position.y + oy - py
+                        d = math.hypot(ex, ey)
+                        if d <= best_dist:
+                            best, best_dist, bx, by = agent, d, ex, ey
+        if best is None:
+            return None
+        return best, Vector2(bx, by), best_dist
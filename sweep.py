@@ -0,0 +1,201 @@
+"""Balayage de paramètres : simulations sans fenêtre réparties sur un pool de processus.
+
+Exemples :
+    python sweep.py pred --grid W_ALIGNMENT=0.5,1,1.5 --grid W_FLEE=1,2.5 --output sweep.csv
+    python sweep.py simple --sample 32 --range NEIGHBOR_RADIUS=40:120 --range W_COHESION=0.2:1.5
+    python sweep.py --scenario scenarios/pred.toml --grid W_FLEE=1,2.5,4
+
+Avec --scenario, chaque point part des paramètres du scénario au lieu des
+constantes d'origine du script.
+"""
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import random
+import sys
+
+import numpy as np
+
+import headless
+import metrics
+import scenario
+from scenario import SCRIPTS
+
+# Constantes de module que l'on peut faire varier
+PARAMETERS = (
+    "W_ALIGNMENT", "W_COHESION", "W_SEPARATION",
+    "NEIGHBOR_RADIUS", "SEPARATION_RADIUS",
+    "W_FLEE", "PREDATOR_RADIUS",
+)
+
+
+def grid_points(space):
+    """Produit cartésien : {nom: [valeurs]} -> liste de {nom: valeur}."""
+    names = list(space)
+    return [dict(zip(names, values))
+            for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_points(ranges, count, seed=0):
+    """count tirages uniformes dans {nom: (min, max)}, reproductibles via seed."""
+    rng = random.Random(seed)
+    return [{name: rng.uniform(low, high) for name, (low, high) in ranges.items()}
+            for _ in range(count)]
+
+
+def make_tasks(script, points, steps, repeats=1, base_seed=0, engine="numpy", base=None):
+    """Une tâche par (point, répétition), chacune avec sa propre graine.
+
+    base : paramètres communs à toutes les tâches (ceux d'un scénario), que
+    les valeurs des points remplacent.
+
+    La graine ne dépend que de la position de la tâche dans la liste, pas du
+    processus qui l'exécute : le résultat est le même quel que soit le pool.
+    """
+    module = scenario.module_for(script)
+    for point in points:
+        for name in point:
+            if name not in PARAMETERS or not hasattr(module, name):
+                raise ValueError(f"paramètre {name!r} inconnu pour le script {script!r}")
+        scenario.check_world(script, {**(base or {}), **point})
+
+    tasks = []
+    for index, point in enumerate(points):
+        for repeat in range(repeats):
+            seed = base_seed + index * repeats + repeat
+            tasks.append((len(tasks), script, base or {}, point, seed, steps, engine))
+    return tasks
+
+
+def run_task(task):
+    """Exécute une simulation (dans un processus du pool) et renvoie sa ligne."""
+    run, script, base, point, seed, steps, engine = task
+    # Les constantes du module sont remises à leur valeur d'origine avant
+    # chaque tâche (cf. scenario.apply), puisqu'un même processus enchaîne
+    # plusieurs tâches.
+    module = scenario.apply(script, {**base, **point})
+
+    flock = module.create_flock(engine, seed)
+
+    # Captures distinctes : les prises (kills) si les boids sont capturés,
+    # sinon les entrées dans le rayon de capture d'un prédateur (un boid qui
+    # y reste n'est compté qu'une fois, à son arrivée)
+    capture_radius = getattr(module, "CAPTURE_RADIUS", None)
+    counting = capture_radius is not None and not module.CAPTURES
+    total_captures = 0
+    inside = np.zeros(0, dtype=bool)
+
+    def reach(flock):
+        state = flock.state()
+        return metrics.in_reach(state["positions"], state["predator_positions"],
+                                capture_radius, metrics.torus_size(flock))
+
+    def count_captures(flock):
+        nonlocal total_captures, inside
+        now = reach(flock)
+        total_captures += metrics.entries(inside, now)
+        inside = now
+
+    if counting:
+        inside = reach(flock)
+    _, summary = headless.run(flock, steps, on_step=count_captures if counting else None)
+    if capture_radius is not None and not counting:
+        total_captures = summary.get("kills", 0)
+
+    return {
+        "run": run,
+        "seed": seed,
+        **point,
+        "polarization": summary["polarization"],
+        "dispersion": summary["dispersion"],
+        "mean_speed": summary["mean_speed"],
+        "captures": total_captures,
+        "kills": summary.get("kills", 0),
+        "steps_per_sec": summary["steps_per_sec"],
+    }
+
+
+def run_sweep(tasks, processes=None):
+    """Exécute les tâches sur tous les cœurs ; lignes dans l'ordre des tâches."""
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        return [run_task(task) for task in tasks]
+    with multiprocessing.Pool(processes) as pool:
+        return list(pool.imap(run_task, tasks, chunksize=1))
+
+
+def write_csv(path, rows):
+    if not rows:
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _parse_values(spec):
+    name, _, values = spec.partition("=")
+    return name, [float(v) for v in values.split(",")]
+
+
+def _parse_range(spec):
+    name, _, bounds = spec.partition("=")
+    low, _, high = bounds.partition(":")
+    return name, (float(low), float(high))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Balayage de paramètres des boids")
+    parser.add_argument("script", nargs="?", choices=sorted(SCRIPTS),
+                        help="script balayé (par défaut : celui du --scenario)")
+    parser.add_argument("--scenario", default=None, metavar="FICHIER",
+                        help="paramètres de base (.toml ou .json, cf. scenario.py)")
+    parser.add_argument("--grid", action="append", default=[], metavar="NOM=v1,v2,...",
+                        help="valeurs d'une grille (option répétable)")
+    parser.add_argument("--range", action="append", default=[], metavar="NOM=min:max",
+                        help="intervalle pour l'échantillonnage aléatoire (répétable)")
+    parser.add_argument("--sample", type=int, default=0,
+                        help="nombre de points tirés au hasard dans les --range")
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=1,
+                        help="nombre de graines par point")
+    parser.add_argument("--seed", type=int, default=0, help="graine de base")
+    parser.add_argument("--engine", choices=("objects", "numpy"), default="numpy")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="taille du pool (par défaut : tous les cœurs)")
+    parser.add_argument("--output", default="sweep.csv")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    script, base = args.script, {}
+    if args.scenario:
+        loaded = scenario.load(args.scenario)
+        if script not in (None, loaded["simulation"]):
+            sys.exit(f"erreur : le scénario {args.scenario} est pour {loaded['simulation']!r}, "
+                     f"pas {script!r}")
+        script, base = loaded["simulation"], loaded["parameters"]
+    if script is None:
+        sys.exit("erreur : script ou --scenario requis")
+
+    points = []
+    if args.grid:
+        points += grid_points(dict(_parse_values(spec) for spec in args.grid))
+    if args.sample:
+        points += random_points(dict(_parse_range(spec) for spec in args.range),
+                                args.sample, args.seed)
+    if not points:
+        points = [{}]
+
+    tasks = make_tasks(script, points, args.steps, args.repeats,
+                       args.seed, args.engine, base)
+    rows = run_sweep(tasks, args.processes)
+    write_csv(args.output, rows)
+    print(f"{len(rows)} simulations -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""Configuration commune des tests : scripts importables sans fenêtre et
+constantes remises à leur valeur d'origine après chaque test."""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import scenario  # noqa: E402
+
+
+@pytest.fixture(params=sorted(scenario.SCRIPTS))
+def script(request):
+    """Module de chaque script (simple, equipes, pred), constantes
+    d'origine ; il les retrouve à la fin du test."""
+    module = scenario.apply(request.param, {})
+    yield module
+    scenario.apply(request.param, {})
+
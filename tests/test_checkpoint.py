@@ -0,0 +1,53 @@
+"""Reprise exacte : 40 pas, point de reprise, reprise et 60 pas donnent le
+même état que 100 pas sans interruption."""
+import numpy as np
+import pytest
+
+import checkpoint
+import scenario
+
+
+def run(flock, steps):
+    for _ in range(steps):
+        flock.step()
+
+
+def assert_resume_is_exact(module, engine, path):
+    flock = module.create_flock(engine, seed=11)
+    run(flock, 40)
+    checkpoint.save(path, *checkpoint.capture(flock, module))
+    run(flock, 60)
+
+    resumed = checkpoint.resume(path, module)
+    assert resumed.engine == flock.engine
+    assert resumed.steps == 40
+    run(resumed, 60)
+    assert resumed.steps == flock.steps
+    expected, got = flock.state(), resumed.state()
+    for key in expected:
+        np.testing.assert_array_equal(got[key], expected[key], err_msg=key)
+
+
+@pytest.mark.parametrize("engine", ["objects", "numpy"])
+def test_resume_is_exact(script, engine, tmp_path):
+    assert_resume_is_exact(script, engine, tmp_path / "reprise.npz")
+
+
+@pytest.mark.parametrize("engine", ["objects", "numpy"])
+def test_resume_is_exact_with_lifecycle(engine, tmp_path):
+    # Captures, réapparitions et naissances : générateur et file d'attente repris aussi
+    module = scenario.apply("pred", {"CAPTURES": True, "CAPTURE_RADIUS": 40,
+                                     "RESPAWN_DELAY": 10, "BIRTH_RATE": 0.002,
+                                     "MAX_BOIDS": 120, "PREDATOR_SPEED": 6.0})
+    try:
+        assert_resume_is_exact(module, engine, tmp_path / "reprise.npz")
+    finally:
+        scenario.apply("pred", {})
+
+
+def test_resume_rejects_another_script(tmp_path):
+    path = tmp_path / "reprise.npz"
+    simple = scenario.apply("simple", {})
+    checkpoint.save(path, *checkpoint.capture(simple.create_flock("numpy", 1), simple))
+    with pytest.raises(ValueError):
+        checkpoint.resume(path, scenario.module_for("pred"))
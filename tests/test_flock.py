@@ -0,0 +1,91 @@
+"""Boid.flock (une passe sur les voisins) contre les anciennes formules
+séparées de séparation, d'alignement et de cohésion, sur tous les boids."""
+import math
+
+import pytest
+from pygame.math import Vector2
+
+
+def _limit(vec, max_value):
+    if vec.length() > max_value:
+        vec.scale_to_length(max_value)
+    return vec
+
+
+def _steer(desired, velocity, cfg):
+    if desired.length() == 0:
+        return Vector2(0, 0)
+    return _limit(desired.normalize() * cfg.max_speed - velocity, cfg.max_force)
+
+
+def _neighbors(boid, boids, cfg):
+    # (voisin, vecteur boid -> voisin, distance) de tous les autres boids, à
+    # l'image la plus proche sur un tore
+    for other in boids:
+        if other is boid:
+            continue
+        toward = other.position - boid.position
+        if cfg.wrap:
+            toward.x -= cfg.width * round(toward.x / cfg.width)
+            toward.y -= cfg.height * round(toward.y / cfg.height)
+        yield other, toward, toward.length()
+
+
+def separation(boid, boids, cfg):
+    steer = Vector2(0, 0)
+    total = 0
+    for _, toward, distance in _neighbors(boid, boids, cfg):
+        if 0 < distance < cfg.separation_radius:
+            steer += -toward / distance
+            total += 1
+    if total > 0:
+        steer /= total
+    return _steer(steer, boid.velocity, cfg)
+
+
+def _group(boid, boids, cfg):
+    # Voisins d'alignement / cohésion : même équipe avec team_filter
+    team = getattr(boid, "team", None)
+    return [(other, toward) for other, toward, distance in _neighbors(boid, boids, cfg)
+            if distance < cfg.neighbor_radius
+            and (not cfg.team_filter or other.team == team)]
+
+
+def alignment(boid, boids, cfg):
+    group = _group(boid, boids, cfg)
+    if not group:
+        return Vector2(0, 0)
+    average = sum((other.velocity for other, _ in group), Vector2(0, 0)) / len(group)
+    return _steer(average, boid.velocity, cfg)
+
+
+def cohesion(boid, boids, cfg):
+    group = _group(boid, boids, cfg)
+    if not group:
+        return Vector2(0, 0)
+    center = sum((toward for _, toward in group), Vector2(0, 0)) / len(group)
+    return _steer(center, boid.velocity, cfg)
+
+
+@pytest.mark.parametrize("overrides", [
+    {},
+    {"WRAP_NEIGHBORS": False},
+    # Séparation plus large que le groupe (cf. Flock.grid)
+    {"SEPARATION_RADIUS": 100, "NEIGHBOR_RADIUS": 40},
+])
+def test_flock_matches_separate_passes(script, overrides):
+    for name, value in overrides.items():
+        setattr(script, name, value)
+    flock = script.create_flock("objects", seed=4)
+    for _ in range(5):
+        flock.step()
+    flock.find_neighbors()
+    cfg = flock.config
+    for boid, hood in zip(flock.boids, flock.neighbors):
+        hoods = hood if isinstance(hood, tuple) else (hood,)
+        sep, ali, coh = boid.flock(*hoods, cfg)
+        for got, expected in ((sep, separation(boid, flock.boids, cfg)),
+                              (ali, alignment(boid, flock.boids, cfg)),
+                              (coh, cohesion(boid, flock.boids, cfg))):
+            assert math.isclose(got.x, expected.x, abs_tol=1e-12)
+            assert math.isclose(got.y, expected.y, abs_tol=1e-12)
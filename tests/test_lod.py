@@ -0,0 +1,51 @@
+"""Niveau de détail et nombre de voisins borné (moteur numpy)."""
+import numpy as np
+import pytest
+
+from flock_numpy import ArrayFlock, FlockConfig, nearest_k, steer_rows
+from test_engines import assert_same_state, run
+
+STEPS = 10
+
+
+@pytest.mark.parametrize("lod_cells", [1, 3])
+def test_lod_with_exact_boundary_matches_exact_pairs(script, lod_cells):
+    # Cellules en bloc ou parcourues par paires : mêmes sommes, dans un
+    # autre ordre
+    expected = run(script, "numpy", steps=STEPS)
+    script.LOD_CELLS = lod_cells
+    script.LOD_EXACT_BOUNDARY = True
+    assert_same_state(run(script, "numpy", steps=STEPS), expected, atol=1e-9)
+
+
+def test_nearest_k_keeps_the_k_closest_of_each_boid():
+    rng = np.random.default_rng(1)
+    i = rng.integers(0, 20, 500)
+    dist = rng.uniform(0, 50, 500)
+    keep = nearest_k(i, dist, 4)
+    for boid in range(20):
+        mine = dist[i == boid]
+        kept = dist[(i == boid) & keep]
+        np.testing.assert_array_equal(np.sort(kept), np.sort(mine)[:4])
+
+
+def test_max_neighbors_bounds_the_group():
+    # Un boid au centre de 12 voisins à 5, 10, ... unités : son alignement
+    # ne tient compte que des 3 plus proches
+    angles = np.arange(12) * 2.4
+    radii = 5.0 * np.arange(1, 13)
+    positions = np.vstack(([500.0, 360.0],
+                           np.stack((500 + radii * np.cos(angles),
+                                     360 + radii * np.sin(angles)), axis=1)))
+    velocities = np.random.default_rng(2).uniform(-2, 2, (13, 2))
+    config = FlockConfig(width=1000, height=720, max_speed=4.0, max_force=0.05,
+                         neighbor_radius=100.0, separation_radius=1.0,
+                         w_alignment=1.0, w_cohesion=0.0, w_separation=0.0,
+                         max_neighbors=3)
+    flock = ArrayFlock(config, positions, velocities)
+    flock.index_neighbors()
+    force = flock.flocking_forces()[0]
+
+    desired = velocities[1:4].mean(axis=0, keepdims=True)
+    expected = steer_rows(desired, velocities[:1], 4.0, 0.05, np.array([True]))[0]
+    np.testing.assert_allclose(force, expected, rtol=0, atol=1e-12)
@@ -0,0 +1,74 @@
+"""Métriques d'essaim sur un monde torique."""
+import numpy as np
+import pytest
+
+import metrics
+
+SIZE = np.array([1000.0, 720.0])
+
+
+def test_group_across_an_edge_keeps_its_centroid_and_dispersion():
+    # Même groupe, au milieu du monde puis à cheval sur le coin (0, 0)
+    group = np.array([[495.0, 355.0], [505.0, 365.0], [500.0, 352.0], [498.0, 368.0]])
+    moved = (group - (500.0, 360.0)) % SIZE
+    teams = np.ones(len(group), dtype=np.int32)
+
+    expected = metrics.dispersion(group, teams, SIZE)
+    assert metrics.dispersion(moved, teams, SIZE) == pytest.approx(expected)
+    assert expected == pytest.approx(metrics.dispersion(group, teams))
+
+    stats = metrics.team_stats(moved, teams, SIZE)
+    center = np.array([stats["team1_cx"], stats["team1_cy"]])
+    # Centre près du coin (moyenne circulaire : proche de la moyenne du groupe)
+    offset = metrics.min_image(center - (group.mean(axis=0) - (500.0, 360.0)), SIZE)
+    assert np.abs(offset).max() < 1e-2
+    assert stats["team1_dispersion"] == pytest.approx(expected)
+
+
+def test_stream_rejects_a_zero_period():
+    with pytest.raises(ValueError):
+        next(metrics.stream(iter([(0, None)]), every=0))
+
+
+def test_a_boid_staying_in_reach_enters_once():
+    predators = np.array([[10.0, 10.0]])
+    path = [[100.0, 10.0], [15.0, 10.0], [12.0, 10.0], [14.0, 10.0], [100.0, 10.0], [13.0, 10.0]]
+    inside = np.zeros(0, dtype=bool)
+    total = 0
+    for x, y in path:
+        now = metrics.in_reach(np.array([[x, y], [500.0, 500.0]]), predators, 8.0)
+        total += metrics.entries(inside, now)
+        inside = now
+    assert total == 2
+
+
+def test_entries_counts_newborns_as_outside():
+    assert metrics.entries(np.array([True]), np.array([True, True, False])) == 1
+
+
+def _brute(points, positions, size=None):
+    diff = points[:, None, :] - positions[None, :, :]
+    if size is not None:
+        diff -= size * np.rint(diff / size)
+    return np.hypot(diff[..., 0], diff[..., 1])
+
+
+@pytest.mark.parametrize("size", [None, SIZE])
+def test_predator_stats_match_all_pairs(size):
+    rng = np.random.default_rng(4)
+    positions = rng.uniform(0, 1, (500, 2)) * SIZE
+    predators = rng.uniform(0, 1, (7, 2)) * SIZE
+    dist = _brute(positions, predators, size)
+
+    stats = metrics.predator_stats(positions, predators, 120.0, size)
+    assert stats["predator_prey_distance"] == pytest.approx(dist.min(axis=0).mean())
+    assert stats["boids_in_flee_range"] == int((dist.min(axis=1) <= 120.0).sum())
+    np.testing.assert_array_equal(metrics.in_reach(positions, predators, 40.0, size),
+                                  dist.min(axis=1) < 40.0)
+
+
+def test_nearest_prey_far_from_every_predator():
+    # Un seul boid, loin dans un coin : trouvé quand même
+    stats = metrics.predator_stats(np.array([[990.0, 710.0]]), np.array([[5.0, 5.0]]), 50.0)
+    assert stats["predator_prey_distance"] == pytest.approx(np.hypot(985.0, 705.0))
+    assert stats["boids_in_flee_range"] == 0
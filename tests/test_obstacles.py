@@ -0,0 +1,102 @@
+"""Grille de distances des obstacles : comparée aux formes exactes."""
+import numpy as np
+import pytest
+
+import obstacles
+
+WIDTH, HEIGHT = 2000.0, 1500.0
+AVOID = 40.0
+SPECS = [
+    ("circle", 500, 400, 80),
+    ("box", 1200, 300, 1450, 420),
+    ("wall", 300, 1000, 900, 1250, 16),
+    ("circle", 1700, 1100, 50),
+]
+
+
+def exact(shapes, points, size=None):
+    """Distance exacte au plus proche obstacle (toutes les images sur un tore)."""
+    images = [(0, 0)]
+    if size is not None:
+        images = [(ox, oy) for oy in (-size[1], 0, size[1]) for ox in (-size[0], 0, size[0])]
+    return np.min([shape.distance(points[:, 0] + ox, points[:, 1] + oy)
+                   for shape in shapes for ox, oy in images], axis=0)
+
+
+def gradient(shapes, points, size=None, h=1e-3):
+    dx = exact(shapes, points + (h, 0), size) - exact(shapes, points - (h, 0), size)
+    dy = exact(shapes, points + (0, h), size) - exact(shapes, points - (0, h), size)
+    g = np.stack((dx, dy), axis=1)
+    return g / np.hypot(g[:, 0], g[:, 1])[:, None]
+
+
+def band(shapes, low, high, size=None, count=200_000, seed=0):
+    points = np.random.default_rng(seed).uniform(0, 1, (count, 2)) * (WIDTH, HEIGHT)
+    d = exact(shapes, points, size)
+    return points[(d > low) & (d <= high)]
+
+
+@pytest.mark.parametrize("low, high, tolerance, worst", [
+    # Près du bord, les nœuds intérieurs faussent la grille (coins surtout)
+    (0, 10, 2.2, 0.7),
+    (30, 40, 0.3, 0.98),
+])
+def test_distances_and_normals_outside_the_obstacles(low, high, tolerance, worst):
+    field = obstacles.bake(SPECS, WIDTH, HEIGHT, AVOID)
+    points = band(field.shapes, low, high)
+    assert len(points) > 100
+    distance, nx, ny = field.sample(points)
+    assert np.abs(distance - exact(field.shapes, points)).max() <= tolerance
+    # Normales unitaires, tournées vers l'extérieur
+    normals = np.stack((nx, ny), axis=1)
+    cosine = (normals * gradient(field.shapes, points)).sum(axis=1)
+    assert cosine.min() > worst
+    assert np.median(cosine) > 0.99
+
+
+def test_sample_point_matches_sample():
+    field = obstacles.bake(SPECS, WIDTH, HEIGHT, AVOID)
+    points = band(field.shapes, 0, AVOID, count=20_000)
+    expected = np.stack(field.sample(points), axis=1)
+    got = np.array([field.sample_point(x, y) for x, y in points])
+    np.testing.assert_allclose(got, expected, rtol=0, atol=1e-12)
+
+
+def test_only_tiles_near_obstacles_are_kept():
+    field = obstacles.bake(SPECS, WIDTH, HEIGHT, AVOID)
+    assert 0 < field.tiles < field.tile_index.size
+    # Loin de tout obstacle : tuile vide, distance plafonnée, normale nulle
+    far = np.array([[1000.0, 800.0], [1950.0, 50.0]])
+    distance, nx, ny = field.sample(far)
+    np.testing.assert_array_equal(distance, field.reach)
+    np.testing.assert_array_equal(np.hypot(nx, ny), 0)
+
+
+def test_obstacles_are_seen_across_the_torus_edges():
+    # Cercle contre le bord gauche, boîte au coin : vus de l'autre côté
+    specs = [("circle", 20, 700, 60), ("box", 1960, 1460, 2000, 1500)]
+    size = (WIDTH, HEIGHT)
+    field = obstacles.bake(specs, WIDTH, HEIGHT, AVOID, wrap=True)
+    points = np.array([[1990.0, 700.0], [1975.0, 720.0], [30.0, 20.0], [1950.0, 10.0]])
+    truth = exact(field.shapes, points, size)
+    assert truth.max() < AVOID
+    distance, nx, ny = field.sample(points)
+    np.testing.assert_allclose(distance, truth, atol=2.2)
+    cosine = (np.stack((nx, ny), axis=1) * gradient(field.shapes, points, size)).sum(axis=1)
+    assert cosine.min() > 0.7
+
+    flat = obstacles.bake(specs, WIDTH, HEIGHT, AVOID)
+    assert (flat.sample(points)[0] > truth + 10).all()
+
+
+def test_no_obstacles_bake_nothing():
+    assert obstacles.bake([], WIDTH, HEIGHT, AVOID) is None
+
+
+@pytest.mark.parametrize("spec", [
+    ("square", 1, 2, 3), ("circle", 1, 2), ("circle", 1, 2, 0),
+    ("box", 5, 5, 1, 1), ("wall", 0, 0, 1, 1, -2), ("circle", 1, 2, float("nan")),
+])
+def test_invalid_obstacles_are_rejected(spec):
+    with pytest.raises(ValueError):
+        obstacles.parse([spec])
@@ -0,0 +1,40 @@
+"""Index de rendu (morceaux) et taille des sprites."""
+import numpy as np
+import pytest
+
+from camera import Camera
+from chunks import ChunkIndex, counting_order
+from rendering import sprite_size
+
+
+@pytest.mark.parametrize("top", [1, 300, 70_000, 5_000_000_000])
+def test_counting_order_is_a_stable_sort(top):
+    key = np.random.default_rng(0).integers(0, top, 50_000)
+    np.testing.assert_array_equal(counting_order(key), np.argsort(key, kind="stable"))
+
+
+def test_visible_finds_the_agents_of_the_chunks_met():
+    width, height = 100_000.0, 72_000.0
+    positions = np.random.default_rng(1).uniform(0, 1, (20_000, 2)) * (width, height)
+    chunks = ChunkIndex(positions, width, height)
+    rows = chunks.visible(30_000, 20_000, 31_000, 20_500)
+    # Morceaux entiers : tout ce qui est dans le rectangle, et rien au-delà
+    # des morceaux qui le rencontrent
+    inside = ((positions[:, 0] >= 30_000) & (positions[:, 0] <= 31_000)
+              & (positions[:, 1] >= 20_000) & (positions[:, 1] <= 20_500))
+    assert set(np.flatnonzero(inside)) <= set(rows.tolist())
+    lo = np.floor(np.array([30_000, 20_000]) / chunks.size) * chunks.size
+    hi = (np.floor(np.array([31_000, 20_500]) / chunks.size) + 1) * chunks.size
+    assert ((positions[rows] >= lo) & (positions[rows] < hi)).all()
+
+
+def test_sprites_follow_the_zoom_like_obstacles():
+    camera = Camera((100_000, 72_000), (1280, 800))
+    assert sprite_size(8, camera) == 8
+    assert sprite_size(8) == 8
+    for zoom in (0.05, 0.3, 2.0, 5.0):
+        camera.zoom = zoom
+        # Zoom arrondi à une demi-puissance de 2 près
+        assert 8 * zoom / 2 ** 0.25 - 1 <= sprite_size(8, camera) <= 8 * zoom * 2 ** 0.25 + 1
+    camera.zoom = camera.min_zoom
+    assert sprite_size(8, camera) == 1
@@ -0,0 +1,85 @@
+"""Vérification des scénarios."""
+import json
+
+import numpy as np
+import pygame
+import pytest
+
+import scenario
+import sweep
+
+
+def test_narrow_torus_is_rejected():
+    data = {"simulation": "simple", "parameters": {"width": 100, "height": 100}}
+    with pytest.raises(ValueError, match="WIDTH"):
+        scenario.validate(data)
+    # Sans tore, ou avec un rayon assez petit, le même monde est accepté
+    scenario.validate({**data, "parameters": {**data["parameters"], "wrap_neighbors": False}})
+    scenario.validate({**data, "parameters": {**data["parameters"], "neighbor_radius": 50,
+                                              "separation_radius": 20}})
+
+
+def test_sweep_rejects_a_narrow_torus():
+    with pytest.raises(ValueError, match="HEIGHT"):
+        sweep.make_tasks("simple", [{"NEIGHBOR_RADIUS": 400}], steps=1)
+
+
+def test_sweep_captures_are_kills_when_boids_are_eaten():
+    base = {"CAPTURES": True, "CAPTURE_RADIUS": 40, "TEAM_SIZES": [60, 60],
+            "PREDATOR_SPEED": 6.0}
+    (task,) = sweep.make_tasks("pred", [{}], steps=60, base=base)
+    try:
+        row = sweep.run_task(task)
+    finally:
+        scenario.apply("pred", {})
+    assert row["kills"] > 0
+    assert row["captures"] == row["kills"]
+
+
+def _center_color(module, **state):
+    # Un boid au milieu d'une petite surface, dessiné par le script
+    surface = pygame.Surface((100, 100))
+    empty = np.zeros((0, 2))
+    frame = {"positions": np.array([[50.0, 50.0]]), "velocities": np.array([[1.0, 0.0]]),
+             "teams": np.array([1], dtype=np.int32),
+             "predator_positions": empty, "predator_velocities": empty, **state}
+    module.draw_state(frame, surface)
+    return tuple(surface.get_at((50, 50)))[:3]
+
+
+@pytest.mark.parametrize("simulation, key", [
+    ("simple", "boid_color"), ("equipes", "team_colors"), ("pred", "team_colors"),
+])
+def test_scenario_colors_reach_the_renderer(simulation, key):
+    color = [1, 200, 3]
+    value = color if key == "boid_color" else [color, [9, 9, 9]]
+    data = scenario.validate({"simulation": simulation, "parameters": {key: value}})
+    try:
+        module = scenario.apply(simulation, data["parameters"])
+        assert _center_color(module) == tuple(color)
+    finally:
+        module = scenario.apply(simulation, {})
+    assert _center_color(module) != tuple(color)
+
+
+def test_predator_color_reaches_the_renderer():
+    data = scenario.validate({"simulation": "pred", "parameters": {"predator_color": [5, 6, 250]}})
+    try:
+        module = scenario.apply("pred", data["parameters"])
+        empty = np.zeros((0, 2))
+        assert _center_color(module, positions=empty, velocities=empty,
+                             teams=np.zeros(0, dtype=np.int32),
+                             predator_positions=np.array([[50.0, 50.0]]),
+                             predator_velocities=np.array([[1.0, 0.0]])) == (5, 6, 250)
+    finally:
+        scenario.apply("pred", {})
+
+
+def test_headless_keeps_a_zero_step_count(tmp_path, capsys):
+    path = tmp_path / "zero.json"
+    path.write_text(json.dumps({"simulation": "simple", "engine": "numpy", "steps": 0}))
+    try:
+        scenario.main([str(path), "--headless"])
+    finally:
+        scenario.apply("simple", {})
+    assert json.loads(capsys.readouterr().out)["steps"] == 0
@@ -0,0 +1,46 @@
+"""Trajectoires enregistrées : relecture pas par pas."""
+import numpy as np
+import pytest
+
+import headless
+import scenario
+import trajectory
+
+STEPS = 25
+
+
+def record(flock, path):
+    states = []
+    headless.run(flock, STEPS, record=str(path), on_step=lambda f: states.append(f.state()))
+    return states
+
+
+@pytest.mark.parametrize("engine", ["objects", "numpy"])
+def test_frames_match_the_recorded_steps(script, engine, tmp_path):
+    flock = script.create_flock(engine, 2)
+    states = record(flock, tmp_path / "run.trj")
+
+    traj = trajectory.Trajectory(tmp_path / "run.trj")
+    assert len(traj) == STEPS
+    assert traj.world_size() == (script.WIDTH, script.HEIGHT)
+    for k in (0, STEPS // 2, STEPS - 1):
+        frame = traj.frame(k)
+        for key, expected in states[k].items():
+            # Enregistré en float32
+            np.testing.assert_allclose(frame[key], expected, rtol=1e-6, atol=1e-4, err_msg=key)
+
+
+def test_frames_follow_a_changing_population(tmp_path):
+    module = scenario.apply("pred", {"CAPTURES": True, "CAPTURE_RADIUS": 40,
+                                     "RESPAWN_DELAY": -1, "PREDATOR_SPEED": 6.0})
+    try:
+        states = record(module.create_flock("numpy", 1), tmp_path / "run.trj")
+    finally:
+        scenario.apply("pred", {})
+    assert len(states[-1]["positions"]) < len(states[0]["positions"])
+
+    traj = trajectory.Trajectory(tmp_path / "run.trj")
+    for k in range(STEPS):
+        frame = traj.frame(k)
+        assert len(frame["positions"]) == len(states[k]["positions"])
+        np.testing.assert_allclose(frame["positions"], states[k]["positions"], atol=1e-4)
@@ -0,0 +1,153 @@
+"""Enregistrement des trajectoires dans un fichier float32 projeté en mémoire.
+
+Format : un en-tête JSON de HEADER_SIZE octets (commençant par MAGIC), puis
+une ligne float32 par pas. Chaque ligne contient num_boids blocs
+[x, y, vx, vy, équipe] suivis de num_predators blocs [x, y, vx, vy]. Le
+fichier est pré-alloué et agrandi par doublement ; l'accès à un pas
+quelconque est direct (np.memmap), sans objet Python par agent.
+L'en-tête donne aussi la taille du monde (width, height) et la durée d'un
+pas (dt ; sim_hz en plus pour les enregistrements de la fenêtre).
+
+Si le nombre de boids varie (cf. population), num_boids est la capacité
+du pool : les blocs des places libres sont remplis de NaN et ignorés à la
+lecture.
+"""
+import datetime
+import json
+
+import numpy as np
+
+MAGIC = b"BOIDTRJ1\n"
+HEADER_SIZE = 4096
+BOID_FIELDS = ("x", "y", "vx", "vy", "team")
+PREDATOR_FIELDS = ("x", "y", "vx", "vy")
+
+
+def _frame_size(num_boids, num_predators):
+    return num_boids * len(BOID_FIELDS) + num_predators * len(PREDATOR_FIELDS)
+
+
+def _write_header(f, header):
+    data = MAGIC + json.dumps(header).encode()
+    if len(data) > HEADER_SIZE:
+        raise ValueError("en-tête de trajectoire trop long")
+    f.seek(0)
+    f.write(data.ljust(HEADER_SIZE, b" "))
+
+
+def _read_header(f):
+    data = f.read(HEADER_SIZE)
+    if not data.startswith(MAGIC):
+        raise ValueError("ce fichier n'est pas une trajectoire de boids")
+    return json.loads(data[len(MAGIC):])
+
+
+class Recorder:
+    def __init__(self, path, num_boids, num_predators=0, meta=None, capacity=1024):
+        self.path = path
+        self.header = {
+            "version": 1,
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "num_boids": num_boids,
+            "num_predators": num_predators,
+            "boid_fields": BOID_FIELDS,
+            "predator_fields": PREDATOR_FIELDS,
+            "frames": 0,
+            **(meta or {}),
+        }
+        self.frame_size = _frame_size(num_boids, num_predators)
+        self.frames = 0
+        with open(path, "wb") as f:
+            _write_header(f, self.header)
+        self._map(max(1, capacity))
+
+    @classmethod
+    def for_state(cls, path, state, meta=None, capacity=1024, num_boids=None):
+        # num_boids : places réservées par pas, si plus que de boids actuels
+        return cls(path, max(num_boids or 0, len(state["positions"])),
+                   len(state["predator_positions"]), meta, capacity)
+
+    def _map(self, capacity):
+        # (Re)projette le fichier avec la place pour capacity pas
+        with open(self.path, "r+b") as f:
+            f.truncate(HEADER_SIZE + capacity * self.frame_size * 4)
+        self.capacity = capacity
+        self._data = np.memmap(self.path, dtype=np.float32, mode="r+",
+                               offset=HEADER_SIZE, shape=(capacity, self.frame_size))
+
+    def append(self, state):
+        if self.frames == self.capacity:
+            self._data.flush()
+            del self._data
+            self._write_frame_count()
+            self._map(self.capacity * 2)
+
+        row = self._data[self.frames]
+        n = self.header["num_boids"]
+        boids = row[:n * len(BOID_FIELDS)].reshape(n, len(BOID_FIELDS))
+        count = len(state["positions"])
+        boids[:count, 0:2] = state["positions"]
+        boids[:count, 2:4] = state["velocities"]
+        boids[:count, 4] = state["teams"]
+        boids[count:] = np.nan
+        predators = row[n * len(BOID_FIELDS):].reshape(-1, len(PREDATOR_FIELDS))
+        predators[:, 0:2] = state["predator_positions"]
+        predators[:, 2:4] = state["predator_velocities"]
+        self.frames += 1
+
+    def _write_frame_count(self):
+        # Tenu à jour à chaque agrandissement : un fichier non fermé reste lisible
+        self.header["frames"] = self.frames
+        with open(self.path, "r+b") as f:
+            _write_header(f, self.header)
+
+    def close(self):
+        """Ajuste la taille du fichier aux pas écrits et met l'en-tête à jour."""
+        self._data.flush()
+        del self._data
+        self._write_frame_count()
+        with open(self.path, "r+b") as f:
+            f.truncate(HEADER_SIZE + self.frames * self.frame_size * 4)
+
+
+class Trajectory:
+    """Lecture d'une trajectoire enregistrée, avec accès direct à chaque pas."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.header = _read_header(f)
+        self.num_boids = self.header["num_boids"]
+        self.num_predators = self.header["num_predators"]
+        frame_size = _frame_size(self.num_boids, self.num_predators)
+        frames = self.header["frames"]
+        if frames == 0 or frame_size == 0:
+            # np.memmap refuse les projections vides
+            self.data = np.zeros((frames, frame_size), dtype=np.float32)
+        else:
+            self.data = np.memmap(path, dtype=np.float32, mode="r",
+                                  offset=HEADER_SIZE, shape=(frames, frame_size))
+
+    def __len__(self):
+        return len(self.data)
+
+    def world_size(self, default=None):
+        """(largeur, hauteur) du monde enregistré, ou default si l'en-tête
+        ne la donne pas."""
+        if "width" not in self.header or "height" not in self.header:
+            return default
+        return self.header["width"], self.header["height"]
+
+    def frame(self, index):
+        """État du pas index, au format de Flock.state()."""
+        row = self.data[index]
+        n = self.num_boids
+        boids = row[:n * len(BOID_FIELDS)].reshape(n, len(BOID_FIELDS))
+        boids = boids[~np.isnan(boids[:, 0])]
+        predators = row[n * len(BOID_FIELDS):].reshape(-1, len(PREDATOR_FIELDS))
+        return {
+            "positions": boids[:, 0:2].astype(np.float64),
+            "velocities": boids[:, 2:4].astype(np.float64),
+            "teams": boids[:, 4].astype(np.int32),
+            "predator_positions": predators[:, 0:2].astype(np.float64),
+            "predator_velocities": predators[:, 2:4].astype(np.float64),
+        }
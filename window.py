@@ -0,0 +1,518 @@
+"""Boucle principale avec fenêtre pygame, commune aux trois scripts.
+
+La simulation avance par pas fixes (sim_hz par seconde), indépendamment de
+la cadence d'affichage : un accumulateur reçoit le temps réel écoulé et on
+exécute autant de pas qu'il en contient. Le rendu interpole entre les deux
+derniers états calculés.
+
+Avec --threaded, les pas sont calculés dans un thread à part
+(SimulationWorker) qui publie ses états ; la boucle de la fenêtre ne fait
+plus que lire le dernier état publié, traiter les événements et dessiner :
+un pas lent ne fige plus la fenêtre, un affichage lent ne ralentit plus la
+simulation.
+
+La fenêtre montre le monde à travers une caméra (cf. camera : déplacement,
+zoom) et ne dessine que les agents des morceaux du monde visibles (cf.
+chunks) : le coût du rendu suit ce qui est à l'écran, pas la population.
+"""
+import argparse
+import collections
+import threading
+import time
+
+import numpy as np
+import pygame
+
+import profiler
+import trajectory
+from camera import PAN_SPEED, ZOOM_STEP, Camera
+from chunks import ChunkIndex
+
+# Les constantes des scripts (MAX_SPEED, MAX_FORCE...) sont exprimées par
+# pas à cette fréquence : un pas de dt = 1.0 correspond à 1 / REFERENCE_HZ s.
+REFERENCE_HZ = 60
+
+# Taille de fenêtre par défaut au plus (au-delà, la caméra ne montre qu'une
+# partie du monde)
+MAX_SCREEN = (1280, 800)
+# Marge autour de la vue, en pixels à l'échelle 1 (multipliée par le zoom
+# au-delà, cf. visible_state) : demi-taille du plus grand sprite et
+# déplacement d'un agent entre deux états
+VIEW_MARGIN = 32
+
+
+def _blend(previous, current, key, rows, alpha, size):
+    # Positions key des lignes rows, entre previous et current
+    after = current[key][rows]
+    if alpha >= 1 or previous[key].shape != current[key].shape:
+        return after
+    before = previous[key][rows]
+    delta = after - before
+    # Un agent qui vient de traverser un bord n'est pas interpolé
+    jumped = (np.abs(delta[:, 0]) > size[0] / 2) | (np.abs(delta[:, 1]) > size[1] / 2)
+    blended = before + delta * alpha
+    blended[jumped] = after[jumped]
+    return blended
+
+
+def interpolate(previous, current, alpha, size):
+    """État intermédiaire entre previous et current (alpha dans [0, 1])."""
+    state = dict(current)
+    for key in ("positions", "predator_positions"):
+        state[key] = _blend(previous, current, key, slice(None), alpha, size)
+    return state
+
+
+def visible_state(previous, current, alpha, size, camera, chunks):
+    """Agents à l'écran de camera, positions en pixels de l'écran : état
+    interpolé entre previous et current (cf. interpolate), limité aux
+    morceaux de chunks (index de current) que la vue rencontre.
+
+    Un agent vu deux fois (vue plus large que le monde avec la marge)
+    est dessiné deux fois.
+    """
+    pieces = camera.pieces(VIEW_MARGIN * max(camera.zoom, 1.0))
+    predators = current["predator_positions"]
+    found = {
+        "": [chunks.visible(x0, y0, x1, y1) for x0, y0, x1, y1, _, _ in pieces],
+        # Peu nombreux : simple test de chaque prédateur
+        "predator_": [np.flatnonzero((predators[:, 0] >= x0) & (predators[:, 0] <= x1)
+                                     & (predators[:, 1] >= y0) & (predators[:, 1] <= y1))
+                      for x0, y0, x1, y1, _, _ in pieces],
+    }
+    shifts = np.array([(dx, dy) for *_, dx, dy in pieces], dtype=float)
+    state = {}
+    for prefix, rows in found.items():
+        counts = [len(r) for r in rows]
+        rows = np.concatenate(rows)
+        positions = _blend(previous, current, prefix + "positions", rows, alpha, size)
+        state[prefix + "positions"] = camera.to_screen(positions + np.repeat(shifts, counts, axis=0))
+        state[prefix + "velocities"] = current[prefix + "velocities"][rows]
+        if not prefix:
+            state["teams"] = current["teams"][rows]
+    return state
+
+
+def default_screen(size):
+    """Taille de fenêtre pour un monde size : le monde entier s'il tient
+    dans MAX_SCREEN."""
+    return min(size[0], MAX_SCREEN[0]), min(size[1], MAX_SCREEN[1])
+
+
+def camera_event(event, camera):
+    """Applique à camera un événement pygame (molette, glisser, + / -, C)."""
+    if event.type == pygame.MOUSEWHEEL:
+        camera.zoom_at(ZOOM_STEP ** event.y, pygame.mouse.get_pos())
+    elif event.type == pygame.MOUSEMOTION and (event.buttons[1] or event.buttons[2]):
+        camera.pan(-event.rel[0], -event.rel[1])
+    elif event.type == pygame.KEYDOWN:
+        if event.key in (pygame.K_PLUS, pygame.K_KP_PLUS, pygame.K_EQUALS):
+            camera.zoom_at(ZOOM_STEP)
+        elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            camera.zoom_at(1 / ZOOM_STEP)
+        elif event.key == pygame.K_c:
+            camera.reset()
+
+
+def camera_lines(camera, state, chunks):
+    # Lignes du HUD (cf. Profiler.draw)
+    return [f"vue ({camera.x:7.0f}, {camera.y:7.0f}) zoom {camera.zoom:5.2f}",
+            f"boids affichés {len(state['positions'])}/{chunks.count}"
+            f", morceaux occupés {len(chunks)}"]
+
+
+class Snapshot(collections.namedtuple("Snapshot",
+                                      ("previous", "current", "time", "steps", "chunks"))):
+    """États publiés par SimulationWorker : les deux derniers états calculés,
+    l'instant (time.perf_counter) où current l'a été et l'index de ses
+    morceaux (chunks.ChunkIndex). Jamais modifié une fois publié."""
+
+
+class SimulationWorker:
+    """Fait avancer flock dans un thread, à sim_hz pas par seconde.
+
+    Après chaque série de pas, le thread publie un nouveau Snapshot dans
+    self.snapshot (simple affectation d'attribut, atomique) : le rendu lit
+    cet attribut sans verrou, et l'état qu'il dessine n'est plus jamais
+    modifié. Le rythme des pas ne dépend que de l'horloge du thread, pas
+    de la synchronisation verticale de l'affichage.
+    """
+
+    def __init__(self, flock, size, sim_hz=REFERENCE_HZ, max_substeps=8, recorder=None,
+                 checkpoints=None, prof=None):
+        # size : (largeur, hauteur) du monde
+        self.flock = flock
+        self.size = size
+        self.sim_hz = sim_hz
+        self.max_substeps = max_substeps
+        self.recorder = recorder
+        self.checkpoints = checkpoints
+        self.prof = prof or profiler.NullProfiler()
+        state = flock.state()
+        self.snapshot = Snapshot(state, state, time.perf_counter(), flock.steps,
+                                 ChunkIndex(state["positions"], *size))
+        self.steps_per_sec = 0.0
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="simulation", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        try:
+            self._loop()
+        except BaseException as error:
+            # Relancée par la boucle de rendu (cf. run)
+            self.error = error
+
+    def _loop(self):
+        flock = self.flock
+        prof = self.prof
+        life = getattr(flock, "life", None)
+        step_time = 1.0 / self.sim_hz
+        dt = REFERENCE_HZ / self.sim_hz
+        accumulator = 0.0
+        last = rate_start = time.perf_counter()
+        rate_steps = 0
+        current = self.snapshot.current
+        while not self._stop.is_set():
+            now = time.perf_counter()
+            accumulator += now - last
+            last = now
+
+            previous = current
+            substeps = 0
+            while accumulator >= step_time and substeps < self.max_substeps:
+                prof.begin_frame()
+                flock.find_neighbors()
+                prof.mark("neighbors")
+                flock.compute_forces()
+                prof.mark("forces")
+                flock.integrate(dt)
+                prof.mark("integration")
+                prof.end_frame(flock)
+                accumulator -= step_time
+                substeps += 1
+                # Chaque pas publie une copie (state) : le rendu ne lit jamais
+                # les tableaux que le pas suivant modifie
+                previous = current
+                current = flock.state()
+                if life is not None and life.events:
+                    # Lignes réattribuées (cf. population) : pas d'interpolation
+                    previous = current
+                if self.recorder is not None:
+                    self.recorder.append(current)
+                if self.checkpoints is not None:
+                    self.checkpoints.after_step(flock)
+            if substeps == self.max_substeps:
+                accumulator = min(accumulator, step_time)
+
+            if substeps:
+                # Index des morceaux construit ici, une fois par état publié
+                chunks = ChunkIndex(current["positions"], *self.size)
+                self.snapshot = Snapshot(previous, current, time.perf_counter(), flock.steps,
+                                         chunks)
+                rate_steps += substeps
+                if now - rate_start >= 1.0:
+                    self.steps_per_sec = rate_steps / (now - rate_start)
+                    rate_start, rate_steps = now, 0
+            else:
+                # Rien à faire avant le prochain pas : on rend la main
+                time.sleep(step_time - accumulator)
+
+
+def run(flock, draw, caption, size, background, profile=False, profile_csv=None,
+        fps=60, sim_hz=REFERENCE_HZ, max_substeps=8, interpolation=True, record=None,
+        checkpoints=None, threaded=False, screen_size=None):
+    """Affiche et fait avancer flock jusqu'à la fermeture de la fenêtre.
+
+    size est la taille du monde, screen_size celle de la fenêtre (par
+    défaut, cf. default_screen). draw(state, surface, camera) dessine un
+    état (cf. Flock.state) dont les positions sont déjà en pixels de
+    l'écran (cf. visible_state). Chaque frame
+    exécute les pas de durée 1 / sim_hz que le temps écoulé permet, au plus
+    max_substeps : au-delà, le retard est abandonné (la simulation ralentit
+    mais chaque pas reste identique). profile active la mesure des phases et
+    son affichage (F3 pour le masquer), profile_csv l'export CSV. record
+    est le chemin d'un fichier de trajectoire recevant chaque pas.
+    checkpoints (checkpoint.Writer) écrit les points de reprise, y compris
+    à la fermeture de la fenêtre. threaded : les pas sont calculés dans un
+    thread (SimulationWorker) et la boucle de la fenêtre ne fait plus que
+    les événements et le rendu ; le profil des pas est alors affiché sous
+    celui du rendu et exporté dans <profile_csv>-simulation.csv.
+    """
+    pygame.init()
+    screen = pygame.display.set_mode(screen_size or default_screen(size))
+    pygame.display.set_caption(caption)
+    prof = profiler.make_profiler(profile, profile_csv)
+    camera = Camera(size, screen.get_size())
+
+    recorder = None
+    if record is not None:
+        recorder = trajectory.Recorder.for_state(record, flock.state(), {
+            "caption": caption, "width": size[0], "height": size[1],
+            "sim_hz": sim_hz, "dt": REFERENCE_HZ / sim_hz,
+        }, num_boids=getattr(flock, "capacity", None))
+
+    try:
+        if threaded:
+            # Profil des pas dans le thread de simulation, affiché sous
+            # celui du rendu et exporté à côté de son CSV
+            worker_prof = None
+            if prof.enabled:
+                worker_prof = profiler.Profiler(hud=False, record=profile_csv is not None)
+            worker = SimulationWorker(flock, size, sim_hz, max_substeps, recorder, checkpoints,
+                                      worker_prof)
+            worker.start()
+            try:
+                _render_loop(worker, draw, screen, background, size, fps, sim_hz,
+                             interpolation, prof, worker_prof, camera)
+            finally:
+                worker.stop()
+            if worker_prof is not None and profile_csv is not None:
+                worker_prof.write_csv(profiler.sibling_path(profile_csv, "simulation"))
+            if worker.error is not None:
+                raise worker.error
+        else:
+            _loop(flock, draw, screen, background, size, fps, sim_hz, max_substeps,
+                  interpolation, prof, recorder, checkpoints, camera)
+    finally:
+        if profile_csv is not None:
+            prof.write_csv(profile_csv)
+        if recorder is not None:
+            recorder.close()
+        if checkpoints is not None:
+            checkpoints.close(flock)
+        pygame.quit()
+
+
+def _events(prof, camera):
+    # Faux si la fenêtre a été fermée
+    running = True
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            running = False
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            prof.toggle_hud()
+        else:
+            camera_event(event, camera)
+    # Flèches maintenues : déplacement continu
+    keys = pygame.key.get_pressed()
+    dx = keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]
+    dy = keys[pygame.K_DOWN] - keys[pygame.K_UP]
+    if dx or dy:
+        camera.pan(dx * PAN_SPEED, dy * PAN_SPEED)
+    prof.mark("events")
+    return running
+
+
+def _loop(flock, draw, screen, background, size, fps, sim_hz, max_substeps,
+          interpolation, prof, recorder, checkpoints, camera):
+    # Événements, pas de simulation et rendu à la suite, dans ce thread
+    clock = pygame.time.Clock()
+    step_time = 1.0 / sim_hz
+    dt = REFERENCE_HZ / sim_hz
+    accumulator = 0.0
+    previous = current = flock.state()
+    chunks = ChunkIndex(current["positions"], *size)
+    life = getattr(flock, "life", None)
+    last = time.perf_counter()
+
+    running = True
+    while running:
+        clock.tick(fps)
+        prof.begin_frame()
+        now = time.perf_counter()
+        accumulator += now - last
+        last = now
+
+        running = _events(prof, camera)
+
+        # Logique de la simulation : pas fixes
+        substeps = 0
+        while accumulator >= step_time and substeps < max_substeps:
+            flock.find_neighbors()
+            prof.mark("neighbors")
+            flock.compute_forces()
+            prof.mark("forces")
+            flock.integrate(dt)
+            prof.mark("integration")
+            accumulator -= step_time
+            substeps += 1
+            if interpolation or recorder is not None:
+                previous = current
+                current = flock.state()
+                if life is not None and life.events:
+                    # Boids retirés ou ajoutés : les lignes ne désignent plus
+                    # les mêmes boids, pas d'interpolation sur ce pas
+                    previous = current
+            if recorder is not None:
+                recorder.append(current)
+            if checkpoints is not None:
+                checkpoints.after_step(flock)
+        if substeps == max_substeps:
+            accumulator = min(accumulator, step_time)
+        if substeps:
+            if not (interpolation or recorder is not None):
+                previous = current = flock.state()
+            # Index des morceaux : une fois par état calculé, pas par frame
+            chunks = ChunkIndex(current["positions"], *size)
+
+        # Rendu graphique : seulement ce que la caméra voit
+        alpha = accumulator / step_time if interpolation else 1.0
+        state = visible_state(previous, current, alpha, size, camera, chunks)
+        screen.fill(background)
+        draw(state, screen, camera)
+        prof.draw(screen, camera_lines(camera, state, chunks))
+        pygame.display.flip()
+        prof.mark("render")
+        prof.end_frame(flock)
+
+
+def _render_loop(worker, draw, screen, background, size, fps, sim_hz, interpolation,
+                 prof, worker_prof, camera):
+    # Événements et rendu seulement : les pas avancent dans worker
+    clock = pygame.time.Clock()
+    step_time = 1.0 / sim_hz
+    running = True
+    while running and worker.error is None:
+        clock.tick(fps)
+        prof.begin_frame()
+        running = _events(prof, camera)
+
+        # Dernier instantané publié : lecture d'un attribut, sans verrou
+        snapshot = worker.snapshot
+        alpha = 1.0
+        if interpolation:
+            # Le rendu a au plus un pas de retard sur la simulation
+            alpha = min((time.perf_counter() - snapshot.time) / step_time, 1.0)
+        state = visible_state(snapshot.previous, snapshot.current, alpha, size, camera,
+                              snapshot.chunks)
+        screen.fill(background)
+        draw(state, screen, camera)
+        extra = camera_lines(camera, state, snapshot.chunks)
+        if worker_prof is not None:
+            extra += [f"simulation {worker.steps_per_sec:6.1f} pas/s, pas {snapshot.steps}",
+                      *worker_prof.lines()]
+        prof.draw(screen, extra)
+        pygame.display.flip()
+        prof.mark("render")
+        prof.end_frame()
+
+
+def replay(path, draw, caption, size, background, fps=60, screen_size=None):
+    """Rejoue une trajectoire enregistrée, sans recalculer les comportements.
+
+    Espace : pause ; flèches gauche / droite : pas précédent / suivant ;
+    page préc. / suiv. : +-100 pas ; Début / Fin : premier / dernier pas.
+    Caméra : souris, + / - et C (cf. camera_event). Le monde a la taille
+    écrite dans l'en-tête de la trajectoire ; size ne sert que pour les
+    fichiers qui n'en ont pas.
+    """
+    traj = trajectory.Trajectory(path)
+    if len(traj) == 0:
+        return
+    size = traj.world_size(size)
+    pygame.init()
+    screen = pygame.display.set_mode(screen_size or default_screen(size))
+    pygame.display.set_caption(f"{caption} (replay)")
+    camera = Camera(size, screen.get_size())
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont("monospace", 14)
+    last_frame = len(traj) - 1
+    moves = {
+        pygame.K_LEFT: -1, pygame.K_RIGHT: 1,
+        pygame.K_PAGEUP: -100, pygame.K_PAGEDOWN: 100,
+    }
+
+    index = 0
+    paused = False
+    running = True
+    while running:
+        clock.tick(fps)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key in moves:
+                    index += moves[event.key]
+                    paused = True
+                elif event.key == pygame.K_HOME:
+                    index = 0
+                elif event.key == pygame.K_END:
+                    index = last_frame
+                else:
+                    camera_event(event, camera)
+            else:
+                camera_event(event, camera)
+        index = min(max(index, 0), last_frame)
+
+        frame = traj.frame(index)
+        state = visible_state(frame, frame, 1.0, size, camera,
+                              ChunkIndex(frame["positions"], *size))
+        screen.fill(background)
+        draw(state, screen, camera)
+        label = f"pas {index + 1}/{len(traj)}" + (" (pause)" if paused else "")
+        screen.blit(font.render(label, True, profiler.HUD_COLOR),
+                    (6, screen.get_height() - 20))
+        pygame.display.flip()
+
+        if not paused and index < last_frame:
+            index += 1
+
+    pygame.quit()
+
+
+def add_arguments(parser):
+    """Options de la boucle fenêtrée."""
+    profiler.add_arguments(parser)
+    parser.add_argument("--fps", type=int, default=60, help="cadence d'affichage")
+    parser.add_argument("--sim-hz", type=float, default=REFERENCE_HZ,
+                        help="fréquence de la simulation (ex. 240 : 4 pas par frame à 60 fps)")
+    parser.add_argument("--max-substeps", type=int, default=8,
+                        help="nombre maximal de pas de simulation par frame")
+    parser.add_argument("--no-interpolation", action="store_true",
+                        help="affiche le dernier état calculé sans interpolation")
+    parser.add_argument("--threaded", action="store_true",
+                        help="calcule les pas dans un thread, à part des événements "
+                             "et du rendu")
+    parser.add_argument("--screen", type=_screen_size, default=None, metavar="LxH",
+                        help="taille de la fenêtre (par défaut : le monde, au plus "
+                             f"{MAX_SCREEN[0]}x{MAX_SCREEN[1]})")
+    parser.add_argument("--record", default=None,
+                        help="enregistre chaque pas dans ce fichier de trajectoire")
+    parser.add_argument("--replay", default=None,
+                        help="rejoue un fichier de trajectoire au lieu de simuler")
+
+
+def options(args):
+    """Arguments de run() correspondant aux options de add_arguments."""
+    return {
+        "profile": args.profile,
+        "profile_csv": args.profile_csv,
+        "fps": args.fps,
+        "sim_hz": args.sim_hz,
+        "max_substeps": args.max_substeps,
+        "interpolation": not args.no_interpolation,
+        "record": args.record,
+        "threaded": args.threaded,
+        "screen_size": args.screen,
+    }
+
+
+def _screen_size(text):
+    # "1280x800" -> (1280, 800)
+    try:
+        width, height = (int(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"taille LxH attendue (reçu {text!r})") from None
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"taille > 0 attendue (reçu {text!r})")
+    return width, height